@@ -0,0 +1,561 @@
+# app/cache.py
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional
+
+import redis
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import async_session
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app import models, schemas
+
+logger = logging.getLogger("api_logger.cache")
+
+_MISSING = object()
+
+
+# ------------------------------
+# In-process TTL + LRU Cache
+# ------------------------------
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after a TTL.
+    Tracks hit/miss counters so callers can report hit ratios.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store `value`; `ttl` overrides the cache-wide TTL for this entry."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+# ------------------------------
+# Authenticated User Cache
+# ------------------------------
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "5"))                # in-process tier, seconds
+USER_CACHE_REDIS_TTL = int(os.getenv("USER_CACHE_REDIS_TTL", "300"))    # shared tier, seconds
+USER_CACHE_FIELDS = ("id", "username", "email", "role")                 # never the password hash
+
+
+class UserCache:
+    """
+    Caches the user behind a token `sub` so get_user can skip the DB lookup.
+
+    Lookups go in-process LRU -> Redis (if available) -> database. Cached users
+    are rebuilt as transient `models.User` objects that are not attached to any
+    session, so they are read-only snapshots and must never be added to one.
+    Entries are dropped (here and in Redis) once a transaction that updated or
+    deleted a user through the ORM commits. Other workers' in-process copies
+    are not told: they serve the old role for up to USER_CACHE_TTL seconds.
+    """
+
+    key_prefix = "user:"
+
+    def __init__(
+        self,
+        redis_client=None,
+        maxsize: int = USER_CACHE_SIZE,
+        ttl: float = USER_CACHE_TTL,
+        redis_ttl: int = USER_CACHE_REDIS_TTL,
+    ):
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.redis = redis_client
+        self.redis_ttl = redis_ttl
+        self.redis_hits = 0
+        self.misses = 0
+
+    def get(self, username: str) -> Optional[models.User]:
+        data = self.local.get(username)
+        if data is None and self.redis is not None:
+            data = self._get_redis(username)
+        return self._user(data)
+
+    async def get_async(self, username: str) -> Optional[models.User]:
+        """`get` for get_async_user; the Redis round trip runs in the threadpool."""
+        data = self.local.get(username)
+        if data is None and self.redis is not None:
+            data = await run_in_threadpool(self._get_redis, username)
+        return self._user(data)
+
+    def set(self, user: models.User) -> None:
+        data = self._snapshot(user)
+        if self.redis is not None:
+            self._store_redis(user.username, data)
+
+    async def set_async(self, user: models.User) -> None:
+        data = self._snapshot(user)
+        if self.redis is not None:
+            await run_in_threadpool(self._store_redis, user.username, data)
+
+    def _user(self, data: Optional[dict]) -> Optional[models.User]:
+        if data is None:
+            self.misses += 1
+            return None
+        return models.User(**data)
+
+    def _snapshot(self, user: models.User) -> dict:
+        data = {field: getattr(user, field) for field in USER_CACHE_FIELDS}
+        self.local.set(user.username, data)
+        return data
+
+    def _get_redis(self, username: str) -> Optional[dict]:
+        try:
+            raw = self.redis.get(self.key_prefix + username)
+        except redis.RedisError as e:
+            logger.warning(f"User cache Redis read skipped: {e}")
+            return None
+        if not raw:
+            return None
+        data = json.loads(raw)
+        self.local.set(username, data)
+        self.redis_hits += 1
+        return data
+
+    def _store_redis(self, username: str, data: dict) -> None:
+        try:
+            self.redis.set(self.key_prefix + username, json.dumps(data), ex=self.redis_ttl)
+        except redis.RedisError as e:
+            logger.warning(f"User cache Redis write skipped: {e}")
+
+    def invalidate(self, username: str) -> None:
+        # Redis first: dropping the local copy first would let a concurrent
+        # request refill it from the not yet deleted Redis entry
+        if self.redis is not None:
+            self._delete_redis([username])
+        self.local.pop(username)
+
+    async def invalidate_many_async(self, usernames: Iterable[str]) -> None:
+        usernames = list(usernames)
+        if usernames and self.redis is not None:
+            await run_in_threadpool(self._delete_redis, usernames)
+        for username in usernames:
+            self.local.pop(username)
+
+    def _delete_redis(self, usernames: list) -> None:
+        try:
+            self.redis.delete(*(self.key_prefix + username for username in usernames))
+        except redis.RedisError as e:
+            logger.warning(f"User cache Redis invalidation skipped: {e}")
+
+    def clear(self) -> None:
+        self.local.clear()
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.local.hits + self.redis_hits,
+            "misses": self.misses,
+            "local": self.local.stats(),
+            "redis_hits": self.redis_hits,
+        }
+
+
+# ------------------------------
+# Request Coalescing
+# ------------------------------
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; concurrent callers for the same
+    key wait for and share the leader's result (or exception).
+    Use `do` from threads and `do_async` from the event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self._async_calls: Dict[Hashable, asyncio.Future] = {}
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return call.result()
+
+        try:
+            result = fn()
+            call.set_result(result)
+            return result
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._async_calls.get(key)
+        if call is not None:
+            self.coalesced += 1
+            return await asyncio.shield(call)
+
+        call = self._async_calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await fn()
+            call.set_result(result)
+            return result
+        except BaseException as e:
+            call.set_exception(e)
+            # don't warn about an unretrieved exception when nobody was waiting
+            call.exception()
+            raise
+        finally:
+            del self._async_calls[key]
+
+
+# ------------------------------
+# Task Read Cache
+# ------------------------------
+
+TASK_CACHE_SIZE = int(os.getenv("TASK_CACHE_SIZE", "10000"))
+TASK_CACHE_TTL = float(os.getenv("TASK_CACHE_TTL", "5"))                # in-process tier, seconds
+TASK_CACHE_REDIS_TTL = int(os.getenv("TASK_CACHE_REDIS_TTL", "60"))     # shared tier, seconds
+TASK_CACHE_REDIS_FENCE = int(os.getenv("TASK_CACHE_REDIS_FENCE", "10"))  # seconds loads can't refill Redis after an invalidation
+
+# KEYS[1] = task key, ARGV = {task JSON, version, 1 if a write else 0, ttl}.
+# Stores only over an older version, so a load that read the row before
+# another worker's write cannot replace it. Invalidations leave a fence that
+# loads (which may have read the row before the invalidation) must not replace.
+STORE_IF_NEWER = """
+local current = redis.call('GET', KEYS[1])
+if current then
+    local stored = cjson.decode(current)
+    if stored.fence then
+        if ARGV[3] == '0' then
+            return 0
+        end
+    elseif tonumber(stored.version) >= tonumber(ARGV[2]) then
+        return 0
+    end
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[4])
+return 1
+"""
+FENCE = json.dumps({"fence": True})
+
+
+class TaskCache:
+    """
+    Read-through cache for GET /tasks/{id}: in-process LRU -> Redis -> database.
+
+    Values are serialized TaskResponse dicts. Writes go through the routers,
+    which store the new value after PUT and invalidate after deletes and batch
+    operations. Other workers' in-process copies can lag by up to TASK_CACHE_TTL;
+    Redis only ever moves to a newer task version, so a load that raced a write
+    on another worker cannot put the older row back.
+    Concurrent misses for the same id are coalesced into a single DB query.
+    The `*_async` methods are for the async routers: they run the (sync)
+    Redis calls in the threadpool so a slow Redis never stalls the event loop.
+    """
+
+    key_prefix = "task:"
+
+    def __init__(
+        self,
+        redis_client=None,
+        maxsize: int = TASK_CACHE_SIZE,
+        ttl: float = TASK_CACHE_TTL,
+        redis_ttl: int = TASK_CACHE_REDIS_TTL,
+        redis_fence: int = TASK_CACHE_REDIS_FENCE,
+    ):
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        # TASK_CACHE_TTL=0 turns caching off (loads are still coalesced)
+        self.redis = redis_client if ttl > 0 else None
+        self.redis_ttl = redis_ttl
+        self.redis_fence = redis_fence
+        self._store_script = self.redis.register_script(STORE_IF_NEWER) if self.redis is not None else None
+        self.flight = SingleFlight()
+        self.redis_hits = 0
+        self.misses = 0
+        self.loads = 0
+        # id -> token of the load in flight; writes and invalidations drop the
+        # token so that load's (possibly older) result is not cached here
+        self._loading: Dict[int, object] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def serialize(task) -> dict:
+        return schemas.TaskResponse.model_validate(task).model_dump(mode="json")
+
+    def get(self, task_id: int) -> Optional[dict]:
+        data = self.local.get(task_id)
+        if data is None and self.redis is not None:
+            data = self._get_redis(task_id)
+        if data is None:
+            self.misses += 1
+        return data
+
+    async def get_async(self, task_id: int) -> Optional[dict]:
+        """`get` for the async routers; the Redis round trip runs in the threadpool."""
+        data = self.local.get(task_id)
+        if data is None and self.redis is not None:
+            data = await run_in_threadpool(self._get_redis, task_id)
+        if data is None:
+            self.misses += 1
+        return data
+
+    def set(self, task) -> dict:
+        data = self._written(task)
+        if self.redis is not None:
+            self._store_redis(data, write=True)
+        return data
+
+    async def set_async(self, task) -> dict:
+        data = self._written(task)
+        if self.redis is not None:
+            await run_in_threadpool(self._store_redis, data, True)
+        return data
+
+    def _written(self, task) -> dict:
+        data = self.serialize(task)
+        with self._lock:
+            self._loading.pop(data["id"], None)
+            self.local.set(data["id"], data)
+        return data
+
+    def _get_redis(self, task_id: int) -> Optional[dict]:
+        try:
+            raw = self.redis.get(f"{self.key_prefix}{task_id}")
+        except redis.RedisError as e:
+            logger.warning(f"Task cache Redis read skipped: {e}")
+            return None
+        if not raw:
+            return None
+        data = json.loads(raw)
+        if data.get("fence"):
+            return None
+        self.local.set(task_id, data)
+        self.redis_hits += 1
+        return data
+
+    def _store_redis(self, data: dict, write: bool = False) -> None:
+        try:
+            self._store_script(
+                keys=[f"{self.key_prefix}{data['id']}"],
+                args=[json.dumps(data), data["version"], int(write), self.redis_ttl],
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Task cache Redis write skipped: {e}")
+
+    def _start_load(self, task_id: int) -> object:
+        token = object()
+        with self._lock:
+            self._loading[task_id] = token
+        return token
+
+    def _finish_load(self, task_id: int, token: object, task) -> Optional[dict]:
+        """Serialize a loaded task and cache it locally unless a write raced the load."""
+        self.loads += 1
+        data = self.serialize(task) if task is not None else None
+        with self._lock:
+            if self._loading.get(task_id) is token:
+                del self._loading[task_id]
+                if data is not None:
+                    self.local.set(task_id, data)
+        return data
+
+    def _abandon_load(self, task_id: int, token: object) -> None:
+        with self._lock:
+            if self._loading.get(task_id) is token:
+                del self._loading[task_id]
+
+    def _load(self, task_id: int, loader: Callable[[], Any]) -> Optional[dict]:
+        token = self._start_load(task_id)
+        try:
+            task = loader()
+        except BaseException:
+            self._abandon_load(task_id, token)
+            raise
+        data = self._finish_load(task_id, token, task)
+        if data is not None and self.redis is not None:
+            self._store_redis(data)
+        return data
+
+    async def _load_async(self, task_id: int, loader: Callable[[], Awaitable[Any]]) -> Optional[dict]:
+        token = self._start_load(task_id)
+        try:
+            task = await loader()
+        except BaseException:
+            self._abandon_load(task_id, token)
+            raise
+        data = self._finish_load(task_id, token, task)
+        if data is not None and self.redis is not None:
+            await run_in_threadpool(self._store_redis, data)
+        return data
+
+    def get_or_load(self, task_id: int, loader: Callable[[], Any]) -> Optional[dict]:
+        """Cached task dict, or `loader()` (a Task or None) run once per concurrent miss."""
+        data = self.get(task_id)
+        if data is not None:
+            return data
+        return self.flight.do(task_id, lambda: self._load(task_id, loader))
+
+    async def get_or_load_async(self, task_id: int, loader: Callable[[], Awaitable[Any]]) -> Optional[dict]:
+        data = await self.get_async(task_id)
+        if data is not None:
+            return data
+        return await self.flight.do_async(task_id, lambda: self._load_async(task_id, loader))
+
+    def invalidate(self, task_id: int) -> None:
+        self.invalidate_many([task_id])
+
+    async def invalidate_async(self, task_id: int) -> None:
+        await self.invalidate_many_async([task_id])
+
+    def invalidate_many(self, task_ids: Iterable[int]) -> None:
+        task_ids = self._evict(task_ids)
+        if task_ids and self.redis is not None:
+            self._fence_redis(task_ids)
+
+    async def invalidate_many_async(self, task_ids: Iterable[int]) -> None:
+        task_ids = self._evict(task_ids)
+        if task_ids and self.redis is not None:
+            await run_in_threadpool(self._fence_redis, task_ids)
+
+    def _evict(self, task_ids: Iterable[int]) -> list:
+        task_ids = list(task_ids)
+        with self._lock:
+            for task_id in task_ids:
+                self._loading.pop(task_id, None)
+                self.local.pop(task_id)
+        return task_ids
+
+    def _fence_redis(self, task_ids: list) -> None:
+        # Replace the entries with fences rather than deleting them: a load on
+        # another worker may have read the rows before this write committed
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for task_id in task_ids:
+                pipe.set(f"{self.key_prefix}{task_id}", FENCE, ex=self.redis_fence)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Task cache Redis invalidation skipped: {e}")
+
+    def clear(self) -> None:
+        self.local.clear()
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.local.hits + self.redis_hits,
+            "misses": self.misses,
+            "db_loads": self.loads,
+            "coalesced": self.flight.coalesced,
+            "local": self.local.stats(),
+            "redis_hits": self.redis_hits,
+        }
+
+
+try:
+    from app.database import redis_client
+except Exception:
+    redis_client = None
+
+user_cache = UserCache(redis_client)
+task_cache = TaskCache(redis_client)
+
+# Session.info keys for usernames updated or deleted in the current transaction,
+# and (AsyncSession only) in committed ones still to be dropped from the cache
+_CHANGED_USERS = "user_cache_invalidations"
+_COMMITTED_USERS = "user_cache_committed_invalidations"
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _collect_changed_user(mapper, connection, target):
+    # Runs at flush; the rows are only visible to other sessions after commit,
+    # so a cache drop here could be refilled with the old row before then.
+    # Covers role changes, deletions and renames (drop the old username too)
+    session = inspect(target).session
+    if session is None:
+        return
+    usernames = session.info.setdefault(_CHANGED_USERS, set())
+    usernames.add(target.username)
+    usernames.update(inspect(target).attrs.username.history.deleted)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    usernames = session.info.pop(_CHANGED_USERS, ())
+    if async_session(session) is not None:
+        # An AsyncSession commits on the event loop: leave the Redis round trip
+        # to invalidate_committed_users(), awaited after the commit
+        session.info.setdefault(_COMMITTED_USERS, set()).update(usernames)
+        return
+    for username in usernames:
+        user_cache.invalidate(username)
+
+
+async def invalidate_committed_users(db) -> None:
+    """Drop the users an AsyncSession's commits changed; call after `await db.commit()`."""
+    usernames = db.info.pop(_COMMITTED_USERS, ())
+    if usernames:
+        await user_cache.invalidate_many_async(usernames)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session):
+    session.info.pop(_CHANGED_USERS, None)
@@ -1,28 +1,248 @@
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event, exc, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 import redis
 
+from app import metrics
+
 # Database URL
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./tasks.db")
 
+# Async drivers, mapped to the sync driver for the same database.
+# An async DATABASE_URL (e.g. sqlite+aiosqlite:///./tasks.db) switches the
+# routers to AsyncSession; the sync engine is still used for DDL and health checks.
+ASYNC_DRIVERS = {
+    "sqlite+aiosqlite": "sqlite",
+    "postgresql+asyncpg": "postgresql",
+}
+
+_database_url = make_url(SQLALCHEMY_DATABASE_URL)
+ASYNC_DATABASE = _database_url.drivername in ASYNC_DRIVERS
+SYNC_DATABASE_URL = (
+    _database_url.set(drivername=ASYNC_DRIVERS[_database_url.drivername])
+    if ASYNC_DATABASE
+    else _database_url
+)
+
+IS_SQLITE = _database_url.get_backend_name() == "sqlite"
+IS_MEMORY_SQLITE = IS_SQLITE and _database_url.database in (None, "", ":memory:")
+
+
+def _env_flag(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes", "on")
+
+
+# Connection pool settings (per worker process). With the sync routers every
+# in-flight request can hold a connection, so pool size + overflow should cover
+# the threadpool (40 by default) or requests queue on DB_POOL_TIMEOUT.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))      # seconds to wait for a connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))        # seconds, -1 disables
+DB_POOL_PRE_PING = _env_flag("DB_POOL_PRE_PING")
+
+# SQLite pragmas applied to every new connection. WAL lets readers proceed
+# while one writer commits, and busy_timeout makes writers from other uvicorn
+# workers wait instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # negative = KiB, i.e. 64 MiB
+}
+
+
+# ----------------------------
+# Pool Metrics
+# ----------------------------
+class PoolStats:
+    """Checkout counts and time spent waiting for a pooled connection."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        metrics.record_pool_wait(self.name, waited, timed_out)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+            }
+
+
+class _TimedCheckoutMixin:
+    """Times QueuePool._do_get(), i.e. how long a checkout waited for a free connection."""
+
+    stats: PoolStats
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return connection
+
+
+class InstrumentedQueuePool(_TimedCheckoutMixin, QueuePool):
+    stats = PoolStats("sync")
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    stats = PoolStats("async")
+
+
+def _pool_options(poolclass) -> dict:
+    options = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    if not IS_MEMORY_SQLITE:
+        # In-memory SQLite keeps its single-connection pool
+        options.update(
+            poolclass=poolclass,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    return options
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        if name == "journal_mode" and IS_MEMORY_SQLITE:
+            continue
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
 # Create SQLAlchemy engine
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
+    SYNC_DATABASE_URL,
     connect_args={"check_same_thread": False} if "sqlite" in SQLALCHEMY_DATABASE_URL else {},
+    **_pool_options(InstrumentedQueuePool),
 )
 
 # Create a configured "Session" class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine and session factory (only when DATABASE_URL uses an async driver)
+if ASYNC_DATABASE:
+    async_engine = create_async_engine(_database_url, **_pool_options(InstrumentedAsyncQueuePool))
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+else:
+    async_engine = None
+    AsyncSessionLocal = None
+
+if not IS_MEMORY_SQLITE:
+    metrics.observe_pool(engine, "sync", DB_POOL_SIZE + DB_MAX_OVERFLOW)
+    if async_engine is not None:
+        metrics.observe_pool(async_engine.sync_engine, "async", DB_POOL_SIZE + DB_MAX_OVERFLOW)
+
+if IS_SQLITE:
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+    if async_engine is not None:
+        event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+
+
+def pool_status(pool) -> dict:
+    """Current pool occupancy plus cumulative checkout/wait stats."""
+    status = {"class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=pool.overflow(),
+            max_overflow=DB_MAX_OVERFLOW,
+        )
+    if isinstance(pool, _TimedCheckoutMixin):
+        status.update(pool.stats.snapshot())
+    return status
+
+
+def get_pool_metrics() -> dict:
+    metrics = {"sync": pool_status(engine.pool)}
+    if async_engine is not None:
+        metrics["async"] = pool_status(async_engine.pool)
+    return metrics
+
+
 # Base class for models
 Base = declarative_base()
 
 
+def create_missing_indexes():
+    """create_all() skips indexes on tables that already exist, so add new ones here."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def create_missing_columns(bind=None):
+    """
+    create_all() never alters existing tables, so add new columns here.
+    New columns must be nullable or have a constant server_default.
+    """
+    bind = bind if bind is not None else engine
+    inspector = inspect(bind)
+    preparer = bind.dialect.identifier_preparer
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = (
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ADD COLUMN {preparer.format_column(column)} {column.type.compile(dialect=bind.dialect)}"
+                )
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg.text}"
+                    if not column.nullable:
+                        ddl += " NOT NULL"
+                conn.execute(text(ddl))
+
+
 # Redis client setup
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Without a timeout a Redis that stops answering blocks its callers forever
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "1"))   # seconds, connect and per command
 try:
-    redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+    redis_client = metrics.instrument_redis(
+        redis.Redis.from_url(
+            REDIS_URL,
+            decode_responses=True,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+        )
+    )
     # Test connection
     redis_client.ping()
 except redis.RedisError as e:
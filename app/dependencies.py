@@ -2,16 +2,18 @@
 
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-import time
 
-from app.database import SessionLocal, redis_client
-from app import models, utils
+from app.database import AsyncSessionLocal, SessionLocal
+from app import models, ratelimit, utils
+from app.cache import invalidate_committed_users, user_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/v1/auth/login")
 
-RATE_LIMIT = 5        # requests
-RATE_PERIOD = 60      # seconds
+RATE_LIMIT = ratelimit.RATE_LIMIT
+RATE_PERIOD = ratelimit.RATE_PERIOD
 
 
 # ----------------------------
@@ -25,13 +27,18 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """AsyncSession dependency, used when DATABASE_URL has an async driver."""
+    async with AsyncSessionLocal() as db:
+        yield db
+        # Routes should call this after their commit; catch any they missed
+        await invalidate_committed_users(db)
+
+
 # ----------------------------
 # Get Current User
 # ----------------------------
-def get_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-):
+def token_subject(token: str) -> str:
     payload = utils.decode_access_token(token)
 
     if not payload:
@@ -40,22 +47,52 @@ def get_user(
             detail="Invalid or expired token",
         )
 
-    username = payload.get("sub")
-    user = db.query(models.User).filter(models.User.username == username).first()
+    return payload.get("sub")
 
+
+def ensure_user(user):
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
         )
-
     return user
 
 
+def get_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+):
+    """
+    Resolve the token's user, served from `user_cache` when possible.
+    Cache hits are detached snapshots (see app/cache.py).
+    """
+    username = token_subject(token)
+    user = user_cache.get(username)
+    if user is None:
+        user = db.query(models.User).filter(models.User.username == username).first()
+        if user:
+            user_cache.set(user)
+    return ensure_user(user)
+
+
+async def get_async_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+):
+    username = token_subject(token)
+    user = await user_cache.get_async(username)
+    if user is None:
+        user = await db.scalar(select(models.User).where(models.User.username == username))
+        if user:
+            await user_cache.set_async(user)
+    return ensure_user(user)
+
+
 # ----------------------------
 # Admin-only Dependency
 # ----------------------------
-def get_admin(user: models.User = Depends(get_user)):
+def ensure_admin(user: models.User):
     if user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -64,39 +101,22 @@ def get_admin(user: models.User = Depends(get_user)):
     return user
 
 
+def get_admin(user: models.User = Depends(get_user)):
+    return ensure_admin(user)
+
+
+async def get_async_admin(user: models.User = Depends(get_async_user)):
+    return ensure_admin(user)
+
+
 # ----------------------------
 # Rate Limiting Dependency
 # ----------------------------
-def rate_limit(request: Request):
+def rate_limit(request: Request, policy: str = "default"):
     """
-    Redis-backed rate limiter.
-    Fails open if Redis is unavailable (production-safe).
+    Redis-backed rate limiter (one atomic Lua call, see app/ratelimit.py).
+    Task routes are limited by RateLimitMiddleware before routing; this is
+    for checking a budget from inside a handler.
+    Falls back to per-worker limits if Redis is unavailable.
     """
-    try:
-        client_ip = request.client.host
-        key = f"rate:{client_ip}"
-
-        current = redis_client.get(key)
-
-        if current and int(current) >= RATE_LIMIT:
-            ttl = redis_client.ttl(key)
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail=f"Rate limit exceeded. Try again in {ttl} seconds",
-                headers={
-                    "Retry-After": str(ttl),
-                    "X-RateLimit-Limit": str(RATE_LIMIT),
-                    "X-RateLimit-Remaining": "0",
-                },
-            )
-
-        pipe = redis_client.pipeline()
-        pipe.incr(key, 1)
-        pipe.expire(key, RATE_PERIOD)
-        pipe.execute()
-
-    except HTTPException:
-        raise
-    except Exception:
-        # Redis is down → allow request (fail open)
-        pass
+    ratelimit.enforce(request, policy)
@@ -0,0 +1,233 @@
+# app/http_client.py
+#
+# One pooled httpx.AsyncClient for outbound calls, created and closed with the
+# app lifespan. Keep-alive connections (and HTTP/2 where available) avoid a
+# TCP+TLS handshake per request, and every call goes through:
+#   response cache -> single-flight -> circuit breaker -> concurrency limit
+# so a slow upstream fails fast instead of piling up coroutines.
+
+from typing import Any, Optional
+import asyncio
+import logging
+import os
+import time
+
+import httpx
+
+from app.cache import SingleFlight, TTLCache
+
+logger = logging.getLogger("api_logger.http_client")
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+try:
+    import h2  # noqa: F401  (httpx needs it for HTTP/2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+OUTBOUND_TIMEOUT = float(os.getenv("OUTBOUND_TIMEOUT", "5"))                  # seconds per request
+OUTBOUND_MAX_CONNECTIONS = int(os.getenv("OUTBOUND_MAX_CONNECTIONS", "20"))
+OUTBOUND_MAX_KEEPALIVE = int(os.getenv("OUTBOUND_MAX_KEEPALIVE", "10"))
+OUTBOUND_HTTP2 = _env_flag("OUTBOUND_HTTP2", "true") and HTTP2_AVAILABLE
+OUTBOUND_CONCURRENCY = int(os.getenv("OUTBOUND_CONCURRENCY", "10"))           # calls in flight
+OUTBOUND_QUEUE_TIMEOUT = float(os.getenv("OUTBOUND_QUEUE_TIMEOUT", "1"))      # wait for a slot, seconds
+OUTBOUND_CACHE_TTL = float(os.getenv("OUTBOUND_CACHE_TTL", "10"))             # seconds, 0 = off
+OUTBOUND_CACHE_SIZE = int(os.getenv("OUTBOUND_CACHE_SIZE", "1000"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "30"))                       # seconds open
+
+
+class OutboundUnavailable(Exception):
+    """The call was not attempted: circuit open or no free concurrency slot."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+# ------------------------------
+# Circuit Breaker
+# ------------------------------
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures.
+    open -> half-open after `reset_timeout`: one trial call is let through;
+    success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return
+        retry_after = self.reset_timeout - (time.monotonic() - self.opened_at)
+        raise OutboundUnavailable("circuit open", max(retry_after, 1))
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial_in_flight or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning(f"Circuit opened after {self.failures} failures")
+            self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def cancel_trial(self) -> None:
+        """The half-open trial call was never made; let the next caller try."""
+        self._trial_in_flight = False
+
+
+# ------------------------------
+# Outbound Client
+# ------------------------------
+
+class OutboundClient:
+    """
+    Shared client for outbound JSON calls. Pass `transport=httpx.MockTransport(...)`
+    in tests. start()/close() are called from the app lifespan; the first call
+    starts the client if the lifespan did not run.
+    """
+
+    def __init__(
+        self,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        timeout: float = OUTBOUND_TIMEOUT,
+        concurrency: int = OUTBOUND_CONCURRENCY,
+        queue_timeout: float = OUTBOUND_QUEUE_TIMEOUT,
+        cache_ttl: float = OUTBOUND_CACHE_TTL,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.transport = transport
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.cache_ttl = cache_ttl
+        self.cache = TTLCache(maxsize=OUTBOUND_CACHE_SIZE, ttl=cache_ttl)
+        self.breaker = breaker or CircuitBreaker()
+        self.flight = SingleFlight()
+        self.concurrency = concurrency
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+        self.rejected = 0
+
+    async def start(self) -> None:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                transport=self.transport,
+                timeout=self.timeout,
+                http2=OUTBOUND_HTTP2 and self.transport is None,
+                limits=httpx.Limits(
+                    max_connections=OUTBOUND_MAX_CONNECTIONS,
+                    max_keepalive_connections=OUTBOUND_MAX_KEEPALIVE,
+                ),
+            )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get_json(self, url: str, cache_ttl: Optional[float] = None) -> Any:
+        """
+        GET `url` and return the decoded JSON body.
+        Raises OutboundUnavailable without calling upstream when the circuit is
+        open or all slots stay busy for `queue_timeout`; raises httpx errors
+        (timeouts, 4xx/5xx, DecodingError for a body that isn't JSON) from
+        the call itself.
+        """
+        ttl = self.cache_ttl if cache_ttl is None else cache_ttl
+        if ttl > 0:
+            cached = self.cache.get(url)
+            if cached is not None:
+                return cached
+
+        # identical concurrent requests share one upstream call
+        data = await self.flight.do_async(url, lambda: self._fetch(url))
+        if ttl > 0:
+            self.cache.set(url, data, ttl=ttl)
+        return data
+
+    async def post_json(self, url: str, payload: Any, headers: Optional[dict] = None) -> httpx.Response:
+        """
+        POST `payload` as JSON. Goes through the same circuit breaker and
+        concurrency limit as get_json() but is never cached or coalesced.
+        """
+        return await self._send("POST", url, json=payload, headers=headers)
+
+    async def _fetch(self, url: str) -> Any:
+        response = await self._send("GET", url)
+        try:
+            return response.json()
+        except ValueError as e:
+            # A 2xx with a body that isn't JSON is still a broken upstream
+            self.breaker.record_failure()
+            raise httpx.DecodingError(f"Upstream returned invalid JSON: {e}", request=response.request) from e
+
+    async def _send(self, method: str, url: str, **kwargs) -> httpx.Response:
+        self.breaker.before_call()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            self.breaker.cancel_trial()
+            raise OutboundUnavailable("too many outbound calls in flight", 1)
+        except BaseException:
+            self.breaker.cancel_trial()
+            raise
+
+        try:
+            await self.start()
+            response = await self._client.request(method, url, **kwargs)
+            if response.status_code >= 500:
+                response.raise_for_status()
+        except httpx.HTTPError:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled (or failed before reaching the upstream): no verdict,
+            # but a half-open trial must not stay in flight forever
+            self.breaker.cancel_trial()
+            raise
+        finally:
+            self._semaphore.release()
+
+        self.breaker.record_success()
+        response.raise_for_status()   # 4xx: the upstream is healthy, the request is not
+        return response
+
+    def stats(self) -> dict:
+        return {
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "rejected": self.rejected,
+            "cache": self.cache.stats(),
+            "coalesced": self.flight.coalesced,
+        }
+
+
+outbound = OutboundClient()
@@ -0,0 +1,156 @@
+# app/logs.py
+#
+# Structured request logging off the event loop.
+# Handlers on the request path only put the LogRecord on a bounded queue;
+# a QueueListener thread formats it as one JSON line and writes to stdout.
+# When the queue is full (stdout piped to a slow collector) records are
+# dropped and counted instead of blocking requests.
+#
+# Structured fields go in `extra={"fields": {...}}` and are merged into the
+# JSON object, so nothing is encoded twice.
+
+from datetime import datetime, timezone
+from typing import Optional
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))           # records waiting to be written
+LOG_JSON_ENCODER = os.getenv("LOG_JSON_ENCODER", "auto")              # auto | orjson | json
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))          # share of 2xx/3xx request logs kept
+
+
+def _orjson_dumps(data: dict) -> str:
+    # default=str keeps parity with json.dumps(default=str) for UUIDs, Decimals, ...
+    return orjson.dumps(data, default=str).decode()
+
+
+def _json_dumps(data: dict) -> str:
+    return json.dumps(data, default=str)
+
+
+def get_encoder(name: str = LOG_JSON_ENCODER):
+    if name == "json" or orjson is None:
+        return _json_dumps
+    return _orjson_dumps
+
+
+# ------------------------------
+# Formatter
+# ------------------------------
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message + `fields`."""
+
+    def __init__(self, encoder=None):
+        super().__init__()
+        self.encode = encoder or get_encoder()
+
+    def format(self, record: logging.LogRecord) -> str:
+        log_record = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id is not None:
+            log_record["request_id"] = request_id
+        fields = getattr(record, "fields", None)
+        if fields:
+            log_record.update(fields)
+        if record.exc_info:
+            log_record["exception"] = self.formatException(record.exc_info)
+        return self.encode(log_record)
+
+
+# ------------------------------
+# Queue Handler / Listener
+# ------------------------------
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Never blocks the caller: a full queue drops the record.
+    Records are queued as-is; formatting happens on the listener thread.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock prepare() formats on the calling thread; an in-process
+        # queue can carry the record itself.
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # The stock version uses put_nowait, which fails on a full bounded queue
+        self.queue.put(self._sentinel)
+
+
+class LogPipeline:
+    """Bounded queue between `logger` and a background writer thread."""
+
+    def __init__(self, stream=None, queue_size: int = LOG_QUEUE_SIZE, encoder=None):
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.output = logging.StreamHandler(stream or sys.stdout)
+        self.output.setFormatter(JsonFormatter(encoder))
+        self._listener: Optional[_Listener] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = _Listener(self.queue, self.output)
+                self._listener.start()
+
+    def stop(self):
+        """Flush queued records and stop the writer thread."""
+        with self._lock:
+            if self._listener is not None:
+                self._listener.stop()
+                self._listener = None
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "capacity": self.queue.maxsize,
+            "dropped": self.handler.dropped,
+            "encoder": "orjson" if self.output.formatter.encode is _orjson_dumps else "json",
+        }
+
+
+def sample_request(status_code: int, rate: float = LOG_SAMPLE_RATE) -> bool:
+    """Errors and 4xx are always logged; successful requests are kept at `rate`."""
+    return status_code >= 400 or rate >= 1 or random.random() < rate
+
+
+def configure_logger(name: str, pipeline: LogPipeline, level: str = LOG_LEVEL) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    logger.addHandler(pipeline.handler)
+    pipeline.start()
+    return logger
+
+
+log_pipeline = LogPipeline()
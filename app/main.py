@@ -1,15 +1,23 @@
-import uuid
-import json
-import logging
-import sys
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy.exc import SQLAlchemyError
-import redis
 
-from app.database import Base, engine, redis_client
-from app.routers import tasks, auth
+from app.database import (
+    ASYNC_DATABASE,
+    Base,
+    async_engine,
+    engine,
+    create_missing_columns,
+    create_missing_indexes,
+)
+from app import metrics, outbox, profiling, ratelimit, search, task_stats
+from app.http_client import outbound
+from app.logs import configure_logger, log_pipeline
+from app.request_context import RequestContextMiddleware, RequestIdFilter
+from app.passwords import password_service
+from app.routers import admin, health, tasks, tasks_async, auth, auth_async
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -17,10 +25,32 @@ load_dotenv()
 # App Initialization
 # -------------------------------------------------
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log_pipeline.start()
+    # Start the bcrypt process pool before the first login needs it
+    password_service.start()
+    # One pooled client for outbound calls; closing it drains keep-alive connections
+    await outbound.start()
+    # Periodically recount tasks to fix any drift in the trigger-maintained counters
+    task_stats.reconciler.start(engine)
+    # Deliver webhooks / notifications recorded by task writes (no-op without sinks)
+    outbox.dispatcher.start(engine)
+    yield
+    await outbox.dispatcher.stop()
+    await task_stats.reconciler.stop()
+    await outbound.close()
+    await health.close()
+    password_service.shutdown()
+    metrics.mark_process_dead()
+    log_pipeline.stop()
+
+
 app = FastAPI(
     title="Task Management API",
     description="Production-ready API with auth, rate limiting, and observability",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # -------------------------------------------------
@@ -29,9 +59,26 @@ app = FastAPI(
 
 try:
     Base.metadata.create_all(bind=engine)
+    create_missing_columns()
+    create_missing_indexes()
+    # FTS5 table + triggers (SQLite) or GIN tsvector index (PostgreSQL) for /tasks/search
+    search.create_search_index(engine)
+    # Trigger-maintained counters behind /tasks/stats and X-Total-Count
+    task_stats.create_counters(engine)
 except SQLAlchemyError as e:
     print(f"Error creating database tables: {e}")
 
+# Slow-query log and per-request SQL tracing (see app/profiling.py)
+profiling.trace_queries(engine)
+if async_engine is not None:
+    profiling.trace_queries(async_engine.sync_engine)
+
+# -------------------------------------------------
+# Rate Limiting (runs before routing and dependencies)
+# -------------------------------------------------
+
+app.add_middleware(ratelimit.RateLimitMiddleware)
+
 # -------------------------------------------------
 # CORS Configuration
 # -------------------------------------------------
@@ -48,46 +95,23 @@ app.add_middleware(
 # Structured Logging Setup
 # -------------------------------------------------
 
-class JsonFormatter(logging.Formatter):
-    def format(self, record):
-        log_record = {
-            "timestamp": self.formatTime(record),
-            "level": record.levelname,
-            "message": record.getMessage(),
-        }
-        return json.dumps(log_record)
-
-handler = logging.StreamHandler(sys.stdout)
-handler.setFormatter(JsonFormatter())
-
-logger = logging.getLogger("api_logger")
-logger.setLevel(logging.INFO)
-logger.addHandler(handler)
+# Records are queued and written to stdout as JSON by a background thread
+logger = configure_logger("api_logger", log_pipeline)
 
 # -------------------------------------------------
-# Request ID Middleware
+# Request ID, Timing and Access Log
 # -------------------------------------------------
 
-@app.middleware("http")
-async def request_id_middleware(request: Request, call_next):
-    request_id = str(uuid.uuid4())
-    request.state.request_id = request_id
+log_pipeline.handler.addFilter(RequestIdFilter())
+# Profiling sits inside the request context so profiles are stored under the request ID
+app.add_middleware(profiling.ProfilingMiddleware)
+app.add_middleware(RequestContextMiddleware, logger=logger)
 
-    response = await call_next(request)
-    response.headers["X-Request-ID"] = request_id
-
-    logger.info(
-        json.dumps(
-            {
-                "request_id": request_id,
-                "method": request.method,
-                "path": request.url.path,
-                "status_code": response.status_code,
-            }
-        )
-    )
+# -------------------------------------------------
+# Metrics (outermost, so 429s and errors are counted too)
+# -------------------------------------------------
 
-    return response
+app.add_middleware(metrics.MetricsMiddleware)
 
 # -------------------------------------------------
 # Global Exception Handler
@@ -96,13 +120,14 @@ async def request_id_middleware(request: Request, call_next):
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     logger.error(
-        json.dumps(
-            {
+        "unhandled exception",
+        extra={
+            "fields": {
                 "request_id": getattr(request.state, "request_id", None),
                 "error": str(exc),
                 "path": request.url.path,
             }
-        )
+        },
     )
     return JSONResponse(
         status_code=500,
@@ -110,43 +135,24 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 # -------------------------------------------------
-# Health Check Endpoints
+# Prometheus Metrics
 # -------------------------------------------------
 
-@app.get("/health", tags=["Health"])
-def health_check():
-    return {"status": "ok"}
-
-@app.get("/health/detailed", tags=["Health"])
-def detailed_health_check():
-    health_status = {"status": "ok", "database": "unknown", "redis": "unknown"}
-
-    # Database check
-    try:
-        with engine.connect() as conn:
-            conn.execute("SELECT 1")
-        health_status["database"] = "ok"
-    except SQLAlchemyError as e:
-        health_status["database"] = f"error: {e}"
-        health_status["status"] = "error"
-
-    # Redis check
-    try:
-        if redis_client:
-            redis_client.ping()
-            health_status["redis"] = "ok"
-        else:
-            health_status["redis"] = "not connected"
-            health_status["status"] = "error"
-    except redis.RedisError as e:
-        health_status["redis"] = f"error: {e}"
-        health_status["status"] = "error"
-
-    return health_status
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    # Aggregates all workers when PROMETHEUS_MULTIPROC_DIR is set
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
 
 # -------------------------------------------------
 # API Versioned Routers
 # -------------------------------------------------
 
-app.include_router(auth.router, prefix="/v1")
-app.include_router(tasks.router, prefix="/v1")
+# An async DATABASE_URL driver (aiosqlite/asyncpg) selects the AsyncSession routers
+if ASYNC_DATABASE:
+    app.include_router(auth_async.router, prefix="/v1")
+    app.include_router(tasks_async.router, prefix="/v1")
+else:
+    app.include_router(auth.router, prefix="/v1")
+    app.include_router(tasks.router, prefix="/v1")
+app.include_router(admin.router, prefix="/v1")
+app.include_router(health.router)
@@ -0,0 +1,206 @@
+# app/metrics.py
+#
+# Prometheus metrics, served at /metrics.
+# With `uvicorn --workers N` each worker has its own counters; set
+# PROMETHEUS_MULTIPROC_DIR (an empty directory, before the app starts) so
+# workers write their samples to shared mmap files and any worker can serve
+# the combined view. Without it metrics live in process memory.
+#
+# Keep this module free of app imports: database.py and ratelimit.py use it.
+
+from time import perf_counter
+from typing import Optional
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# Latency buckets (seconds) for API requests and Redis/DB waits
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+# ------------------------------
+# Metric Definitions
+# ------------------------------
+
+http_requests = Counter(
+    "http_requests_total", "Requests by route template and status", ["method", "route", "status"]
+)
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Request latency by route template", ["method", "route"],
+    buckets=REQUEST_BUCKETS,
+)
+http_requests_in_progress = Gauge(
+    "http_requests_in_progress", "Requests currently being handled", ["method"],
+    multiprocess_mode="livesum",
+)
+rate_limited = Counter(
+    "rate_limited_requests_total", "Requests rejected with 429", ["policy"]
+)
+db_pool_capacity = Gauge(
+    "db_pool_capacity", "pool_size + max_overflow", ["engine"], multiprocess_mode="livesum"
+)
+db_pool_in_use = Gauge(
+    "db_pool_connections_in_use", "Connections checked out of the pool", ["engine"],
+    multiprocess_mode="livesum",
+)
+db_pool_wait = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ["engine"],
+    buckets=FAST_BUCKETS,
+)
+db_pool_timeouts = Counter(
+    "db_pool_checkout_timeouts_total", "Checkouts that hit DB_POOL_TIMEOUT", ["engine"]
+)
+slow_queries = Counter(
+    "db_slow_queries_total", "Statements slower than SLOW_QUERY_MS"
+)
+redis_duration = Histogram(
+    "redis_command_duration_seconds", "Redis round-trip latency by command", ["command"],
+    buckets=FAST_BUCKETS,
+)
+redis_errors = Counter(
+    "redis_command_errors_total", "Redis commands that raised", ["command"]
+)
+outbox_events = Counter(
+    "outbox_events_total", "Outbox delivery attempts by result (delivered, retried, deferred, failed)", ["result"]
+)
+
+
+# ------------------------------
+# Exposition
+# ------------------------------
+
+def registry() -> CollectorRegistry:
+    if not MULTIPROCESS:
+        return REGISTRY
+    collector_registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collector_registry)
+    return collector_registry
+
+
+def render() -> bytes:
+    return generate_latest(registry())
+
+
+def mark_process_dead(pid: Optional[int] = None) -> None:
+    """Drop this worker's live gauges from the shared view on shutdown."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+# ------------------------------
+# Request Middleware
+# ------------------------------
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording count, latency and in-flight requests.
+    The route label is the matched path template (/v1/tasks/{task_id}),
+    read from scope["route"] after routing; unmatched paths share one label
+    so arbitrary URLs cannot blow up the series count.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # labels() lookups are cached; they are the main per-request cost
+        self._series = {}
+        self._in_progress = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        in_progress = self._in_progress.get(method)
+        if in_progress is None:
+            in_progress = self._in_progress[method] = http_requests_in_progress.labels(method)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress.inc()
+        started = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = perf_counter() - started
+            in_progress.dec()
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            requests, duration = self.series(method, route, status_code)
+            requests.inc()
+            duration.observe(elapsed)
+
+    def series(self, method: str, route: str, status_code: int):
+        key = (method, route, status_code)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = (
+                http_requests.labels(method, route, str(status_code)),
+                http_request_duration.labels(method, route),
+            )
+        return series
+
+
+# ------------------------------
+# Redis / DB Pool Instrumentation
+# ------------------------------
+
+def instrument_redis(client):
+    """Time every command sent through `client` (scripts show up as EVALSHA)."""
+    if client is None or getattr(client, "_metrics_instrumented", False):
+        return client
+    execute_command = client.execute_command
+
+    def timed_execute_command(*args, **options):
+        command = str(args[0]).upper() if args else "UNKNOWN"
+        started = perf_counter()
+        try:
+            return execute_command(*args, **options)
+        except Exception:
+            redis_errors.labels(command).inc()
+            raise
+        finally:
+            redis_duration.labels(command).observe(perf_counter() - started)
+
+    client.execute_command = timed_execute_command
+    client._metrics_instrumented = True
+    return client
+
+
+def observe_pool(engine, name: str, capacity: int) -> None:
+    """Track checkouts of `engine`'s pool via SQLAlchemy pool events."""
+    db_pool_capacity.labels(name).set(capacity)
+    in_use = db_pool_in_use.labels(name)
+    event.listen(engine, "checkout", lambda *args: in_use.inc())
+    event.listen(engine, "checkin", lambda *args: in_use.dec())
+
+
+def record_pool_wait(name: str, waited: float, timed_out: bool = False) -> None:
+    db_pool_wait.labels(name).observe(waited)
+    if timed_out:
+        db_pool_timeouts.labels(name).inc()
+
+
+def record_rate_limited(policy: str) -> None:
+    rate_limited.labels(policy).inc()
+
+
+def record_outbox(result: str, count: int = 1) -> None:
+    if count:
+        outbox_events.labels(result).inc(count)
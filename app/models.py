@@ -1,7 +1,12 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Index, JSON, literal_column, text
 from datetime import datetime, timezone
 from .database import Base
 
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
 class Task(Base):
     __tablename__ = "tasks"
     
@@ -10,6 +15,59 @@ class Task(Base):
     description = Column(String, nullable=True)
     completed = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    # Both change on every UPDATE, including Core/bulk ones; they back ETag / Last-Modified.
+    # Rows that predate the column have updated_at NULL (created_at is used instead).
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
+    version = Column(
+        Integer, nullable=False, default=1, server_default=text("1"), onupdate=literal_column("version + 1")
+    )
+
+    __table_args__ = (
+        # Keyset pagination walks tasks in (created_at, id) order
+        Index("ix_tasks_created_at_id", "created_at", "id"),
+        # /tasks/search?completed=... seeks on completed, then walks the same order
+        Index("ix_tasks_completed_created_at_id", "completed", "created_at", "id"),
+    )
+
+
+class TaskCounter(Base):
+    """
+    Task counts kept current by database triggers (see app/task_stats.py).
+    The rows are summed on read; PostgreSQL spreads writes over several slots.
+    """
+    __tablename__ = "task_counters"
+
+    slot = Column(Integer, primary_key=True, autoincrement=False)
+    total = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+
+
+class OutboxEvent(Base):
+    """
+    Side effect of a task write, inserted in the same transaction as the write
+    and delivered afterwards by the dispatcher in app/outbox.py. Delivered
+    events are deleted; ones that ran out of attempts stay with status "failed".
+    """
+    __tablename__ = "outbox_events"
+
+    id = Column(Integer, primary_key=True)
+    # Sent with every delivery attempt so receivers can drop duplicates
+    idempotency_key = Column(String, unique=True, nullable=False)
+    event_type = Column(String, nullable=False)   # task.created / task.updated / task.deleted
+    task_id = Column(Integer, nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(String, nullable=False, default="pending")   # pending | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    # Next attempt (retry backoff) or end of the current claim's lease
+    available_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+    claimed_by = Column(String, nullable=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+
+    __table_args__ = (
+        # The dispatcher polls for due pending events in available_at order
+        Index("ix_outbox_events_status_available_at", "status", "available_at"),
+    )
 
 
 class User(Base):
@@ -0,0 +1,341 @@
+# app/outbox.py
+#
+# Transactional outbox for side effects of task writes (webhooks, notifications).
+# Write routes insert an OutboxEvent in the same transaction as the task change,
+# so an event exists exactly when the change committed, and the request still
+# makes a single commit without waiting on any receiver. The Dispatcher,
+# started with the app lifespan, then loops:
+#   claim    lease up to OUTBOX_BATCH_SIZE due events to this pass (FOR UPDATE
+#            SKIP LOCKED on PostgreSQL), so workers don't send the same events
+#   deliver  to every sink, at most OUTBOX_CONCURRENCY events at a time
+#   settle   delete delivered events; reschedule failures with exponential
+#            backoff, or mark them "failed" after OUTBOX_MAX_ATTEMPTS. Calls the
+#            webhook client refused (circuit open, no free slot) are deferred
+#            to its retry_after without using up an attempt
+# Delivery is at least once (events whose claim expires are sent again) and
+# unordered; receivers drop duplicates by the event id, which is also sent as
+# the Idempotency-Key header, and can order updates by data.version.
+
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+import asyncio
+import json
+import logging
+import os
+import random
+import uuid
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import metrics, models, schemas
+from app.database import redis_client
+from app.http_client import OutboundClient, OutboundUnavailable
+from app.search import as_utc
+
+logger = logging.getLogger("api_logger")
+
+OUTBOX_WEBHOOK_URL = os.getenv("OUTBOX_WEBHOOK_URL", "")              # POST every event here, empty = off
+OUTBOX_NOTIFY_CHANNEL = os.getenv("OUTBOX_NOTIFY_CHANNEL", "")        # Redis PUBLISH channel, empty = off
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))        # events claimed per pass
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "10"))       # deliveries in flight
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))  # seconds between passes when idle
+OUTBOX_LEASE = float(os.getenv("OUTBOX_LEASE", "300"))                # seconds before a claimed event is sent again
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "1"))    # seconds, doubled per failed attempt
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "600"))    # seconds
+
+Sink = Callable[[dict], Awaitable[None]]
+
+# Webhooks get their own client: a failing receiver must not open the circuit
+# for other outbound calls (and theirs must not block deliveries)
+webhooks = OutboundClient(concurrency=OUTBOX_CONCURRENCY, cache_ttl=0)
+
+
+# ----------------------------
+# Sinks
+# ----------------------------
+async def post_webhook(event: dict) -> None:
+    """POST the event to OUTBOX_WEBHOOK_URL; any error or non-2xx response is retried."""
+    await webhooks.post_json(OUTBOX_WEBHOOK_URL, event, headers={"Idempotency-Key": event["id"]})
+
+
+async def publish_notification(event: dict) -> None:
+    await run_in_threadpool(redis_client.publish, OUTBOX_NOTIFY_CHANNEL, json.dumps(event))
+
+
+def configured_sinks() -> List[Sink]:
+    sinks = []
+    if OUTBOX_WEBHOOK_URL:
+        sinks.append(post_webhook)
+    if OUTBOX_NOTIFY_CHANNEL:
+        if redis_client is None:
+            logger.warning("OUTBOX_NOTIFY_CHANNEL is set but Redis is unavailable; notifications are off")
+        else:
+            sinks.append(publish_notification)
+    return sinks
+
+
+sinks = configured_sinks()
+
+# Without sinks nothing would deliver the events, so writes don't record any
+enabled = bool(sinks)
+
+
+# ----------------------------
+# Recording (inside the write's transaction)
+# ----------------------------
+def task_payload(task) -> dict:
+    """
+    TaskResponse JSON for `task`. Timestamps are always UTC ("Z"): a just
+    flushed task has aware datetimes, rows read back from SQLite naive ones.
+    """
+    response = schemas.TaskResponse.model_validate(task)
+    timestamps = {name: as_utc(value) for name, value in response if isinstance(value, datetime)}
+    return response.model_copy(update=timestamps).model_dump(mode="json")
+
+
+def event_rows(event_type: str, tasks: Iterable) -> list:
+    """
+    Outbox rows for `tasks`: ORM objects or rows with the task columns, or
+    task ids for "task.deleted". Empty when the outbox is off.
+    """
+    if not enabled:
+        return []
+    now = models.utcnow()
+    rows = []
+    for task in tasks:
+        if event_type == "task.deleted":
+            data = {"id": task}
+        else:
+            data = task_payload(task)
+        rows.append(
+            {
+                "idempotency_key": uuid.uuid4().hex,
+                "event_type": event_type,
+                "task_id": data["id"],
+                "payload": data,
+                "available_at": now,
+                "created_at": now,
+            }
+        )
+    return rows
+
+
+def record(db: Session, event_type: str, tasks: Iterable) -> None:
+    """Add events to `db`'s transaction; they are only visible to the dispatcher once it commits."""
+    rows = event_rows(event_type, tasks)
+    if rows:
+        db.execute(insert(models.OutboxEvent), rows)
+
+
+async def record_async(db: AsyncSession, event_type: str, tasks: Iterable) -> None:
+    rows = event_rows(event_type, tasks)
+    if rows:
+        await db.execute(insert(models.OutboxEvent), rows)
+
+
+# ----------------------------
+# Claiming / Settling
+# ----------------------------
+def claim(engine, token: str, limit: int, lease: float) -> list:
+    """
+    Lease up to `limit` due pending events to `token` and return them. Their
+    attempt is counted now, so an event whose dispatcher dies mid-delivery
+    still runs out of attempts eventually.
+    """
+    event = models.OutboxEvent
+    now = models.utcnow()
+    due = (
+        select(event.id)
+        .where(event.status == "pending", event.available_at <= now)
+        .order_by(event.available_at, event.id)
+        .limit(limit)
+    )
+    if engine.dialect.name == "postgresql":
+        # Concurrent dispatchers take different events instead of waiting on each other's
+        due = due.with_for_update(skip_locked=True)
+    with engine.begin() as conn:
+        conn.execute(
+            update(event)
+            .where(event.id.in_(due))
+            .values(
+                claimed_by=token,
+                available_at=now + timedelta(seconds=lease),
+                attempts=event.attempts + 1,
+            )
+        )
+        return conn.execute(select(event.__table__).where(event.claimed_by == token).order_by(event.id)).all()
+
+
+def settle(engine, token: str, delivered: List[int], failures: Dict[int, dict]) -> None:
+    """
+    Delete delivered events and apply `failures` (id -> column values). Rows
+    whose lease ran out and were claimed again by another pass are left alone.
+    """
+    event = models.OutboxEvent
+    with engine.begin() as conn:
+        if delivered:
+            conn.execute(delete(event).where(event.id.in_(delivered), event.claimed_by == token))
+        for event_id, values in failures.items():
+            conn.execute(
+                update(event)
+                .where(event.id == event_id, event.claimed_by == token)
+                .values(claimed_by=None, **values)
+            )
+
+
+def backoff(attempts: int, base: float = OUTBOX_BACKOFF_BASE, cap: float = OUTBOX_BACKOFF_MAX) -> float:
+    """Seconds to wait after `attempts` failed deliveries: doubling, capped, with jitter."""
+    return random.uniform(0.5, 1.0) * min(cap, base * 2 ** (attempts - 1))
+
+
+def message(event) -> dict:
+    """What sinks receive for an outbox row."""
+    return {
+        "id": event.idempotency_key,
+        "type": event.event_type,
+        "task_id": event.task_id,
+        "created_at": as_utc(event.created_at).isoformat(),
+        "attempt": event.attempts,
+        "data": event.payload,
+    }
+
+
+# ----------------------------
+# Admin
+# ----------------------------
+def stats(engine) -> dict:
+    event = models.OutboxEvent
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(event.status, func.count(), func.min(event.created_at)).group_by(event.status)
+        ).all()
+    counts = {status: (count, oldest) for status, count, oldest in rows}
+    oldest = counts.get("pending", (0, None))[1]
+    return {
+        "enabled": enabled,
+        "sinks": [sink.__name__ for sink in dispatcher.sinks],
+        "pending": counts.get("pending", (0, None))[0],
+        "failed": counts.get("failed", (0, None))[0],
+        "oldest_pending": as_utc(oldest).isoformat() if oldest is not None else None,
+    }
+
+
+def retry_failed(engine) -> int:
+    """Give events that ran out of attempts a fresh set; returns how many were requeued."""
+    event = models.OutboxEvent
+    with engine.begin() as conn:
+        return conn.execute(
+            update(event)
+            .where(event.status == "failed")
+            .values(status="pending", attempts=0, available_at=models.utcnow(), claimed_by=None)
+        ).rowcount
+
+
+# ----------------------------
+# Dispatcher
+# ----------------------------
+class Dispatcher:
+    """Drains the outbox off the request path while the app is up (see module comment)."""
+
+    def __init__(
+        self,
+        sinks: List[Sink],
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        concurrency: int = OUTBOX_CONCURRENCY,
+        poll_interval: float = OUTBOX_POLL_INTERVAL,
+        lease: float = OUTBOX_LEASE,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+    ):
+        self.sinks = sinks
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._task: Optional[asyncio.Task] = None
+
+    async def deliver(self, event) -> None:
+        payload = message(event)
+        for sink in self.sinks:
+            await sink(payload)
+
+    async def drain(self, engine) -> dict:
+        """One pass: claim a batch, deliver it, record the outcome. Returns counts per result."""
+        token = uuid.uuid4().hex
+        events = await run_in_threadpool(claim, engine, token, self.batch_size, self.lease)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def attempt(event) -> Optional[Exception]:
+            async with semaphore:
+                try:
+                    await self.deliver(event)
+                except Exception as e:
+                    return e
+                return None
+
+        errors = await asyncio.gather(*(attempt(event) for event in events))
+
+        now = models.utcnow()
+        delivered, failures = [], {}
+        for event, error in zip(events, errors):
+            if error is None:
+                delivered.append(event.id)
+                continue
+            values = {"last_error": f"{type(error).__name__}: {error}"[:500]}
+            if isinstance(error, OutboundUnavailable):
+                # Never sent: wait out the breaker and give the attempt back
+                values["attempts"] = event.attempts - 1
+                values["available_at"] = now + timedelta(seconds=error.retry_after)
+            elif event.attempts >= self.max_attempts:
+                values["status"] = "failed"
+                logger.warning(
+                    f"Outbox event {event.idempotency_key} ({event.event_type}) failed "
+                    f"after {event.attempts} attempts: {values['last_error']}"
+                )
+            else:
+                values["available_at"] = now + timedelta(seconds=backoff(event.attempts))
+            failures[event.id] = values
+        await run_in_threadpool(settle, engine, token, delivered, failures)
+
+        counts = {"claimed": len(events), "delivered": len(delivered), "retried": 0, "deferred": 0, "failed": 0}
+        for values in failures.values():
+            if values.get("status") == "failed":
+                counts["failed"] += 1
+            else:
+                counts["deferred" if "attempts" in values else "retried"] += 1
+        for result in ("delivered", "retried", "deferred", "failed"):
+            metrics.record_outbox(result, counts[result])
+        return counts
+
+    async def _run(self, engine):
+        while True:
+            try:
+                claimed = (await self.drain(engine))["claimed"]
+            except Exception as e:
+                logger.warning(f"Outbox dispatch failed: {e}")
+                claimed = 0
+            # A full batch means there is probably more due; keep going without sleeping
+            if claimed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    def start(self, engine):
+        if self.sinks and self._task is None:
+            self._task = asyncio.create_task(self._run(engine))
+
+    async def stop(self):
+        # Events claimed by an interrupted pass are sent again once their lease ends
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await webhooks.close()
+
+
+dispatcher = Dispatcher(sinks)
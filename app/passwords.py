@@ -0,0 +1,152 @@
+# app/passwords.py
+#
+# bcrypt hashing/verification off the request path.
+# Each call burns ~250ms of CPU at cost 12; running it inline (or in the
+# shared threadpool) lets a login spike starve every other endpoint on the
+# worker. Calls go to a dedicated process pool instead, with a bounded number
+# in flight: beyond that we shed load with 503 rather than queueing forever.
+#
+# Keep this module free of app imports: spawned pool processes import it.
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional, Tuple
+import asyncio
+import multiprocessing
+import os
+import threading
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# The pool is per app worker: by default the cores are split between the
+# uvicorn workers (WEB_CONCURRENCY, which uvicorn also reads for --workers)
+WEB_CONCURRENCY = max(int(os.getenv("WEB_CONCURRENCY", "1")), 1)
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY))))   # 0 = inline
+PASSWORD_QUEUE_SIZE = int(os.getenv("PASSWORD_QUEUE_SIZE", str(max(PASSWORD_WORKERS, 1) * 4)))
+
+# Hashes below BCRYPT_ROUNDS are reported by verify_and_update() so they can be
+# upgraded on the next successful login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
+
+
+# ------------------------------
+# Functions run in the pool
+# ------------------------------
+
+def warm_up() -> bool:
+    return True
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(matches, new hash if the stored one uses an outdated cost factor)"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+# ------------------------------
+# Password Service
+# ------------------------------
+
+class PasswordService:
+    """
+    Runs bcrypt in a ProcessPoolExecutor with at most `workers + queue_size`
+    calls in flight. Further calls fail fast with 503 + Retry-After.
+    With workers=0, calls run inline in the caller's thread.
+    """
+
+    def __init__(self, workers: int = PASSWORD_WORKERS, queue_size: int = PASSWORD_QUEUE_SIZE):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.in_flight = 0
+        self.rejected = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Create the pool and start its processes ahead of the first request."""
+        if self.workers <= 0:
+            return
+        with self._lock:
+            if self._executor is None:
+                # spawn, not fork: the app process has threads (Redis reconnect, anyio)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                for _ in range(self.workers):
+                    self._executor.submit(warm_up)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+    def _acquire(self):
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Authentication is busy, please retry shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self.in_flight += 1
+
+    def _release(self, _future=None):
+        with self._lock:
+            self.in_flight -= 1
+
+    def submit(self, fn, *args) -> Future:
+        self._acquire()
+        try:
+            if self.workers > 0:
+                self.start()
+                future = self._executor.submit(fn, *args)
+            else:
+                future = Future()
+                future.set_result(fn(*args))
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    # Async callers (event loop is never blocked)
+    async def hash(self, password: str) -> str:
+        if self.workers <= 0:
+            return await run_in_threadpool(self.hash_blocking, password)
+        return await asyncio.wrap_future(self.submit(hash_password, password))
+
+    async def verify(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        if self.workers <= 0:
+            return await run_in_threadpool(self.verify_blocking, plain_password, hashed_password)
+        return await asyncio.wrap_future(self.submit(verify_and_update, plain_password, hashed_password))
+
+    # Sync callers (threadpool handlers); the thread waits, the CPU work happens elsewhere
+    def hash_blocking(self, password: str) -> str:
+        return self.submit(hash_password, password).result()
+
+    def verify_blocking(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return self.submit(verify_and_update, plain_password, hashed_password).result()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+        }
+
+
+password_service = PasswordService()
@@ -0,0 +1,380 @@
+# app/profiling.py
+#
+# Opt-in per-request profiling and an always-on slow-query log.
+#
+# A request is profiled when an admin sends `X-Profile: 1` with their bearer
+# token, or when it is picked by PROFILE_SAMPLE_RATE. Profiled requests record
+# a cProfile call tree of the endpoint (routers use ProfiledRoute) and every
+# SQL statement with its duration. Results are kept per worker (and in Redis
+# when available) under a server-generated ID, returned in X-Profile-ID, and
+# read back through /v1/admin/profiles. The ID is never the request ID, which
+# clients can choose (X-Request-ID) and so could overwrite others' profiles.
+
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from functools import wraps
+from time import perf_counter
+from typing import Optional
+import asyncio
+import cProfile
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+
+from app import metrics, utils
+
+try:
+    from app.database import redis_client
+except Exception:
+    redis_client = None
+
+logger = logging.getLogger("api_logger.sql")
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))      # share of requests profiled
+PROFILE_STORE_SIZE = int(os.getenv("PROFILE_STORE_SIZE", "100"))        # profiles kept per worker
+PROFILE_REDIS_TTL = int(os.getenv("PROFILE_REDIS_TTL", "3600"))         # seconds, 0 = local only
+PROFILE_MAX_QUERIES = int(os.getenv("PROFILE_MAX_QUERIES", "500"))      # statements kept per profile
+PROFILE_TREE_DEPTH = int(os.getenv("PROFILE_TREE_DEPTH", "30"))
+PROFILE_MIN_FRACTION = float(os.getenv("PROFILE_MIN_FRACTION", "0.01"))  # hide calls below 1% of the total
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))                # always-on slow-query log, <0 = off
+
+
+# ------------------------------
+# Profile Records
+# ------------------------------
+
+@dataclass
+class RequestProfile:
+    id: str
+    method: str
+    path: str
+    trigger: str                              # "header" or "sample"
+    request_id: Optional[str] = None
+    started_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    status_code: Optional[int] = None
+    duration_ms: float = 0.0
+    query_count: int = 0
+    query_ms: float = 0.0
+    queries: list = field(default_factory=list)
+    call_tree: Optional[dict] = None
+    top_functions: list = field(default_factory=list)
+
+    def add_query(self, statement: str, duration_ms: float):
+        self.query_count += 1
+        self.query_ms = round(self.query_ms + duration_ms, 3)
+        if len(self.queries) < PROFILE_MAX_QUERIES:
+            self.queries.append({"statement": statement, "duration_ms": round(duration_ms, 3)})
+
+    def add_profiler(self, profiler: cProfile.Profile, root):
+        stats = pstats.Stats(profiler).stats
+        self.call_tree = call_tree(stats, root)
+        self.top_functions = top_functions(stats)
+
+    def summary(self) -> dict:
+        return {
+            key: value
+            for key, value in asdict(self).items()
+            if key not in ("queries", "call_tree", "top_functions")
+        }
+
+
+profile_var: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+
+def function_label(func) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name                     # builtins, e.g. <method 'execute' ...>
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def call_tree(stats: dict, root) -> Optional[dict]:
+    """
+    Nest cProfile's caller->callee edges into a tree starting at `root`.
+    Each edge carries its own cumulative time, so a function called from two
+    places shows up under both with the time spent on each path.
+    """
+    code = root.__code__
+    root_key = (code.co_filename, code.co_firstlineno, code.co_name)
+    if root_key not in stats:
+        return None
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge))
+    total = stats[root_key][3] or 1e-9
+
+    def node(func, calls, cumulative, path):
+        children = []
+        if len(path) < PROFILE_TREE_DEPTH:
+            for child, (_, child_calls, _, child_cumulative) in sorted(
+                callees.get(func, ()), key=lambda item: -item[1][3]
+            ):
+                if child in path or child_cumulative / total < PROFILE_MIN_FRACTION:
+                    continue
+                children.append(node(child, child_calls, child_cumulative, path | {child}))
+        return {
+            "function": function_label(func),
+            "calls": calls,
+            "total_ms": round(cumulative * 1000, 3),
+            "children": children,
+        }
+
+    _, calls, _, cumulative, _ = stats[root_key]
+    return node(root_key, calls, cumulative, {root_key})
+
+
+def top_functions(stats: dict, limit: int = 25) -> list:
+    """Flat view: functions by own (not cumulative) time."""
+    ranked = sorted(stats.items(), key=lambda item: -item[1][2])[:limit]
+    return [
+        {
+            "function": function_label(func),
+            "calls": calls,
+            "own_ms": round(own * 1000, 3),
+            "total_ms": round(cumulative * 1000, 3),
+        }
+        for func, (_, calls, own, cumulative, _) in ranked
+    ]
+
+
+# ------------------------------
+# Profile Store
+# ------------------------------
+
+class ProfileStore:
+    """Most recent profiles in this worker, mirrored to Redis so any worker can serve them."""
+
+    def __init__(self, redis_client=None, maxsize: int = PROFILE_STORE_SIZE, redis_ttl: int = PROFILE_REDIS_TTL):
+        self.redis = redis_client
+        self.maxsize = maxsize
+        self.redis_ttl = redis_ttl
+        self._profiles: "OrderedDict[str, RequestProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.maxsize:
+                self._profiles.popitem(last=False)
+        if self.redis is not None and self.redis_ttl > 0:
+            try:
+                self.redis.setex(f"profile:{profile.id}", self.redis_ttl, json.dumps(asdict(profile)))
+            except Exception as e:
+                logger.warning(f"Profile Redis write skipped: {e}")
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        with self._lock:
+            profile = self._profiles.get(profile_id)
+        if profile is not None:
+            return asdict(profile)
+        if self.redis is not None and self.redis_ttl > 0:
+            try:
+                raw = self.redis.get(f"profile:{profile_id}")
+                if raw:
+                    return json.loads(raw)
+            except Exception as e:
+                logger.warning(f"Profile Redis read skipped: {e}")
+        return None
+
+    def recent(self) -> list:
+        """Summaries of this worker's profiles, newest first."""
+        with self._lock:
+            profiles = list(self._profiles.values())
+        return [profile.summary() for profile in reversed(profiles)]
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+profile_store = ProfileStore(redis_client)
+
+
+# ------------------------------
+# Endpoint Profiling (route class)
+# ------------------------------
+
+# One profiler at a time: on the event loop cProfile would see every request,
+# and Python 3.12+ refuses a second active profiler anywhere in the process.
+# Requests that find it taken simply run unprofiled.
+_profiler_lock = threading.Lock()
+
+
+def _start_profiler() -> Optional[cProfile.Profile]:
+    """An enabled profiler, or None while another request (or tool) holds it."""
+    if not _profiler_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:   # Python 3.12+: another profiling tool is active
+        _profiler_lock.release()
+        return None
+    return profiler
+
+
+def _stop_profiler(profiler: cProfile.Profile, profile: RequestProfile, endpoint) -> None:
+    profiler.disable()
+    _profiler_lock.release()
+    profile.add_profiler(profiler, endpoint)
+
+
+def profiled(endpoint):
+    """Run `endpoint` under cProfile when the current request is being profiled."""
+    if getattr(endpoint, "__profiled__", False):
+        # include_router() rebuilds routes from the already wrapped endpoint
+        return endpoint
+    if asyncio.iscoroutinefunction(endpoint):
+        @wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            profile = profile_var.get()
+            profiler = _start_profiler() if profile is not None else None
+            if profiler is None:
+                return await endpoint(*args, **kwargs)
+            # Other requests interleaving on the loop are recorded too, but
+            # only calls reached from this endpoint end up in its tree
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _stop_profiler(profiler, profile, endpoint)
+
+        async_wrapper.__profiled__ = True
+        return async_wrapper
+
+    @wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profile = profile_var.get()
+        profiler = _start_profiler() if profile is not None else None
+        if profiler is None:
+            return endpoint(*args, **kwargs)
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            _stop_profiler(profiler, profile, endpoint)
+
+    wrapper.__profiled__ = True
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose endpoint is profiled for requests picked by ProfilingMiddleware."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, profiled(endpoint), **kwargs)
+
+
+# ------------------------------
+# SQL Tracing / Slow-query Log
+# ------------------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get("query_started")
+    if not stack:
+        return
+    duration_ms = (perf_counter() - stack.pop()) * 1000
+    profile = profile_var.get()
+    if profile is not None:
+        profile.add_query(statement, duration_ms)
+    if 0 <= SLOW_QUERY_MS <= duration_ms:
+        metrics.slow_queries.inc()
+        logger.warning(
+            "slow query",
+            extra={"fields": {"statement": statement, "duration_ms": round(duration_ms, 3), "executemany": executemany}},
+        )
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute does not fire for failed statements
+    stack = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if stack:
+        stack.pop()
+
+
+def trace_queries(engine):
+    """Time every statement on `engine` (use async_engine.sync_engine for async engines)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+# ------------------------------
+# Middleware
+# ------------------------------
+
+def _bearer_is_admin(headers) -> bool:
+    for name, value in headers:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer":
+                return False
+            payload = utils.decode_access_token(token)
+            return bool(payload) and payload.get("role") == "admin"
+    return False
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware deciding which requests are profiled.
+    `X-Profile` is only honoured with an admin token (checked from the JWT
+    role claim, no database lookup); non-admins are silently ignored.
+    Must run inside RequestContextMiddleware so the request ID is set.
+    """
+
+    def __init__(self, app, sample_rate: float = PROFILE_SAMPLE_RATE, store: ProfileStore = profile_store):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.store = store
+
+    def trigger(self, scope) -> Optional[str]:
+        headers = scope["headers"]
+        if any(name == PROFILE_HEADER for name, _ in headers) and _bearer_is_admin(headers):
+            return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        trigger = self.trigger(scope) if scope["type"] == "http" else None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(
+            id=os.urandom(8).hex(),
+            method=scope["method"],
+            path=scope["path"],
+            trigger=trigger,
+            request_id=scope.get("state", {}).get("request_id"),
+        )
+        token = profile_var.set(profile)
+        started = perf_counter()
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+                MutableHeaders(scope=message)["X-Profile-ID"] = profile.id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profile.duration_ms = round((perf_counter() - started) * 1000, 3)
+            profile_var.reset(token)
+            # may write to Redis; keep it off the event loop
+            await run_in_threadpool(self.store.add, profile)
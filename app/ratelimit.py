@@ -0,0 +1,508 @@
+# app/ratelimit.py
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from math import ceil
+from typing import Dict, Optional
+import json
+import logging
+import os
+import threading
+import time
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.routing import compile_path
+import redis
+
+from app import metrics
+
+try:
+    from app.database import REDIS_URL, redis_client
+except Exception:
+    REDIS_URL, redis_client = None, None
+
+logger = logging.getLogger("api_logger.ratelimit")
+
+RATE_LIMIT = int(os.getenv("RATE_LIMIT", "5"))            # requests
+RATE_PERIOD = float(os.getenv("RATE_PERIOD", "60"))       # seconds
+RATE_LIMIT_ALGORITHM = os.getenv("RATE_LIMIT_ALGORITHM", "fixed_window")
+RATE_LIMIT_LOCAL_MAX_KEYS = int(os.getenv("RATE_LIMIT_LOCAL_MAX_KEYS", "100000"))
+RATE_LIMIT_LOCAL_SHARDS = int(os.getenv("RATE_LIMIT_LOCAL_SHARDS", "16"))
+RATE_LIMIT_REDIS_RETRY = float(os.getenv("RATE_LIMIT_REDIS_RETRY", "5"))    # seconds
+# Every request waits on the limiter, so a Redis that stops answering must
+# fail fast (and fall back to the local buckets) instead of holding threads
+RATE_LIMIT_REDIS_TIMEOUT = float(os.getenv("RATE_LIMIT_REDIS_TIMEOUT", "0.25"))   # seconds
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: float          # seconds until the budget is restored
+
+    def headers(self) -> dict:
+        reset = str(max(ceil(self.reset), 0))
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": reset,
+        }
+        if not self.allowed:
+            headers["Retry-After"] = reset
+        return headers
+
+
+# ------------------------------
+# Algorithms
+# ------------------------------
+# Every algorithm is a server-side Lua script, so a decision is one EVALSHA
+# round trip and is atomic across workers. Scripts that need the time read
+# it from Redis (TIME) so worker clock skew does not matter.
+# All scripts take KEYS[1] = bucket key, ARGV[1] = limit, ARGV[2] = period in ms
+# and return {allowed (1/0), remaining, ms until the budget is restored}.
+
+NOW_MS = """
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+"""
+
+
+class RateLimiter:
+    """
+    Strategy interface for rate-limiting algorithms.
+    Subclasses provide a Lua `script`; `hit()` runs it once per decision.
+    """
+
+    name = ""
+    script = ""
+
+    def __init__(self, client, limit: int = RATE_LIMIT, period: float = RATE_PERIOD):
+        self.redis = client
+        self.limit = limit
+        self.period = period
+        # register_script() calls EVALSHA and only falls back to loading the
+        # script when Redis reports NOSCRIPT (e.g. after a restart)
+        self._script = client.register_script(self.script) if client is not None else None
+
+    def hit(self, key: str) -> RateLimitResult:
+        allowed, remaining, reset_ms = self._script(
+            keys=[f"{key}:{self.name}"], args=[self.limit, int(self.period * 1000)]
+        )
+        return RateLimitResult(bool(allowed), self.limit, int(remaining), int(reset_ms) / 1000)
+
+
+class FixedWindowLimiter(RateLimiter):
+    """Counter that resets every `period`. Cheapest, but allows 2x bursts at window edges."""
+
+    name = "fixed_window"
+    script = """
+local current = redis.call('INCR', KEYS[1])
+local ttl = redis.call('PTTL', KEYS[1])
+if ttl < 0 then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    ttl = tonumber(ARGV[2])
+end
+local limit = tonumber(ARGV[1])
+if current > limit then
+    return {0, 0, ttl}
+end
+return {1, limit - current, ttl}
+"""
+
+
+class SlidingWindowCounterLimiter(RateLimiter):
+    """
+    Weights the previous window's count by how much of it still overlaps the
+    sliding window. Smooths out the fixed-window edge burst using one small hash.
+    """
+
+    name = "sliding_window"
+    script = NOW_MS + """
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local window = math.floor(now / period)
+local elapsed = now - window * period
+
+local state = redis.call('HMGET', KEYS[1], 'window', 'current', 'previous')
+local stored = tonumber(state[1])
+local current, previous = 0, 0
+if stored == window then
+    current, previous = tonumber(state[2]), tonumber(state[3])
+elseif stored == window - 1 then
+    previous = tonumber(state[2])
+end
+
+local weight = (period - elapsed) / period
+local estimated = previous * weight + current
+if estimated + 1 > limit then
+    -- wait until the previous window has decayed enough for one more request
+    local wait
+    if current < limit and previous > 0 then
+        wait = period * (1 - (limit - 1 - current) / previous) - elapsed
+    else
+        wait = period - elapsed
+        if current > 0 then
+            wait = wait + math.max(0, period * (1 - (limit - 1) / current))
+        end
+    end
+    return {0, 0, math.ceil(math.max(wait, 1))}
+end
+
+redis.call('HSET', KEYS[1], 'window', window, 'current', current + 1, 'previous', previous)
+redis.call('PEXPIRE', KEYS[1], period * 2)
+return {1, math.floor(limit - estimated - 1), math.ceil(period - elapsed)}
+"""
+
+
+class GCRALimiter(RateLimiter):
+    """
+    Generic Cell Rate Algorithm: stores one "theoretical arrival time" per key.
+    Requests are spaced `period / limit` apart with a burst of up to `limit`.
+    """
+
+    name = "gcra"
+    script = NOW_MS + """
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local interval = period / limit
+-- epsilon absorbs float error from millisecond epoch timestamps
+local epsilon = 1e-3
+
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+local allow_at = new_tat - period
+if allow_at - now > epsilon then
+    return {0, 0, math.ceil(allow_at - now)}
+end
+
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now))
+return {1, math.max(0, math.floor((now - allow_at) / interval + epsilon)), math.ceil(new_tat - now)}
+"""
+
+
+class TokenBucketLimiter(RateLimiter):
+    """Bucket of `limit` tokens refilled continuously at `limit / period` per second."""
+
+    name = "token_bucket"
+    script = NOW_MS + """
+local capacity = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local rate = capacity / period
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], period)
+
+if allowed == 0 then
+    return {0, 0, math.ceil((1 - tokens) / rate)}
+end
+return {1, math.floor(tokens), math.ceil((capacity - tokens) / rate)}
+"""
+
+
+ALGORITHMS = {
+    limiter.name: limiter
+    for limiter in (FixedWindowLimiter, SlidingWindowCounterLimiter, GCRALimiter, TokenBucketLimiter)
+}
+
+
+# ------------------------------
+# Local fallback
+# ------------------------------
+
+class LocalTokenBucket:
+    """
+    Per-worker token buckets used while Redis is unavailable.
+    Keys are spread over `shards` independently locked LRU maps, so concurrent
+    requests rarely contend and memory stays bounded at `max_keys` clients.
+    Budgets are per worker: with N workers a client can get up to N x limit.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_LOCAL_MAX_KEYS, shards: int = RATE_LIMIT_LOCAL_SHARDS):
+        self._shards = [OrderedDict() for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._max_keys_per_shard = max(1, max_keys // shards)
+
+    def hit(self, key: str, limit: int, period: float) -> RateLimitResult:
+        index = hash(key) % len(self._shards)
+        buckets = self._shards[index]
+        rate = limit / period
+        now = time.monotonic()
+        with self._locks[index]:
+            tokens, updated = buckets.pop(key, (limit, now))
+            tokens = min(limit, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            buckets[key] = (tokens, now)
+            if len(buckets) > self._max_keys_per_shard:
+                buckets.popitem(last=False)
+
+        if not allowed:
+            return RateLimitResult(False, limit, 0, (1 - tokens) / rate)
+        return RateLimitResult(True, limit, int(tokens), (limit - tokens) / rate)
+
+    def clear(self):
+        for lock, buckets in zip(self._locks, self._shards):
+            with lock:
+                buckets.clear()
+
+    def __len__(self):
+        return sum(len(buckets) for buckets in self._shards)
+
+
+def connect(url: str, timeout: float = RATE_LIMIT_REDIS_TIMEOUT):
+    """The limiter's own Redis client, with connect and command timeouts of `timeout`."""
+    return metrics.instrument_redis(redis.Redis.from_url(
+        url, decode_responses=True, socket_timeout=timeout, socket_connect_timeout=timeout
+    ))
+
+
+class RedisBackend:
+    """
+    Tracks whether Redis can be used for rate limiting.
+    After a failure, requests go straight to the local buckets while a
+    background thread pings Redis every `retry_interval` seconds, so an
+    outage costs one failed call instead of one per request.
+    """
+
+    def __init__(
+        self,
+        client,
+        url: Optional[str] = REDIS_URL,
+        retry_interval: float = RATE_LIMIT_REDIS_RETRY,
+        timeout: float = RATE_LIMIT_REDIS_TIMEOUT,
+    ):
+        self.client = client
+        self.url = url
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        self.available = client is not None
+        self._lock = threading.Lock()
+        self._reconnecting = False
+        self._stop = threading.Event()
+        if client is None and url:
+            self.mark_down()
+
+    def mark_down(self):
+        with self._lock:
+            self.available = False
+            if self._reconnecting:
+                return
+            self._reconnecting = True
+        threading.Thread(target=self._reconnect, name="ratelimit-redis-reconnect", daemon=True).start()
+
+    def _reconnect(self):
+        while not self._stop.wait(self.retry_interval):
+            try:
+                client = self.client or connect(self.url, self.timeout)
+                client.ping()
+            except redis.RedisError:
+                continue
+            with self._lock:
+                self.client = client
+                self.available = True
+                self._reconnecting = False
+            # limiters hold scripts registered on the previous client
+            _limiters.clear()
+            logger.info("Rate limiter reconnected to Redis")
+            return
+
+    def close(self):
+        self._stop.set()
+
+
+# ------------------------------
+# Policies
+# ------------------------------
+
+@dataclass
+class RateLimitPolicy:
+    """A named budget. `scope` is "user" (token `sub`, falling back to IP) or "ip"."""
+
+    name: str
+    limit: int = RATE_LIMIT
+    period: float = RATE_PERIOD
+    algorithm: str = RATE_LIMIT_ALGORITHM
+    scope: str = "user"
+
+
+def load_policies() -> Dict[str, RateLimitPolicy]:
+    """
+    Per-route budgets from RATE_LIMIT_POLICIES, a JSON object such as
+    {"tasks:batch": {"limit": 2, "period": 60, "algorithm": "gcra", "scope": "ip"}}.
+    Routes without an entry get the RATE_LIMIT/RATE_PERIOD/RATE_LIMIT_ALGORITHM defaults.
+    """
+    try:
+        configured = json.loads(os.getenv("RATE_LIMIT_POLICIES", "{}"))
+    except json.JSONDecodeError as e:
+        logger.warning(f"Ignoring invalid RATE_LIMIT_POLICIES: {e}")
+        configured = {}
+    return {name: RateLimitPolicy(name=name, **options) for name, options in configured.items()}
+
+
+policies = load_policies()
+_limiters: Dict[str, RateLimiter] = {}
+# Not the shared client: the limiter needs much shorter timeouts than the caches
+redis_backend = RedisBackend(connect(REDIS_URL) if redis_client is not None else None)
+local_limiter = LocalTokenBucket()
+
+
+def get_policy(name: str) -> RateLimitPolicy:
+    return policies.get(name) or RateLimitPolicy(name=name)
+
+
+def get_limiter(policy: RateLimitPolicy) -> RateLimiter:
+    limiter = _limiters.get(policy.name)
+    if limiter is None:
+        limiter = ALGORITHMS[policy.algorithm](redis_backend.client, policy.limit, policy.period)
+        _limiters[policy.name] = limiter
+    return limiter
+
+
+def backend_status() -> dict:
+    return {
+        "backend": "redis" if redis_backend.available else "local",
+        "local_keys": len(local_limiter),
+    }
+
+
+def client_identity(request: Request, scope: str) -> Optional[str]:
+    """`user:<sub>` for a valid bearer token when scope is "user", else `ip:<address>`."""
+    if scope == "user":
+        authorization = request.headers.get("authorization", "")
+        if authorization[:7].lower() == "bearer ":
+            from app import utils
+
+            payload = utils.decode_access_token(authorization[7:])
+            if payload and payload.get("sub"):
+                return f"user:{payload['sub']}"
+    if not request.client:
+        return None
+    return f"ip:{request.client.host}"
+
+
+def check(request: Request, policy_name: str = "default") -> Optional[RateLimitResult]:
+    """
+    Count this request against its policy budget and return the decision.
+    Falls back to per-worker token buckets while Redis is unavailable.
+    """
+    policy = get_policy(policy_name)
+    identity = client_identity(request, policy.scope)
+    if identity is None:
+        return None
+
+    key = f"rate:{policy.name}:{identity}"
+    result = None
+    if redis_backend.available:
+        try:
+            result = get_limiter(policy).hit(key)
+        except redis.RedisError as e:
+            logger.warning(f"Rate limiter using local buckets, Redis failed: {e}")
+            redis_backend.mark_down()
+    if result is None:
+        result = local_limiter.hit(key, policy.limit, policy.period)
+    if not result.allowed:
+        metrics.record_rate_limited(policy.name)
+    return result
+
+
+def retry_message(result: RateLimitResult) -> str:
+    return f"Rate limit exceeded. Try again in {max(ceil(result.reset), 0)} seconds"
+
+
+def enforce(request: Request, policy_name: str = "default") -> Optional[RateLimitResult]:
+    """
+    Like check(), but raises 429 once the budget is spent. For use inside
+    handlers; routes listed in ROUTE_POLICIES are already limited by
+    RateLimitMiddleware. The result is kept on `request.state.rate_limit`
+    so the X-RateLimit-* headers can be added to the response.
+    """
+    result = check(request, policy_name)
+    if result is None:
+        return None
+
+    request.state.rate_limit = result
+    if not result.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=retry_message(result),
+            headers=result.headers(),
+        )
+    return result
+
+
+# ------------------------------
+# Middleware
+# ------------------------------
+
+# First match wins, so literal paths must come before `{task_id}`
+ROUTE_POLICIES = (
+    ("/v1/tasks/batch", "tasks:batch"),
+    ("/v1/tasks/export", "tasks:export"),
+    ("/v1/tasks/external-joke", "tasks:external"),
+    ("/v1/tasks/", "tasks"),
+    ("/v1/tasks/{task_id}", "tasks"),
+)
+
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI middleware that applies ROUTE_POLICIES before routing.
+    Throttled requests get a 429 without resolving any dependencies, so
+    they never open a database session or look up the user.
+    """
+
+    def __init__(self, app, routes=ROUTE_POLICIES):
+        self.app = app
+        self.routes = [(compile_path(path)[0], policy) for path, policy in routes]
+
+    def policy_for(self, path: str) -> Optional[str]:
+        for pattern, policy in self.routes:
+            if pattern.match(path):
+                return policy
+        return None
+
+    async def __call__(self, scope, receive, send):
+        policy = self.policy_for(scope["path"]) if scope["type"] == "http" else None
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        # The Redis client is synchronous; keep it off the event loop
+        result = await run_in_threadpool(check, Request(scope), policy)
+        if result is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not result.allowed:
+            response = JSONResponse(
+                {"detail": retry_message(result)},
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers=result.headers(),
+            )
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).update(result.headers())
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
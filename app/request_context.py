@@ -0,0 +1,130 @@
+# app/request_context.py
+#
+# Request ID, timing and access log in one pure ASGI middleware.
+# The ID is taken from an incoming X-Request-ID (so it can be followed across
+# services) or generated, returned in the response header, stored on
+# request.state.request_id, and exposed through a contextvar so handlers and
+# log records pick it up without passing the request around.
+
+from contextvars import ContextVar
+from itertools import count
+from time import perf_counter
+from typing import Optional
+import logging
+import os
+import re
+
+from starlette.datastructures import MutableHeaders
+
+from app.logs import LOG_SAMPLE_RATE, sample_request
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+REQUEST_ID_HEADER = b"x-request-id"
+# Incoming IDs end up in logs and headers: accept only short, plain tokens
+VALID_REQUEST_ID = re.compile(r"[A-Za-z0-9._:-]{1,128}")
+
+
+# ------------------------------
+# ID Generation
+# ------------------------------
+
+# Random per-process prefix + counter: unique like uuid4 but without a
+# urandom call and string formatting of 128 bits per request
+_prefix = os.urandom(6).hex()
+_counter = count(1)
+
+
+def _reset_after_fork():
+    global _prefix, _counter
+    _prefix = os.urandom(6).hex()
+    _counter = count(1)
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def new_request_id() -> str:
+    return f"{_prefix}-{next(_counter):x}"
+
+
+def get_request_id() -> Optional[str]:
+    """The current request's ID, or None outside a request."""
+    return request_id_var.get()
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps records with the current request ID, in the calling thread before they are queued."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_var.get()
+        return True
+
+
+# ------------------------------
+# Middleware
+# ------------------------------
+
+class RequestContextMiddleware:
+    """
+    Pure ASGI replacement for the old @app.middleware("http") handler: no
+    extra task or response streaming wrapper, so streaming responses pass
+    straight through. The access log payload is only built for requests
+    that are actually logged (see LOG_SAMPLE_RATE).
+    """
+
+    def __init__(self, app, logger: logging.Logger, sample_rate: float = LOG_SAMPLE_RATE):
+        self.app = app
+        self.logger = logger
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                value = value.decode("latin-1")
+                if VALID_REQUEST_ID.fullmatch(value):
+                    request_id = value
+                break
+        if request_id is None:
+            request_id = new_request_id()
+
+        state = scope.setdefault("state", {})
+        state["request_id"] = request_id
+        token = request_id_var.set(request_id)
+        status_code = 500
+        started = perf_counter()
+
+        async def send_with_request_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers["X-Request-ID"] = request_id
+                # set by ratelimit.enforce() for routes limited inside the handler
+                rate_limit_result = state.get("rate_limit")
+                if rate_limit_result is not None:
+                    headers.update(rate_limit_result.headers())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            if sample_request(status_code, self.sample_rate) and self.logger.isEnabledFor(logging.INFO):
+                self.logger.info(
+                    "request",
+                    extra={
+                        "fields": {
+                            "method": scope["method"],
+                            "path": scope["path"],
+                            "status_code": status_code,
+                            "duration_ms": round((perf_counter() - started) * 1000, 3),
+                        }
+                    },
+                )
+            request_id_var.reset(token)
@@ -0,0 +1,58 @@
+# app/routers/admin.py
+from fastapi import APIRouter, Depends, HTTPException
+
+from app import models, outbox, task_stats
+from app.database import engine
+from app.dependencies import get_admin
+from app.profiling import profile_store
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+# ----------------------------
+# Request Profiles
+# ----------------------------
+@router.get("/profiles")
+def list_profiles(admin: models.User = Depends(get_admin)):
+    """
+    Recent profiles recorded by this worker, newest first (summaries only).
+    Profile a request by sending `X-Profile: 1` with an admin token.
+    """
+    return profile_store.recent()
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, admin: models.User = Depends(get_admin)):
+    """Full profile: call tree, top functions and every SQL statement with its duration."""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+@router.delete("/profiles", status_code=204)
+def clear_profiles(admin: models.User = Depends(get_admin)):
+    profile_store.clear()
+
+
+# ----------------------------
+# Task Counters
+# ----------------------------
+@router.post("/tasks/stats/reconcile")
+def reconcile_task_stats(admin: models.User = Depends(get_admin)):
+    """Recount tasks now (normally done every TASK_STATS_RECONCILE_INTERVAL) and report the drift fixed."""
+    return task_stats.reconcile(engine)
+
+
+# ----------------------------
+# Outbox
+# ----------------------------
+@router.get("/outbox")
+def outbox_stats(admin: models.User = Depends(get_admin)):
+    """Configured sinks and the events waiting to be delivered or given up on."""
+    return outbox.stats(engine)
+
+
+@router.post("/outbox/retry")
+def retry_outbox(admin: models.User = Depends(get_admin)):
+    """Requeue events that ran out of OUTBOX_MAX_ATTEMPTS, e.g. after a receiver outage."""
+    return {"requeued": outbox.retry_failed(engine)}
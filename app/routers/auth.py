@@ -4,8 +4,10 @@ from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
 from app import models, schemas, utils
 from app.dependencies import get_db, get_user, get_admin
+from app.passwords import password_service
+from app.profiling import ProfiledRoute
 
-router = APIRouter(prefix="/auth", tags=["auth"])
+router = APIRouter(prefix="/auth", tags=["auth"], route_class=ProfiledRoute)
 
 # ----------------------------
 # Register User
@@ -18,7 +20,8 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
         if db.query(models.User).filter(models.User.email == user.email).first():
             raise HTTPException(status_code=400, detail="Email already registered")
 
-        hashed_password = utils.hash_password(user.password)
+        # bcrypt runs in the password process pool; this thread only waits
+        hashed_password = password_service.hash_blocking(user.password)
         db_user = models.User(
             username=user.username,
             email=user.email,
@@ -29,6 +32,8 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
         db.refresh(db_user)
         return db_user
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -40,12 +45,21 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
 def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     try:
         user = db.query(models.User).filter(models.User.username == form_data.username).first()
-        if not user or not utils.verify_password(form_data.password, user.hashed_password):
+        if not user:
             raise HTTPException(status_code=401, detail="Invalid credentials")
+        valid, new_hash = password_service.verify_blocking(form_data.password, user.hashed_password)
+        if not valid:
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+        if new_hash:
+            # Stored hash predates the current BCRYPT_ROUNDS; upgrade it
+            user.hashed_password = new_hash
+            db.commit()
 
         token = utils.create_access_token({"sub": user.username, "role": user.role})
         return {"access_token": token, "token_type": "bearer"}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
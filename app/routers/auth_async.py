@@ -0,0 +1,69 @@
+# app/routers/auth_async.py
+#
+# AsyncSession versions of the auth routes, mounted instead of
+# app/routers/auth.py when DATABASE_URL uses an async driver.
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models, schemas, utils
+from app.dependencies import get_async_db, get_async_admin
+from app.cache import invalidate_committed_users
+from app.passwords import password_service
+from app.profiling import ProfiledRoute
+
+router = APIRouter(prefix="/auth", tags=["auth"], route_class=ProfiledRoute)
+
+# ----------------------------
+# Register User
+# ----------------------------
+@router.post("/register", response_model=schemas.UserResponse, status_code=201)
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    if await db.scalar(select(models.User.id).where(models.User.username == user.username)):
+        raise HTTPException(status_code=400, detail="Username already exists")
+    if await db.scalar(select(models.User.id).where(models.User.email == user.email)):
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    # bcrypt is CPU-bound; it runs in the password process pool
+    hashed_password = await password_service.hash(user.password)
+    db_user = models.User(
+        username=user.username,
+        email=user.email,
+        hashed_password=hashed_password
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+
+# ----------------------------
+# Login User
+# ----------------------------
+@router.post("/login", response_model=schemas.Token)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(models.User).where(models.User.username == form_data.username))
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    valid, new_hash = await password_service.verify(form_data.password, user.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # Stored hash predates the current BCRYPT_ROUNDS; upgrade it
+        user.hashed_password = new_hash
+        await db.commit()
+        await invalidate_committed_users(db)
+
+    token = utils.create_access_token({"sub": user.username, "role": user.role})
+    return {"access_token": token, "token_type": "bearer"}
+
+
+# ----------------------------
+# Example Admin-only route
+# ----------------------------
+@router.get("/admin", response_model=schemas.UserResponse)
+async def admin_route(admin: models.User = Depends(get_async_admin)):
+    """
+    Example endpoint restricted to admin users
+    """
+    return admin
@@ -0,0 +1,233 @@
+# app/routers/health.py
+#
+# Health endpoints for load balancers and orchestrators.
+#   /health          cheap "process is up"
+#   /health/live     liveness: the event loop answers, no dependencies touched
+#   /health/ready    readiness: database reachable and the pool not saturated
+#   /health/detailed everything, including cache/limiter/pool stats
+# Dependency probes run concurrently, each with its own timeout, and their
+# result is cached for HEALTH_CACHE_TTL so a probe storm costs one round.
+
+from math import ceil
+from time import monotonic, perf_counter
+from typing import Optional
+import asyncio
+import os
+import threading
+
+from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+import redis.asyncio
+
+from app import ratelimit
+from app.cache import SingleFlight, task_cache, user_cache
+from app.database import REDIS_URL, async_engine, engine, get_pool_metrics, redis_client
+from app.http_client import outbound
+from app.logs import log_pipeline
+from app.passwords import password_service
+
+HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", "1"))              # seconds, 0 = probe every time
+HEALTH_DB_TIMEOUT = float(os.getenv("HEALTH_DB_TIMEOUT", "2"))
+HEALTH_REDIS_TIMEOUT = float(os.getenv("HEALTH_REDIS_TIMEOUT", "1"))
+HEALTH_POOL_SATURATION = float(os.getenv("HEALTH_POOL_SATURATION", "0.9"))  # not ready at/above this share
+
+router = APIRouter(prefix="/health", tags=["Health"])
+
+
+# ----------------------------
+# Dependency Probes
+# ----------------------------
+def _probe_connect_args() -> dict:
+    """Driver options bounding how long a probe connection can connect and query."""
+    if engine.url.get_backend_name() == "sqlite":
+        return {"check_same_thread": False, "timeout": HEALTH_DB_TIMEOUT}
+    if engine.url.get_driver_name() in ("psycopg2", "psycopg"):
+        return {
+            "connect_timeout": max(1, ceil(HEALTH_DB_TIMEOUT)),
+            "options": f"-c statement_timeout={int(HEALTH_DB_TIMEOUT * 1000)}",
+        }
+    return {}
+
+
+# wait_for() gives up on a ping but cannot stop its thread, so the thread's
+# own work is bounded: a one-connection engine with short timeouts (the app
+# pool could make it wait DB_POOL_TIMEOUT), and at most one ping at a time.
+_probe_engine = create_engine(
+    engine.url,
+    poolclass=QueuePool,
+    pool_size=1,
+    max_overflow=0,
+    pool_timeout=HEALTH_DB_TIMEOUT,
+    connect_args=_probe_connect_args(),
+)
+_ping_lock = threading.Lock()
+
+
+def _ping_database():
+    if not _ping_lock.acquire(blocking=False):
+        raise RuntimeError("previous probe still running")
+    try:
+        with _probe_engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    finally:
+        _ping_lock.release()
+
+
+async def check_database():
+    if async_engine is not None:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    else:
+        await run_in_threadpool(_ping_database)
+
+
+_async_redis: Optional[tuple] = None   # (event loop, client); connections belong to one loop
+
+
+async def check_redis():
+    global _async_redis
+    loop = asyncio.get_running_loop()
+    if _async_redis is None or _async_redis[0] is not loop:
+        client = redis.asyncio.Redis.from_url(
+            REDIS_URL,
+            socket_timeout=HEALTH_REDIS_TIMEOUT,
+            socket_connect_timeout=HEALTH_REDIS_TIMEOUT,
+        )
+        _async_redis = (loop, client)
+    await _async_redis[1].ping()
+
+
+async def redis_not_connected() -> dict:
+    return {"status": "not connected", "latency_ms": 0.0}
+
+
+async def close():
+    global _async_redis
+    if _async_redis is not None:
+        await _async_redis[1].aclose()
+        _async_redis = None
+    _probe_engine.dispose()
+
+
+async def timed_probe(probe, timeout: float) -> dict:
+    """Run one probe; never raises, a hung dependency reports "timeout"."""
+    started = perf_counter()
+    try:
+        await asyncio.wait_for(probe(), timeout)
+        status = "ok"
+    except asyncio.TimeoutError:
+        status = "timeout"
+    except Exception as e:
+        status = f"error: {e}"
+    return {"status": status, "latency_ms": round((perf_counter() - started) * 1000, 3)}
+
+
+class HealthProbes:
+    """Concurrent dependency probes with a short result cache; concurrent callers share one round."""
+
+    def __init__(self, ttl: float = HEALTH_CACHE_TTL):
+        self.ttl = ttl
+        self.rounds = 0
+        self._result: Optional[dict] = None
+        self._checked_at = 0.0
+        self._flight = SingleFlight()
+
+    async def run(self) -> dict:
+        if self._result is not None and monotonic() - self._checked_at < self.ttl:
+            return self._result
+        return await self._flight.do_async("probes", self._probe)
+
+    async def _probe(self) -> dict:
+        # Redis is optional: without a client at startup the app runs without it
+        redis_probe = (
+            timed_probe(check_redis, HEALTH_REDIS_TIMEOUT)
+            if redis_client is not None
+            else redis_not_connected()
+        )
+        database, redis_result = await asyncio.gather(
+            timed_probe(check_database, HEALTH_DB_TIMEOUT), redis_probe
+        )
+        self.rounds += 1
+        self._result = {"database": database, "redis": redis_result}
+        self._checked_at = monotonic()
+        return self._result
+
+    def clear(self):
+        self._result = None
+
+
+probes = HealthProbes()
+
+
+def pool_saturation() -> Optional[float]:
+    """Highest checked_out / (pool_size + max_overflow) across engines; None without a QueuePool."""
+    saturation = None
+    for pool in get_pool_metrics().values():
+        capacity = pool.get("size", 0) + pool.get("max_overflow", 0)
+        if capacity > 0:
+            saturation = max(saturation or 0.0, pool["checked_out"] / capacity)
+    return None if saturation is None else round(saturation, 3)
+
+
+# ----------------------------
+# Endpoints
+# ----------------------------
+@router.get("")
+async def health_check():
+    return {"status": "ok"}
+
+
+@router.get("/live")
+async def liveness():
+    """Answered on the event loop without touching any dependency."""
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def readiness():
+    """503 while the database is unreachable or the pool is saturated."""
+    checks = await probes.run()
+    saturation = pool_saturation()
+    reasons = []
+    if checks["database"]["status"] != "ok":
+        reasons.append(f"database {checks['database']['status']}")
+    if saturation is not None and saturation >= HEALTH_POOL_SATURATION:
+        reasons.append(f"database pool {saturation:.0%} checked out")
+
+    body = {
+        "status": "not ready" if reasons else "ready",
+        "reasons": reasons,
+        "database": checks["database"],
+        "redis": checks["redis"],   # informational: the app degrades without Redis
+        "pool_saturation": saturation,
+    }
+    return JSONResponse(body, status_code=503 if reasons else 200)
+
+
+@router.get("/detailed")
+async def detailed_health_check():
+    checks = await probes.run()
+    database, redis_check = checks["database"]["status"], checks["redis"]["status"]
+    if database != "ok":
+        status = "error"
+    elif redis_check != "ok":
+        status = "degraded"
+    else:
+        status = "ok"
+
+    return {
+        "status": status,
+        "database": database,
+        "redis": redis_check,
+        "latency_ms": {name: check["latency_ms"] for name, check in checks.items()},
+        "database_pool": get_pool_metrics(),
+        "pool_saturation": pool_saturation(),
+        "caches": {"users": user_cache.stats(), "tasks": task_cache.stats()},
+        "rate_limiter": ratelimit.backend_status(),
+        "password_pool": password_service.stats(),
+        "outbound": outbound.stats(),
+        "logging": log_pipeline.stats(),
+    }
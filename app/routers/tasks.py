@@ -1,14 +1,324 @@
 # app/routers/tasks.py
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import delete, insert, select, tuple_, update
 from sqlalchemy.orm import Session
-from typing import List
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Iterator, List, Literal, Optional
+import csv
+import hashlib
+import io
+import json
+import os
 import httpx
 
-from app import models, schemas
-from app.dependencies import get_db, get_user, rate_limit
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-router = APIRouter(prefix="/tasks", tags=["tasks"])
+from app import http_client, models, outbox, schemas, search, task_stats, utils
+from app.cache import task_cache
+from app.dependencies import get_db, get_user
+from app.profiling import ProfiledRoute
+
+router = APIRouter(prefix="/tasks", tags=["tasks"], route_class=ProfiledRoute)
+
+MAX_PAGE_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FIELDS = ("id", "title", "description", "completed", "created_at")
+MAX_BATCH_SIZE = 1000
+TASK_COLUMNS = (
+    models.Task.id,
+    models.Task.title,
+    models.Task.description,
+    models.Task.completed,
+    models.Task.created_at,
+    models.Task.updated_at,
+    models.Task.version,
+)
+
+# List fast path: select only TaskResponse's columns and encode the rows straight
+# to JSON bytes, skipping ORM hydration and response_model validation
+TASK_LIST_FAST_PATH = os.getenv("TASK_LIST_FAST_PATH", "false").lower() in ("1", "true", "yes", "on")
+TASK_LIST_ENCODER = os.getenv("TASK_LIST_ENCODER", "auto")        # auto (orjson if installed) | pydantic
+# TaskResponse field order, so the fast path emits the same bytes as response_model
+TASK_LIST_FIELDS = tuple(schemas.TaskResponse.model_fields)
+TASK_LIST_COLUMNS = tuple(getattr(models.Task, name) for name in TASK_LIST_FIELDS)
+TASK_LIST_ADAPTER = TypeAdapter(List[schemas.TaskRow])
+
+
+# ----------------------------
+# Shared Query / Response Helpers
+# (also used by app/routers/tasks_async.py)
+# ----------------------------
+def keyset_page_statement(cursor: Optional[str], limit: int):
+    """SELECT for one keyset page, plus one lookahead row to detect a next page."""
+    statement = select(models.Task)
+    if cursor:
+        position = utils.decode_cursor(cursor)
+        if position is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        statement = statement.where(tuple_(models.Task.created_at, models.Task.id) > position)
+    return statement.order_by(models.Task.created_at, models.Task.id).limit(limit + 1)
+
+
+def search_statement(
+    q: Optional[str],
+    completed: Optional[bool],
+    created_after: Optional[datetime],
+    created_before: Optional[datetime],
+    cursor: Optional[str],
+    limit: int,
+):
+    """Keyset page of tasks matching every given filter; `q` goes through the full-text index."""
+    statement = keyset_page_statement(cursor, limit)
+    if q is not None:
+        terms = search.search_terms(q)
+        if not terms:
+            raise HTTPException(status_code=400, detail="Search query has no searchable words")
+        statement = statement.where(search.match_clause(terms))
+    if completed is not None:
+        statement = statement.where(models.Task.completed == completed)
+    if created_after is not None:
+        statement = statement.where(models.Task.created_at >= search.as_utc(created_after))
+    if created_before is not None:
+        statement = statement.where(models.Task.created_at < search.as_utc(created_before))
+    return statement
+
+
+def paginate(request: Request, response: Response, tasks: list, limit: int) -> list:
+    """Trim the lookahead row and set X-Next-Cursor / Link headers when more rows exist."""
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        next_cursor = utils.encode_cursor(tasks[-1].created_at, tasks[-1].id)
+        next_url = request.url.include_query_params(cursor=next_cursor, limit=limit)
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return tasks
+
+
+def list_statement(statement):
+    """On the fast path, fetch plain column rows instead of ORM objects."""
+    return statement.with_only_columns(*TASK_LIST_COLUMNS) if TASK_LIST_FAST_PATH else statement
+
+
+def list_rows(result) -> list:
+    return result.all() if TASK_LIST_FAST_PATH else result.scalars().all()
+
+
+def encode_task_list(rows: Iterable) -> bytes:
+    items = [dict(zip(TASK_LIST_FIELDS, row)) for row in rows]
+    if orjson is not None and TASK_LIST_ENCODER != "pydantic":
+        # OPT_UTC_Z writes UTC as "Z", like pydantic
+        return orjson.dumps(items, option=orjson.OPT_UTC_Z)
+    return TASK_LIST_ADAPTER.dump_json(items)
+
+
+def list_response(response: Response, tasks: list):
+    """
+    Fast path: a raw JSON Response carrying the headers already set on `response`
+    (a returned Response bypasses response_model). Otherwise the tasks as-is.
+    """
+    if not TASK_LIST_FAST_PATH:
+        return tasks
+    return Response(encode_task_list(tasks), media_type="application/json", headers=response.headers)
+
+
+# ----------------------------
+# Conditional Request Helpers (ETag / Last-Modified / If-Match)
+# ----------------------------
+def task_field(task, name: str):
+    """Read a field from an ORM task, a Row, or a cached TaskResponse dict."""
+    return task[name] if isinstance(task, dict) else getattr(task, name)
+
+
+def task_etag(task) -> str:
+    """Strong ETag: `version` changes on every write to the row."""
+    return f'"{task_field(task, "id")}.{task_field(task, "version")}"'
+
+
+def list_etag(tasks: Iterable) -> str:
+    """Strong ETag for a page: changes if any row is added, removed or updated."""
+    digest = hashlib.blake2b(digest_size=16)
+    for task in tasks:
+        digest.update(f"{task_field(task, 'id')}.{task_field(task, 'version')},".encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def last_modified(tasks: Iterable) -> Optional[datetime]:
+    latest = None
+    for task in tasks:
+        value = task_field(task, "updated_at") or task_field(task, "created_at")
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)  # SQLite drops the offset; we store UTC
+        if latest is None or value > latest:
+            latest = value
+    return latest
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match / If-Match comparison; weak validators compare by opaque tag."""
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def conditional_response(request: Request, response: Response, etag: str, modified: Optional[datetime]):
+    """
+    Set ETag / Last-Modified and return a 304 Response if the client's copy is
+    current, else None. Called before the body is serialized, so a 304 skips
+    the response_model work entirely.
+    """
+    headers = {"ETag": etag}
+    if modified is not None:
+        headers["Last-Modified"] = format_datetime(modified, usegmt=True)
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        fresh = etag_matches(if_none_match, etag)
+    else:
+        fresh = False
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and modified is not None:
+            try:
+                fresh = modified.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                fresh = False
+    if fresh:
+        return Response(status_code=304, headers=headers)
+    return None
+
+
+def update_task_statement(task_id: int, changes: dict, if_match: Optional[str]):
+    """
+    Single-row UPDATE. With If-Match, the version check is part of the WHERE
+    clause, so a write that lands after the client's read can't be overwritten.
+    """
+    statement = update(models.Task).where(models.Task.id == task_id)
+    if if_match is not None and "*" not in if_match:
+        versions = [
+            int(tag.rsplit(".", 1)[1])
+            for tag in (tag.strip().removeprefix("W/").strip('"') for tag in if_match.split(","))
+            if tag.startswith(f"{task_id}.") and tag.rsplit(".", 1)[1].isdigit()
+        ]
+        statement = statement.where(models.Task.version.in_(versions))
+    return statement.values(**changes).execution_options(synchronize_session=False)
+
+
+def precondition_failed():
+    return HTTPException(status_code=412, detail="Task was modified; fetch it again and retry")
+
+
+def check_batch_size(items: list):
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large. At most {MAX_BATCH_SIZE} items per request",
+        )
+
+
+def batch_create_results(created: Iterable) -> dict:
+    return {
+        "results": [
+            schemas.TaskBatchResult(
+                index=index,
+                id=task.id,
+                status=201,
+                task=schemas.TaskResponse.model_validate(task),
+            )
+            for index, task in enumerate(created)
+        ]
+    }
+
+
+def batch_update_params(updates: List[schemas.TaskBatchUpdate], existing: set) -> list:
+    """Parameter sets for an ORM bulk UPDATE by primary key, skipping unknown ids and no-ops."""
+    params = []
+    for item in updates:
+        values = item.model_dump(exclude_unset=True, exclude={"id"})
+        if item.id in existing and values:
+            params.append({"id": item.id, **values})
+    return params
+
+
+def batch_update_results(updates: List[schemas.TaskBatchUpdate], rows: dict) -> dict:
+    results = []
+    for index, item in enumerate(updates):
+        if item.id in rows:
+            results.append(
+                schemas.TaskBatchResult(
+                    index=index,
+                    id=item.id,
+                    status=200,
+                    task=schemas.TaskResponse.model_validate(rows[item.id]),
+                )
+            )
+        else:
+            results.append(
+                schemas.TaskBatchResult(index=index, id=item.id, status=404, detail="Task not found")
+            )
+    return {"results": results}
+
+
+def batch_delete_results(task_ids: List[int], deleted: set) -> dict:
+    return {
+        "results": [
+            schemas.TaskBatchResult(index=index, id=task_id, status=204)
+            if task_id in deleted
+            else schemas.TaskBatchResult(index=index, id=task_id, status=404, detail="Task not found")
+            for index, task_id in enumerate(task_ids)
+        ]
+    }
+
+
+def export_statement():
+    """Column-only SELECT over every task, streamed in EXPORT_BATCH_SIZE partitions."""
+    return (
+        select(*TASK_COLUMNS)
+        .order_by(models.Task.created_at, models.Task.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+
+def export_values(row) -> tuple:
+    return (
+        row.id,
+        row.title,
+        row.description,
+        bool(row.completed),
+        row.created_at.isoformat() if row.created_at else None,
+    )
+
+
+def encode_ndjson(rows: Iterable) -> str:
+    return "".join(
+        json.dumps(dict(zip(EXPORT_FIELDS, export_values(row)))) + "\n" for row in rows
+    )
+
+
+def encode_csv(rows: Iterable, include_header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if include_header:
+        writer.writerow(EXPORT_FIELDS)
+    writer.writerows(export_values(row) for row in rows)
+    return buffer.getvalue()
+
+
+def export_response(chunks, format: str) -> StreamingResponse:
+    if format == "csv":
+        return StreamingResponse(
+            chunks,
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="tasks.csv"'},
+        )
+    return StreamingResponse(chunks, media_type="application/x-ndjson")
 
 
 # ----------------------------
@@ -17,33 +327,234 @@ router = APIRouter(prefix="/tasks", tags=["tasks"])
 @router.post("/", response_model=schemas.TaskResponse, status_code=201)
 def create_task(
     task: schemas.TaskCreate,
-    request: Request,
     db: Session = Depends(get_db),
     user: models.User = Depends(get_user),
 ):
-    rate_limit(request)
-
     db_task = models.Task(**task.dict())
     db.add(db_task)
+    db.flush()   # assigns the id for the outbox event; commit() would run this INSERT anyway
+    outbox.record(db, "task.created", [db_task])
     db.commit()
     db.refresh(db_task)
     return db_task
 
 
+# ----------------------------
+# Batch Create / Update / Delete
+# ----------------------------
+@router.post("/batch", response_model=schemas.TaskBatchResponse, status_code=201)
+def create_tasks_batch(
+    tasks: List[schemas.TaskCreate] = Body(...),
+    db: Session = Depends(get_db),
+    user: models.User = Depends(get_user),
+):
+    """Create many tasks in one transaction using a bulk INSERT ... RETURNING."""
+    check_batch_size(tasks)
+    if not tasks:
+        return {"results": []}
+
+    rows = [task.model_dump() for task in tasks]
+
+    if db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        created = db.execute(
+            insert(models.Task).returning(*TASK_COLUMNS, sort_by_parameter_order=True),
+            rows,
+        ).all()
+    else:
+        created = [models.Task(**row) for row in rows]
+        db.add_all(created)
+        db.flush()
+
+    results = batch_create_results(created)
+    outbox.record(db, "task.created", created)
+    db.commit()
+    return results
+
+
+@router.patch("/batch", response_model=schemas.TaskBatchResponse)
+def update_tasks_batch(
+    updates: List[schemas.TaskBatchUpdate] = Body(...),
+    db: Session = Depends(get_db),
+    user: models.User = Depends(get_user),
+):
+    """Apply partial updates to many tasks in one transaction (bulk UPDATE by primary key)."""
+    check_batch_size(updates)
+
+    ids = {item.id for item in updates}
+    existing = set(db.scalars(select(models.Task.id).where(models.Task.id.in_(ids))))
+
+    params = batch_update_params(updates, existing)
+    if params:
+        db.execute(update(models.Task), params)
+
+    rows = {
+        row.id: row
+        for row in db.execute(select(*TASK_COLUMNS).where(models.Task.id.in_(existing)))
+    }
+    outbox.record(db, "task.updated", [rows[item["id"]] for item in params])
+    db.commit()
+    task_cache.invalidate_many(existing)
+    return batch_update_results(updates, rows)
+
+
+@router.delete("/batch", response_model=schemas.TaskBatchResponse)
+def delete_tasks_batch(
+    task_ids: List[int] = Body(...),
+    db: Session = Depends(get_db),
+    user: models.User = Depends(get_user),
+):
+    """Delete many tasks in one transaction using DELETE ... RETURNING where supported."""
+    check_batch_size(task_ids)
+
+    ids = set(task_ids)
+    if db.get_bind().dialect.delete_returning:
+        deleted = set(
+            db.scalars(delete(models.Task).where(models.Task.id.in_(ids)).returning(models.Task.id))
+        )
+    else:
+        deleted = set(db.scalars(select(models.Task.id).where(models.Task.id.in_(ids))))
+        db.execute(delete(models.Task).where(models.Task.id.in_(deleted)))
+    outbox.record(db, "task.deleted", sorted(deleted))
+    db.commit()
+    task_cache.invalidate_many(deleted)
+
+    return batch_delete_results(task_ids, deleted)
+
+
 # ----------------------------
 # Read All Tasks
 # ----------------------------
 @router.get("/", response_model=List[schemas.TaskResponse])
 def read_tasks(
     request: Request,
-    skip: int = 0,
-    limit: int = 10,
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: Optional[int] = Query(None, ge=0),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    include_total: bool = Query(False, description="Add X-Total-Count (from the task counters)"),
     db: Session = Depends(get_db),
     user: models.User = Depends(get_user),
 ):
-    rate_limit(request)
+    """
+    List tasks ordered by (created_at, id) using keyset pagination.
+    Follow `X-Next-Cursor` / the `Link` header to fetch the next page.
+    Passing `skip` switches to legacy offset pagination (kept for old clients).
+    Pages carry an ETag; a matching If-None-Match gets 304 Not Modified.
+    """
+    if include_total:
+        stats = task_stats.stats_from_row(db.execute(task_stats.stats_statement()).one())
+        response.headers["X-Total-Count"] = str(stats["total"])
+    if skip is not None:
+        tasks = list_rows(db.execute(list_statement(select(models.Task).offset(skip).limit(limit))))
+    else:
+        tasks = list_rows(db.execute(list_statement(keyset_page_statement(cursor, limit))))
+        tasks = paginate(request, response, tasks, limit)
+    return conditional_response(request, response, list_etag(tasks), last_modified(tasks)) or list_response(response, tasks)
 
-    return db.query(models.Task).offset(skip).limit(limit).all()
+
+# ----------------------------
+# Task Counts
+# ----------------------------
+@router.get("/stats", response_model=schemas.TaskStats)
+def get_task_stats(
+    db: Session = Depends(get_db),
+    user: models.User = Depends(get_user),
+):
+    """Total, completed and open counts, read from trigger-maintained counters (no COUNT(*))."""
+    return task_stats.stats_from_row(db.execute(task_stats.stats_statement()).one())
+
+
+# ----------------------------
+# Search Tasks
+# ----------------------------
+@router.get("/search", response_model=List[schemas.TaskResponse])
+def search_tasks(
+    request: Request,
+    response: Response,
+    q: Optional[str] = Query(None, max_length=200, description="Words to find in title or description"),
+    completed: Optional[bool] = None,
+    created_after: Optional[datetime] = Query(None, description="Inclusive; naive times are UTC"),
+    created_before: Optional[datetime] = Query(None, description="Exclusive; naive times are UTC"),
+    cursor: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    user: models.User = Depends(get_user),
+):
+    """
+    Filter tasks by completion, a created_at range and/or full-text words.
+    Every word must match the start of a word in the title or description.
+    Results are ordered and paginated like `GET /tasks/` (keyset cursors, ETag).
+    """
+    statement = search_statement(q, completed, created_after, created_before, cursor, limit)
+    tasks = paginate(request, response, list_rows(db.execute(list_statement(statement))), limit)
+    return conditional_response(request, response, list_etag(tasks), last_modified(tasks)) or list_response(response, tasks)
+
+
+# ----------------------------
+# Export All Tasks
+# ----------------------------
+def iter_task_batches(db: Session) -> Iterator[list]:
+    """
+    Yield task rows in batches of EXPORT_BATCH_SIZE from a server-side cursor.
+    Only plain column tuples are fetched, so no ORM objects pile up in the session.
+    """
+    result = db.execute(export_statement())
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+
+def iter_ndjson(db: Session) -> Iterator[str]:
+    for rows in iter_task_batches(db):
+        yield encode_ndjson(rows)
+
+
+def iter_csv(db: Session) -> Iterator[str]:
+    include_header = True
+    for rows in iter_task_batches(db):
+        yield encode_csv(rows, include_header)
+        include_header = False
+
+    if include_header:
+        yield encode_csv([], include_header)
+
+
+@router.get("/export")
+def export_tasks(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    db: Session = Depends(get_db),
+    user: models.User = Depends(get_user),
+):
+    """
+    Stream every task as NDJSON (default) or CSV in a single response.
+    Memory stays bounded by EXPORT_BATCH_SIZE regardless of table size.
+    """
+    return export_response(iter_csv(db) if format == "csv" else iter_ndjson(db), format)
+
+
+# ----------------------------
+# Async External API Call
+# (declared before /{task_id} so the path isn't captured by it)
+# ----------------------------
+JOKE_URL = "https://official-joke-api.appspot.com/random_joke"
+
+
+@router.get("/external-joke")
+async def get_joke(
+    user: models.User = Depends(get_user),
+):
+    """Proxy a random joke through the shared outbound client (pooled, cached, circuit-broken)."""
+    try:
+        return await http_client.outbound.get_json(JOKE_URL)
+    except http_client.OutboundUnavailable as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Joke service unavailable: {e}",
+            headers={"Retry-After": str(round(e.retry_after))},
+        )
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Joke service error: {e}")
 
 
 # ----------------------------
@@ -53,15 +564,16 @@ def read_tasks(
 def read_task(
     task_id: int,
     request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     user: models.User = Depends(get_user),
 ):
-    rate_limit(request)
-
-    task = db.query(models.Task).filter(models.Task.id == task_id).first()
+    task = task_cache.get_or_load(
+        task_id, lambda: db.query(models.Task).filter(models.Task.id == task_id).first()
+    )
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    return task
+    return conditional_response(request, response, task_etag(task), last_modified([task])) or task
 
 
 # ----------------------------
@@ -72,21 +584,28 @@ def update_task(
     task_id: int,
     task_update: schemas.TaskUpdate,
     request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     user: models.User = Depends(get_user),
 ):
-    rate_limit(request)
+    """Partial update. Send `If-Match: <ETag>` to fail with 412 if the task changed since it was read."""
+    if_match = request.headers.get("if-match")
+    changes = task_update.dict(exclude_unset=True)
+    updated = False
+    if changes:
+        updated = db.execute(update_task_statement(task_id, changes, if_match)).rowcount > 0
+    if updated and outbox.enabled:
+        outbox.record(db, "task.updated", db.execute(select(*TASK_COLUMNS).where(models.Task.id == task_id)))
+    db.commit()
 
     task = db.query(models.Task).filter(models.Task.id == task_id).first()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
+    if if_match is not None and not updated and (changes or not etag_matches(if_match, task_etag(task))):
+        raise precondition_failed()
 
-    for key, value in task_update.dict(exclude_unset=True).items():
-        setattr(task, key, value)
-
-    db.commit()
-    db.refresh(task)
-    return task
+    response.headers["ETag"] = task_etag(task)
+    return task_cache.set(task)
 
 
 # ----------------------------
@@ -95,31 +614,14 @@ def update_task(
 @router.delete("/{task_id}", status_code=204)
 def delete_task(
     task_id: int,
-    request: Request,
     db: Session = Depends(get_db),
     user: models.User = Depends(get_user),
 ):
-    rate_limit(request)
-
     task = db.query(models.Task).filter(models.Task.id == task_id).first()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
     db.delete(task)
+    outbox.record(db, "task.deleted", [task_id])
     db.commit()
-
-
-# ----------------------------
-# Async External API Call
-# ----------------------------
-@router.get("/external-joke")
-async def get_joke(
-    request: Request,
-    user: models.User = Depends(get_user),
-):
-    rate_limit(request)
-
-    async with httpx.AsyncClient(timeout=5) as client:
-        response = await client.get("https://official-joke-api.appspot.com/random_joke")
-        response.raise_for_status()
-        return response.json()
+    task_cache.invalidate(task_id)
@@ -0,0 +1,343 @@
+# app/routers/tasks_async.py
+#
+# AsyncSession versions of the task routes, mounted instead of
+# app/routers/tasks.py when DATABASE_URL uses an async driver.
+# Handlers never block a threadpool slot while waiting on the database.
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import AsyncIterator, List, Literal, Optional
+import httpx
+
+from app import http_client, models, outbox, schemas, task_stats
+from app.cache import task_cache
+from app.dependencies import get_async_db, get_async_user
+from app.profiling import ProfiledRoute
+from app.routers.tasks import (
+    JOKE_URL,
+    MAX_PAGE_SIZE,
+    TASK_COLUMNS,
+    batch_create_results,
+    batch_delete_results,
+    batch_update_params,
+    batch_update_results,
+    check_batch_size,
+    conditional_response,
+    encode_csv,
+    encode_ndjson,
+    etag_matches,
+    export_response,
+    export_statement,
+    keyset_page_statement,
+    last_modified,
+    list_etag,
+    list_response,
+    list_rows,
+    list_statement,
+    paginate,
+    precondition_failed,
+    search_statement,
+    task_etag,
+    update_task_statement,
+)
+
+router = APIRouter(prefix="/tasks", tags=["tasks"], route_class=ProfiledRoute)
+
+
+async def get_task_or_404(db: AsyncSession, task_id: int) -> models.Task:
+    task = await db.get(models.Task, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return task
+
+
+# ----------------------------
+# Create Task
+# ----------------------------
+@router.post("/", response_model=schemas.TaskResponse, status_code=201)
+async def create_task(
+    task: schemas.TaskCreate,
+    db: AsyncSession = Depends(get_async_db),
+    user: models.User = Depends(get_async_user),
+):
+    db_task = models.Task(**task.model_dump())
+    db.add(db_task)
+    await db.flush()   # assigns the id for the outbox event; commit() would run this INSERT anyway
+    await outbox.record_async(db, "task.created", [db_task])
+    await db.commit()
+    await db.refresh(db_task)
+    return db_task
+
+
+# ----------------------------
+# Batch Create / Update / Delete
+# ----------------------------
+@router.post("/batch", response_model=schemas.TaskBatchResponse, status_code=201)
+async def create_tasks_batch(
+    tasks: List[schemas.TaskCreate] = Body(...),
+    db: AsyncSession = Depends(get_async_db),
+    user: models.User = Depends(get_async_user),
+):
+    """Create many tasks in one transaction using a bulk INSERT ... RETURNING."""
+    check_batch_size(tasks)
+    if not tasks:
+        return {"results": []}
+
+    rows = [task.model_dump() for task in tasks]
+
+    if db.bind.dialect.insert_executemany_returning_sort_by_parameter_order:
+        result = await db.execute(
+            insert(models.Task).returning(*TASK_COLUMNS, sort_by_parameter_order=True),
+            rows,
+        )
+        created = result.all()
+    else:
+        created = [models.Task(**row) for row in rows]
+        db.add_all(created)
+        await db.flush()
+
+    results = batch_create_results(created)
+    await outbox.record_async(db, "task.created", created)
+    await db.commit()
+    return results
+
+
+@router.patch("/batch", response_model=schemas.TaskBatchResponse)
+async def update_tasks_batch(
+    updates: List[schemas.TaskBatchUpdate] = Body(...),
+    db: AsyncSession = Depends(get_async_db),
+    user: models.User = Depends(get_async_user),
+):
+    """Apply partial updates to many tasks in one transaction (bulk UPDATE by primary key)."""
+    check_batch_size(updates)
+
+    ids = {item.id for item in updates}
+    existing = set(await db.scalars(select(models.Task.id).where(models.Task.id.in_(ids))))
+
+    params = batch_update_params(updates, existing)
+    if params:
+        await db.execute(update(models.Task), params)
+
+    result = await db.execute(select(*TASK_COLUMNS).where(models.Task.id.in_(existing)))
+    rows = {row.id: row for row in result}
+    await outbox.record_async(db, "task.updated", [rows[item["id"]] for item in params])
+    await db.commit()
+    await task_cache.invalidate_many_async(existing)
+    return batch_update_results(updates, rows)
+
+
+@router.delete("/batch", response_model=schemas.TaskBatchResponse)
+async def delete_tasks_batch(
+    task_ids: List[int] = Body(...),
+    db: AsyncSession = Depends(get_async_db),
+    user: models.User = Depends(get_async_user),
+):
+    """Delete many tasks in one transaction using DELETE ... RETURNING where supported."""
+    check_batch_size(task_ids)
+
+    ids = set(task_ids)
+    if db.bind.dialect.delete_returning:
+        deleted = set(
+            await db.scalars(
+                delete(models.Task).where(models.Task.id.in_(ids)).returning(models.Task.id)
+            )
+        )
+    else:
+        deleted = set(await db.scalars(select(models.Task.id).where(models.Task.id.in_(ids))))
+        await db.execute(delete(models.Task).where(models.Task.id.in_(deleted)))
+    await outbox.record_async(db, "task.deleted", sorted(deleted))
+    await db.commit()
+    await task_cache.invalidate_many_async(deleted)
+
+    return batch_delete_results(task_ids, deleted)
+
+
+# ----------------------------
+# Read All Tasks
+# ----------------------------
+@router.get("/", response_model=List[schemas.TaskResponse])
+async def read_tasks(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: Optional[int] = Query(None, ge=0),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    include_total: bool = Query(False, description="Add X-Total-Count (from the task counters)"),
+    db: AsyncSession = Depends(get_async_db),
+    user: models.User = Depends(get_async_user),
+):
+    """
+    List tasks ordered by (created_at, id) using keyset pagination.
+    Follow `X-Next-Cursor` / the `Link` header to fetch the next page.
+    Passing `skip` switches to legacy offset pagination (kept for old clients).
+    Pages carry an ETag; a matching If-None-Match gets 304 Not Modified.
+    """
+    if include_total:
+        stats = task_stats.stats_from_row((await db.execute(task_stats.stats_statement())).one())
+        response.headers["X-Total-Count"] = str(stats["total"])
+    if skip is not None:
+        tasks = list_rows(await db.execute(list_statement(select(models.Task).offset(skip).limit(limit))))
+    else:
+        tasks = list_rows(await db.execute(list_statement(keyset_page_statement(cursor, limit))))
+        tasks = paginate(request, response, tasks, limit)
+    return conditional_response(request, response, list_etag(tasks), last_modified(tasks)) or list_response(response, tasks)
+
+
+# ----------------------------
+# Task Counts
+# ----------------------------
+@router.get("/stats", response_model=schemas.TaskStats)
+async def get_task_stats(
+    db: AsyncSession = Depends(get_async_db),
+    user: models.User = Depends(get_async_user),
+):
+    """Total, completed and open counts, read from trigger-maintained counters (no COUNT(*))."""
+    return task_stats.stats_from_row((await db.execute(task_stats.stats_statement())).one())
+
+
+# ----------------------------
+# Search Tasks
+# ----------------------------
+@router.get("/search", response_model=List[schemas.TaskResponse])
+async def search_tasks(
+    request: Request,
+    response: Response,
+    q: Optional[str] = Query(None, max_length=200, description="Words to find in title or description"),
+    completed: Optional[bool] = None,
+    created_after: Optional[datetime] = Query(None, description="Inclusive; naive times are UTC"),
+    created_before: Optional[datetime] = Query(None, description="Exclusive; naive times are UTC"),
+    cursor: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+    user: models.User = Depends(get_async_user),
+):
+    """
+    Filter tasks by completion, a created_at range and/or full-text words.
+    Every word must match the start of a word in the title or description.
+    Results are ordered and paginated like `GET /tasks/` (keyset cursors, ETag).
+    """
+    statement = search_statement(q, completed, created_after, created_before, cursor, limit)
+    tasks = paginate(request, response, list_rows(await db.execute(list_statement(statement))), limit)
+    return conditional_response(request, response, list_etag(tasks), last_modified(tasks)) or list_response(response, tasks)
+
+
+# ----------------------------
+# Export All Tasks
+# ----------------------------
+async def stream_export(db: AsyncSession, format: str) -> AsyncIterator[str]:
+    """Encode each server-side cursor partition as it arrives."""
+    result = await db.stream(export_statement())
+    include_header = format == "csv"
+    try:
+        async for rows in result.partitions():
+            if format == "csv":
+                yield encode_csv(rows, include_header)
+                include_header = False
+            else:
+                yield encode_ndjson(rows)
+    finally:
+        await result.close()
+
+    if include_header:
+        yield encode_csv([], include_header)
+
+
+@router.get("/export")
+async def export_tasks(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    db: AsyncSession = Depends(get_async_db),
+    user: models.User = Depends(get_async_user),
+):
+    """
+    Stream every task as NDJSON (default) or CSV in a single response.
+    Memory stays bounded by EXPORT_BATCH_SIZE regardless of table size.
+    """
+    return export_response(stream_export(db, format), format)
+
+
+# ----------------------------
+# Async External API Call
+# (declared before /{task_id} so the path isn't captured by it)
+# ----------------------------
+@router.get("/external-joke")
+async def get_joke(
+    user: models.User = Depends(get_async_user),
+):
+    """Proxy a random joke through the shared outbound client (pooled, cached, circuit-broken)."""
+    try:
+        return await http_client.outbound.get_json(JOKE_URL)
+    except http_client.OutboundUnavailable as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Joke service unavailable: {e}",
+            headers={"Retry-After": str(round(e.retry_after))},
+        )
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Joke service error: {e}")
+
+
+# ----------------------------
+# Read Single Task
+# ----------------------------
+@router.get("/{task_id}", response_model=schemas.TaskResponse)
+async def read_task(
+    task_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    user: models.User = Depends(get_async_user),
+):
+    task = await task_cache.get_or_load_async(task_id, lambda: db.get(models.Task, task_id))
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return conditional_response(request, response, task_etag(task), last_modified([task])) or task
+
+
+# ----------------------------
+# Update Task
+# ----------------------------
+@router.put("/{task_id}", response_model=schemas.TaskResponse)
+async def update_task(
+    task_id: int,
+    task_update: schemas.TaskUpdate,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    user: models.User = Depends(get_async_user),
+):
+    """Partial update. Send `If-Match: <ETag>` to fail with 412 if the task changed since it was read."""
+    if_match = request.headers.get("if-match")
+    changes = task_update.model_dump(exclude_unset=True)
+    updated = False
+    if changes:
+        result = await db.execute(update_task_statement(task_id, changes, if_match))
+        updated = result.rowcount > 0
+    if updated and outbox.enabled:
+        result = await db.execute(select(*TASK_COLUMNS).where(models.Task.id == task_id))
+        await outbox.record_async(db, "task.updated", result)
+    await db.commit()
+
+    task = await get_task_or_404(db, task_id)
+    if if_match is not None and not updated and (changes or not etag_matches(if_match, task_etag(task))):
+        raise precondition_failed()
+
+    response.headers["ETag"] = task_etag(task)
+    return await task_cache.set_async(task)
+
+
+# ----------------------------
+# Delete Task
+# ----------------------------
+@router.delete("/{task_id}", status_code=204)
+async def delete_task(
+    task_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    user: models.User = Depends(get_async_user),
+):
+    task = await get_task_or_404(db, task_id)
+    await db.delete(task)
+    await outbox.record_async(db, "task.deleted", [task_id])
+    await db.commit()
+    await task_cache.invalidate_async(task_id)
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, EmailStr, constr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, constr, field_validator
+from typing import List, Optional
+from typing_extensions import TypedDict
 from datetime import datetime, timezone
 
 # ------------------------------
@@ -18,15 +19,53 @@ class TaskUpdate(BaseModel):
     description: Optional[str] = None
     completed: Optional[bool] = None
 
+    @field_validator("title", "completed")
+    @classmethod
+    def not_null(cls, value):
+        # Omit a field to leave it unchanged; a task never has a null title or completed
+        if value is None:
+            raise ValueError("may be omitted but not null")
+        return value
+
 class TaskResponse(TaskBase):
     id: int
     completed: bool
     created_at: datetime
+    updated_at: Optional[datetime] = None
+    version: int = 1
 
     model_config = {
         "from_attributes": True  # Pydantic v2 replacement for orm_mode
     }
 
+class TaskRow(TypedDict):
+    """TaskResponse as a plain dict: serialized by the list fast path without validation."""
+    title: str
+    description: Optional[str]
+    id: int
+    completed: bool
+    created_at: datetime
+    updated_at: Optional[datetime]
+    version: int
+
+class TaskBatchUpdate(TaskUpdate):
+    id: int
+
+class TaskBatchResult(BaseModel):
+    index: int                            # position of the item in the request array
+    id: Optional[int] = None
+    status: int                           # per-item HTTP status (201, 200, 204, 404)
+    task: Optional[TaskResponse] = None
+    detail: Optional[str] = None
+
+class TaskBatchResponse(BaseModel):
+    results: List[TaskBatchResult]
+
+class TaskStats(BaseModel):
+    total: int
+    completed: int
+    open: int
+
 
 # ------------------------------
 # User Schemas
@@ -0,0 +1,132 @@
+# app/search.py
+#
+# Full-text search over task titles and descriptions.
+#   SQLite     external-content FTS5 table (tasks_fts) kept in sync by triggers
+#   PostgreSQL GIN index on a to_tsvector() expression, matched with @@
+#   otherwise  LIKE per term (table scan), also used if SQLite lacks FTS5
+# Terms are matched as word prefixes and ANDed: "deploy api" finds
+# "Deployment of the API gateway".
+
+from datetime import timezone
+from typing import List, Optional
+import logging
+import re
+
+from sqlalchemy import and_, column, exc, or_, select, table, text
+
+from app import models
+
+logger = logging.getLogger("api_logger")
+
+MAX_SEARCH_TERMS = 16
+
+# Must match the indexed expression exactly or PostgreSQL won't use the index
+TSVECTOR_DOCUMENT = "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, ''))"
+
+SQLITE_DDL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+        title, description, content='tasks', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+)
+SQLITE_OBJECTS = {"tasks_fts", "tasks_fts_insert", "tasks_fts_delete", "tasks_fts_update"}
+
+POSTGRES_DDL = (
+    f"CREATE INDEX IF NOT EXISTS ix_tasks_search ON tasks USING gin ({TSVECTOR_DOCUMENT})",
+)
+
+tasks_fts = table("tasks_fts", column("rowid"), column("tasks_fts"))
+
+# "fts5", "tsvector" or "like"; set by create_search_index() at startup
+backend = "like"
+
+
+# ----------------------------
+# Schema
+# ----------------------------
+def create_search_index(engine) -> str:
+    """
+    Create the full-text index for `engine`'s dialect and return the backend
+    in use. A newly created (or re-attached) FTS5 table is rebuilt from tasks.
+    """
+    global backend
+    try:
+        with engine.begin() as conn:
+            if engine.dialect.name == "sqlite":
+                existing = set(conn.scalars(text("SELECT name FROM sqlite_master")))
+                for ddl in SQLITE_DDL:
+                    conn.execute(text(ddl))
+                if not SQLITE_OBJECTS <= existing:
+                    # Triggers only see new writes; index the rows that are already there
+                    conn.execute(text("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')"))
+                backend = "fts5"
+            elif engine.dialect.name == "postgresql":
+                for ddl in POSTGRES_DDL:
+                    conn.execute(text(ddl))
+                backend = "tsvector"
+            else:
+                backend = "like"
+    except exc.SQLAlchemyError as e:
+        logger.warning(f"Full-text index unavailable, search falls back to LIKE: {e}")
+        backend = "like"
+    return backend
+
+
+# ----------------------------
+# Query Building
+# ----------------------------
+def search_terms(query: str) -> List[str]:
+    """Words of the query; punctuation and search operators are dropped, not interpreted."""
+    return re.findall(r"\w+", query.lower())[:MAX_SEARCH_TERMS]
+
+
+def match_clause(terms: List[str], using: Optional[str] = None):
+    """WHERE clause matching tasks that contain every term (as a word prefix)."""
+    using = using or backend
+    if using == "fts5":
+        fts_query = " ".join(f'"{term}"*' for term in terms)
+        return models.Task.id.in_(
+            select(tasks_fts.c.rowid).where(tasks_fts.c.tasks_fts.op("MATCH")(fts_query))
+        )
+    if using == "tsvector":
+        return text(f"{TSVECTOR_DOCUMENT} @@ to_tsquery('english', :tsquery)").bindparams(
+            tsquery=" & ".join(f"{term}:*" for term in terms)
+        )
+    return and_(
+        *(
+            or_(
+                models.Task.title.icontains(term, autoescape=True),
+                models.Task.description.icontains(term, autoescape=True),
+            )
+            for term in terms
+        )
+    )
+
+
+def as_utc(value):
+    """Naive datetimes are taken as UTC, which is how created_at is stored."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
@@ -0,0 +1,215 @@
+# app/task_stats.py
+#
+# Total / completed / open task counts without COUNT(*) over the table.
+# Triggers on `tasks` apply every insert, delete and completed flip to the
+# task_counters table in the same transaction, so the counts also cover
+# batch (Core) statements. Reading them sums at most COUNTER_SLOTS rows.
+#   SQLite     row triggers on a single counter row (writers are serialized anyway)
+#   PostgreSQL statement triggers with transition tables, each adding its
+#              delta to a random slot so concurrent writers don't queue on one row
+# reconcile() recounts from `tasks` and reports drift, e.g. after rows were
+# changed while the triggers were missing or by TRUNCATE; the app runs it
+# every TASK_STATS_RECONCILE_INTERVAL seconds.
+
+from typing import Optional
+import asyncio
+import logging
+import os
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, exc, func, insert, select, text
+
+from app import models
+
+logger = logging.getLogger("api_logger")
+
+TASK_STATS_RECONCILE_INTERVAL = float(os.getenv("TASK_STATS_RECONCILE_INTERVAL", "3600"))  # seconds, 0 = off
+COUNTER_SLOTS = 16   # PostgreSQL only
+
+# Set by create_counters() at startup; without triggers stats use COUNT(*)
+enabled = False
+
+SQLITE_DDL = (
+    """
+    CREATE TRIGGER IF NOT EXISTS task_counters_insert AFTER INSERT ON tasks BEGIN
+        UPDATE task_counters
+        SET total = total + 1, completed = completed + (coalesce(new.completed, 0) != 0)
+        WHERE slot = 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS task_counters_delete AFTER DELETE ON tasks BEGIN
+        UPDATE task_counters
+        SET total = total - 1, completed = completed - (coalesce(old.completed, 0) != 0)
+        WHERE slot = 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS task_counters_update AFTER UPDATE OF completed ON tasks
+    WHEN (coalesce(new.completed, 0) != 0) != (coalesce(old.completed, 0) != 0) BEGIN
+        UPDATE task_counters
+        SET completed = completed + (coalesce(new.completed, 0) != 0) - (coalesce(old.completed, 0) != 0)
+        WHERE slot = 0;
+    END
+    """,
+)
+SQLITE_OBJECTS = {"task_counters_insert", "task_counters_delete", "task_counters_update"}
+
+POSTGRES_DDL = (
+    f"""
+    CREATE OR REPLACE FUNCTION task_counters_apply() RETURNS trigger AS $$
+    DECLARE
+        delta_total bigint := 0;
+        delta_completed bigint := 0;
+    BEGIN
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            SELECT delta_total + count(*), delta_completed + count(*) FILTER (WHERE completed)
+            INTO delta_total, delta_completed FROM new_rows;
+        END IF;
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            SELECT delta_total - count(*), delta_completed - count(*) FILTER (WHERE completed)
+            INTO delta_total, delta_completed FROM old_rows;
+        END IF;
+        IF delta_total <> 0 OR delta_completed <> 0 THEN
+            INSERT INTO task_counters (slot, total, completed)
+            VALUES (floor(random() * {COUNTER_SLOTS})::int, delta_total, delta_completed)
+            ON CONFLICT (slot) DO UPDATE SET
+                total = task_counters.total + EXCLUDED.total,
+                completed = task_counters.completed + EXCLUDED.completed;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE TRIGGER task_counters_insert AFTER INSERT ON tasks
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION task_counters_apply()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER task_counters_delete AFTER DELETE ON tasks
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION task_counters_apply()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER task_counters_update AFTER UPDATE ON tasks
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_counters_apply()
+    """,
+)
+
+
+# ----------------------------
+# Schema
+# ----------------------------
+def create_counters(engine) -> bool:
+    """
+    Install the counter triggers for `engine`'s dialect and return whether
+    counters are in use. Counts are rebuilt from `tasks` when the triggers
+    were missing; other dialects (or a failure here) fall back to COUNT(*).
+    """
+    global enabled
+    enabled = False
+    try:
+        with engine.begin() as conn:
+            if engine.dialect.name == "sqlite":
+                existing = set(conn.scalars(text("SELECT name FROM sqlite_master WHERE type = 'trigger'")))
+                for ddl in SQLITE_DDL:
+                    conn.execute(text(ddl))
+                missing = not SQLITE_OBJECTS <= existing
+            elif engine.dialect.name == "postgresql":
+                missing = not conn.scalar(text("SELECT count(*) FROM pg_trigger WHERE tgname = 'task_counters_insert'"))
+                for ddl in POSTGRES_DDL:
+                    conn.execute(text(ddl))
+            else:
+                return enabled
+        if missing:
+            reconcile(engine)
+    except exc.SQLAlchemyError as e:
+        logger.warning(f"Task counter triggers unavailable, stats fall back to COUNT(*): {e}")
+        return enabled
+    enabled = True
+    return enabled
+
+
+# ----------------------------
+# Reading / Reconciling
+# ----------------------------
+def counts_statement():
+    return select(
+        func.coalesce(func.sum(models.TaskCounter.total), 0),
+        func.coalesce(func.sum(models.TaskCounter.completed), 0),
+    )
+
+
+def count_tasks_statement():
+    """The COUNT(*) the counters replace: used by reconcile() and where there are no triggers."""
+    return select(func.count(), func.count().filter(models.Task.completed.is_(True)))
+
+
+def stats_statement():
+    return counts_statement() if enabled else count_tasks_statement()
+
+
+def stats_from_row(row) -> dict:
+    total, completed = row
+    return {"total": total, "completed": completed, "open": total - completed}
+
+
+def reconcile(engine) -> dict:
+    """
+    Recount tasks and replace the counters with a single row. Returns the
+    fresh stats plus the drift (counter value minus actual) that was fixed.
+    """
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # Writers wait on their counter update until the recount commits,
+            # so none is both counted here and applied again afterwards
+            conn.execute(text("LOCK TABLE task_counters IN EXCLUSIVE MODE"))
+        # Delete first: on SQLite this takes the write lock before the recount reads
+        slots = delete(models.TaskCounter)
+        if conn.dialect.delete_returning:
+            rows = conn.execute(slots.returning(models.TaskCounter.total, models.TaskCounter.completed)).all()
+        else:
+            rows = conn.execute(select(models.TaskCounter.total, models.TaskCounter.completed)).all()
+            conn.execute(slots)
+        total, completed = conn.execute(count_tasks_statement()).one()
+        conn.execute(insert(models.TaskCounter).values(slot=0, total=total, completed=completed))
+
+    drift = {
+        "total": sum(row.total for row in rows) - total,
+        "completed": sum(row.completed for row in rows) - completed,
+    }
+    if any(drift.values()):
+        logger.warning(f"Task counters drifted and were reset: {drift}")
+    return {**stats_from_row((total, completed)), "drift": drift}
+
+
+class Reconciler:
+    """Runs reconcile() off the event loop every `interval` seconds while the app is up."""
+
+    def __init__(self, interval: float = TASK_STATS_RECONCILE_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self, engine):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await run_in_threadpool(reconcile, engine)
+            except Exception as e:
+                logger.warning(f"Task counter reconcile failed: {e}")
+
+    def start(self, engine):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run(engine))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+reconciler = Reconciler()
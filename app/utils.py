@@ -1,22 +1,21 @@
 # app/utils.py
 
-from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
-from fastapi import Request, HTTPException, status
-from typing import Optional
+from fastapi import Request, HTTPException
+from typing import Optional, Tuple
+import base64
+import hashlib
+import json
 import jwt
 import os
 import logging
+import time
 
-# ------------------------------
-# Optional Redis client
-# ------------------------------
-try:
-    from app.database import redis_client
-except Exception:
-    redis_client = None
+from app import ratelimit
+from app.passwords import pwd_context
+from app.cache import TTLCache
 
-logger = logging.getLogger(__name__)
+logger = logging.getLogger("api_logger.utils")
 
 # ------------------------------
 # JWT and Password Config
@@ -26,17 +25,19 @@ SECRET_KEY = os.getenv("JWT_SECRET_KEY", "super-secret-dev-key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-pwd_context = CryptContext(
-    schemes=["bcrypt"],
-    deprecated="auto"
-)
+# Verified tokens, keyed by a SHA-256 digest of the raw token
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
 
 # ------------------------------
 # Password Utilities
 # ------------------------------
 
+# Inline versions; request handlers use app.passwords.password_service so
+# bcrypt runs in the password process pool instead of the request thread.
+
 def hash_password(password: str) -> str:
-    """Hash a plain password using bcrypt."""
+    """Hash a plain password using bcrypt (cost BCRYPT_ROUNDS)."""
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -66,9 +67,18 @@ def create_access_token(
     )
 
 def decode_access_token(token: str) -> Optional[dict]:
-    """Decode a JWT token. Returns payload or None if invalid."""
+    """
+    Decode a JWT token. Returns payload or None if invalid.
+    Verified payloads are cached until their `exp`, so a reused token skips
+    signature verification and JSON decoding.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(key)
+    if payload is not None and payload["exp"] > time.time():
+        return dict(payload)
+
     try:
-        return jwt.decode(
+        payload = jwt.decode(
             token,
             SECRET_KEY,
             algorithms=[ALGORITHM]
@@ -80,48 +90,45 @@ def decode_access_token(token: str) -> Optional[dict]:
         logger.warning("Invalid JWT")
         return None
 
+    # Only tokens with an expiry are cached, and never past that expiry
+    if isinstance(payload.get("exp"), (int, float)):
+        remaining = min(payload["exp"] - time.time(), token_cache.ttl)
+        if remaining > 0:
+            token_cache.set(key, payload, ttl=remaining)
+    return dict(payload)
+
 # ------------------------------
-# Rate Limiter (Redis optional)
+# Cursor Pagination Utilities
 # ------------------------------
 
-RATE_LIMIT = 5        # max requests
-RATE_PERIOD = 60      # seconds
+def encode_cursor(created_at: datetime, task_id: int) -> str:
+    """Encode a (created_at, id) keyset position as an opaque, URL-safe cursor."""
+    raw = json.dumps([created_at.isoformat(), task_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    """Decode a cursor created by `encode_cursor`. Returns None if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, task_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = datetime.fromisoformat(created_at)
+    except (ValueError, TypeError):
+        return None
+    # Ids are bound as 64-bit integers; anything else would fail in the driver
+    if type(task_id) is not int or not 0 <= task_id < 2**63:
+        return None
+    return created_at, task_id
+
+# ------------------------------
+# Rate Limiter (Redis optional)
+# ------------------------------
 
 def rate_limiter(request: Request):
     """
     Simple IP-based rate limiter using Redis.
-    If Redis is unavailable, requests are allowed.
+    If Redis is unavailable, per-worker limits apply.
     """
-    if redis_client is None:
-        return
-
-    if not request.client:
-        return
-
-    client_ip = request.client.host
-    key = f"rate:{client_ip}"
-
-    try:
-        current = redis_client.get(key)
-
-        if current and int(current) >= RATE_LIMIT:
-            ttl = redis_client.ttl(key)
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail=f"Rate limit exceeded. Try again in {ttl} seconds"
-            )
-
-        pipe = redis_client.pipeline()
-        pipe.incr(key, 1)
-        pipe.expire(key, RATE_PERIOD)
-        pipe.execute()
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        # Never fail auth because Redis is down
-        logger.warning(f"Rate limiter skipped: {e}")
-        return
+    ratelimit.enforce(request)
 
 # ------------------------------
 # Custom API Exception
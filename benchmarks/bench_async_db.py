@@ -0,0 +1,86 @@
+"""
+p50/p99 latency of the sync (threadpool) routers vs the AsyncSession routers
+under many concurrent clients.
+
+    python benchmarks/bench_async_db.py --clients 500 --requests 10000
+
+Each mode runs the real app under uvicorn against the same seeded SQLite file;
+only the DATABASE_URL scheme differs (sqlite:// vs sqlite+aiosqlite://).
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+from common import report, run_server, summarize, use_temp_database
+
+MODES = {
+    "sync": "sqlite:///{path}",
+    "async": "sqlite+aiosqlite:///{path}",
+}
+
+
+async def load(base_url: str, clients: int, total: int, task_ids: list, headers: dict) -> dict:
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(f"/v1/tasks/{random.choice(task_ids)}")
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - started)
+                errors += not ok
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    return {**summarize(latencies), "rps": round(total / elapsed, 1), "errors": errors}
+
+
+def seed(base_url: str, tasks: int):
+    credentials = {"username": "benchuser", "password": "benchpassword123"}
+    httpx.post(f"{base_url}/v1/auth/register", json={**credentials, "email": "bench@example.com"})
+    token = httpx.post(f"{base_url}/v1/auth/login", data=credentials).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    created = httpx.post(
+        f"{base_url}/v1/tasks/batch",
+        headers=headers,
+        json=[{"title": f"Task {i}"} for i in range(tasks)],
+    )
+    created.raise_for_status()
+    return headers, [result["id"] for result in created.json()["results"]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--tasks", type=int, default=500)
+    args = parser.parse_args()
+
+    results = {}
+    for mode, template in MODES.items():
+        env = {"DATABASE_URL": template.format(path=use_temp_database(f"{mode}.db"))}
+        with run_server(env, workers=args.workers) as base_url:
+            headers, task_ids = seed(base_url, args.tasks)
+            results[mode] = asyncio.run(load(base_url, args.clients, args.requests, task_ids, headers))
+
+    report("async_db", {"clients": args.clients, "workers": args.workers, **results})
+
+
+if __name__ == "__main__":
+    main()
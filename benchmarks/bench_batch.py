@@ -0,0 +1,79 @@
+"""
+Rows/sec for the single-row task endpoints vs the /v1/tasks/batch endpoints.
+
+    python benchmarks/bench_batch.py --rows 2000 --batch-size 500
+
+Every single-row call pays for auth, rate limiting, a commit and a refresh;
+the batch endpoints pay for those once per batch.
+"""
+
+import argparse
+import time
+
+from common import auth_headers, report, use_temp_database
+
+
+def rows_per_second(rows: int, fn) -> float:
+    started = time.perf_counter()
+    fn()
+    return round(rows / (time.perf_counter() - started), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    use_temp_database()
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    client = TestClient(app)
+    headers = auth_headers(client)
+    payloads = [{"title": f"Bench task {i}", "description": "benchmark"} for i in range(args.rows)]
+    chunks = [payloads[i:i + args.batch_size] for i in range(0, args.rows, args.batch_size)]
+    ids = {}
+
+    def single_create():
+        ids["single"] = [client.post("/v1/tasks/", headers=headers, json=p).json()["id"] for p in payloads]
+
+    def batch_create():
+        ids["batch"] = [
+            result["id"]
+            for chunk in chunks
+            for result in client.post("/v1/tasks/batch", headers=headers, json=chunk).json()["results"]
+        ]
+
+    def single_update():
+        for task_id in ids["single"]:
+            client.put(f"/v1/tasks/{task_id}", headers=headers, json={"completed": True})
+
+    def batch_update():
+        for i in range(0, args.rows, args.batch_size):
+            chunk = ids["batch"][i:i + args.batch_size]
+            client.patch("/v1/tasks/batch", headers=headers, json=[{"id": t, "completed": True} for t in chunk])
+
+    def single_delete():
+        for task_id in ids["single"]:
+            client.delete(f"/v1/tasks/{task_id}", headers=headers)
+
+    def batch_delete():
+        for i in range(0, args.rows, args.batch_size):
+            client.request("DELETE", "/v1/tasks/batch", headers=headers, json=ids["batch"][i:i + args.batch_size])
+
+    report(
+        "batch",
+        {
+            "rows": args.rows,
+            "batch_size": args.batch_size,
+            "create_rows_per_sec": {"single": rows_per_second(args.rows, single_create), "batch": rows_per_second(args.rows, batch_create)},
+            "update_rows_per_sec": {"single": rows_per_second(args.rows, single_update), "batch": rows_per_second(args.rows, batch_update)},
+            "delete_rows_per_sec": {"single": rows_per_second(args.rows, single_delete), "batch": rows_per_second(args.rows, batch_delete)},
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
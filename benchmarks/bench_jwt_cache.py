@@ -0,0 +1,45 @@
+"""
+Throughput of decode_access_token with and without the verified-token cache.
+
+    python benchmarks/bench_jwt_cache.py --iterations 100000
+"""
+
+import argparse
+import timeit
+
+from common import report, use_temp_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100_000)
+    args = parser.parse_args()
+
+    use_temp_database()
+
+    import jwt
+    from app import utils
+
+    token = utils.create_access_token({"sub": "benchuser", "role": "user"})
+
+    def uncached():
+        jwt.decode(token, utils.SECRET_KEY, algorithms=[utils.ALGORITHM])
+
+    def cached():
+        utils.decode_access_token(token)
+
+    cached()  # warm the cache
+    results = {}
+    for name, fn in (("uncached", uncached), ("cached", cached)):
+        seconds = min(timeit.repeat(fn, number=args.iterations, repeat=3))
+        results[name] = {
+            "decodes_per_sec": round(args.iterations / seconds),
+            "us_per_decode": round(seconds / args.iterations * 1e6, 3),
+        }
+    results["speedup"] = round(results["cached"]["decodes_per_sec"] / results["uncached"]["decodes_per_sec"], 2)
+
+    report("jwt_cache", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Per-request cost of the request-logging middleware: the previous inline
+handler (json.dumps twice, synchronous write on the event loop) vs the
+queued pipeline in app/logs.py, with the json and orjson encoders.
+
+    python benchmarks/bench_logging.py --requests 20000
+    python benchmarks/bench_logging.py --output /tmp/requests.log
+
+Requests go through httpx's ASGI transport against a bare FastAPI app, so
+the numbers isolate the middleware. "overhead_us" is the mean latency above
+the same app without the logging middleware. Output goes to /dev/null by
+default; point --output at a file or pipe to include real write costs.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+import timeit
+
+from common import report, summarize, use_temp_database
+
+FIELDS = {"request_id": "6f1c3c1e-3c8e-4b0a-9a43-2d1b6fb0b0c1", "method": "GET", "path": "/ping", "status_code": 200}
+
+
+class LegacyJsonFormatter(logging.Formatter):
+    """The formatter app/main.py used before the queued pipeline."""
+
+    def format(self, record):
+        return json.dumps({"timestamp": self.formatTime(record), "level": record.levelname, "message": record.getMessage()})
+
+
+def legacy_logger(stream) -> logging.Logger:
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(LegacyJsonFormatter())
+    logger = logging.getLogger("bench.legacy")
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def pipeline_logger(name: str, pipeline) -> logging.Logger:
+    logger = logging.getLogger(f"bench.{name}")
+    logger.handlers = [pipeline.handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def build_app(log_request):
+    from fastapi import FastAPI, Request
+
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    if log_request is not None:
+        @app.middleware("http")
+        async def logging_middleware(request: Request, call_next):
+            started = time.perf_counter()
+            response = await call_next(request)
+            log_request(request, response, started)
+            return response
+
+    return app
+
+
+async def drive(app, total: int) -> list:
+    import httpx
+
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(200):  # warm up
+            await client.get("/ping")
+        for _ in range(total):
+            started = time.perf_counter()
+            await client.get("/ping")
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--calls", type=int, default=100_000, help="iterations for the bare logging-call timing")
+    parser.add_argument("--output", default="/dev/null")
+    args = parser.parse_args()
+
+    use_temp_database()
+
+    from app.logs import LogPipeline, get_encoder, sample_request
+
+    stream = open(args.output, "a", buffering=1)
+    legacy = legacy_logger(stream)
+    pipelines = {
+        encoder: LogPipeline(stream=stream, queue_size=args.requests + args.calls, encoder=get_encoder(encoder))
+        for encoder in ("json", "orjson")
+    }
+
+    def legacy_log(request, response, started):
+        legacy.info(json.dumps({**FIELDS, "path": request.url.path, "status_code": response.status_code}))
+
+    def queued_log(logger):
+        def log(request, response, started):
+            if sample_request(response.status_code):
+                logger.info(
+                    "request",
+                    extra={
+                        "fields": {
+                            **FIELDS,
+                            "path": request.url.path,
+                            "status_code": response.status_code,
+                            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                        }
+                    },
+                )
+        return log
+
+    variants = {"legacy": legacy_log}
+    calls = {"legacy": lambda: legacy.info(json.dumps(FIELDS))}
+    for encoder, pipeline in pipelines.items():
+        pipeline.start()
+        logger = pipeline_logger(encoder, pipeline)
+        variants[f"queued_{encoder}"] = queued_log(logger)
+        calls[f"queued_{encoder}"] = lambda logger=logger: logger.info("request", extra={"fields": FIELDS})
+
+    results = {"output": args.output}
+    baseline = summarize(asyncio.run(drive(build_app(None), args.requests)))
+    results["no_logging"] = baseline
+    for name, log_request in variants.items():
+        summary = summarize(asyncio.run(drive(build_app(log_request), args.requests)))
+        seconds = min(timeit.repeat(calls[name], number=args.calls, repeat=3))
+        results[name] = {
+            **summary,
+            "overhead_us": round((summary["mean_ms"] - baseline["mean_ms"]) * 1000, 1),
+            "us_per_log_call": round(seconds / args.calls * 1e6, 3),
+        }
+
+    for name, pipeline in pipelines.items():
+        pipeline.stop()
+        results[f"queued_{name}"]["dropped"] = pipeline.stats()["dropped"]
+    stream.close()
+
+    report("logging", results)
+
+
+if __name__ == "__main__":
+    main()
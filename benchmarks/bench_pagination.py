@@ -0,0 +1,57 @@
+"""
+Offset vs keyset pagination latency on GET /v1/tasks/ as page depth grows.
+
+    python benchmarks/bench_pagination.py --rows 200000
+
+Offset pages get slower the deeper they go (the DB walks and discards `skip`
+rows); keyset pages should stay flat because they seek on the
+(created_at, id) index.
+"""
+
+import argparse
+
+from common import auth_headers, report, seed_tasks, summarize, time_calls, use_temp_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    use_temp_database()
+
+    from fastapi.testclient import TestClient
+    from app import models, utils
+    from app.database import SessionLocal, engine
+    from app.main import app
+
+    seed_tasks(engine, args.rows)
+    client = TestClient(app)
+    headers = auth_headers(client)
+
+    depths = sorted({0, 1_000, 10_000, args.rows // 4, args.rows // 2, args.rows - args.limit - 1})
+    results = []
+    with SessionLocal() as db:
+        for depth in depths:
+            params_offset = {"skip": depth, "limit": args.limit}
+            params_keyset = {"limit": args.limit}
+            if depth:
+                row = (
+                    db.query(models.Task.created_at, models.Task.id)
+                    .order_by(models.Task.created_at, models.Task.id)
+                    .offset(depth - 1)
+                    .first()
+                )
+                params_keyset["cursor"] = utils.encode_cursor(row.created_at, row.id)
+
+            offset = time_calls(lambda: client.get("/v1/tasks/", headers=headers, params=params_offset), args.repeat)
+            keyset = time_calls(lambda: client.get("/v1/tasks/", headers=headers, params=params_keyset), args.repeat)
+            results.append({"depth": depth, "offset": summarize(offset), "keyset": summarize(keyset)})
+
+    report("pagination", results)
+
+
+if __name__ == "__main__":
+    main()
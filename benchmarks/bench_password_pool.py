@@ -0,0 +1,93 @@
+"""
+Login throughput with bcrypt inline (PASSWORD_WORKERS=0, the old behaviour)
+vs the password process pool, plus /health latency while the logins run.
+
+    python benchmarks/bench_password_pool.py --clients 50 --logins 500
+
+Each mode runs the real app under uvicorn. By default the queue fits every
+client so both modes complete all logins; pass --queue-size to see load
+shedding (503s are counted separately from errors).
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+from common import report, run_server, summarize, use_temp_database
+
+CREDENTIALS = {"username": "benchuser", "password": "benchpassword123"}
+
+
+async def login_load(client: httpx.AsyncClient, clients: int, total: int) -> dict:
+    latencies = []
+    counts = {"ok": 0, "shed": 0, "errors": 0}
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                status_code = (await client.post("/v1/auth/login", data=CREDENTIALS)).status_code
+            except httpx.HTTPError:
+                status_code = None
+            latencies.append(time.perf_counter() - started)
+            key = "ok" if status_code == 200 else "shed" if status_code == 503 else "errors"
+            counts[key] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    return {**summarize(latencies), **counts, "logins_per_sec": round(counts["ok"] / elapsed, 1)}
+
+
+async def probe_health(client: httpx.AsyncClient, stop: asyncio.Event) -> dict:
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/health")
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.01)
+    return summarize(latencies)
+
+
+async def run(base_url: str, clients: int, total: int) -> dict:
+    limits = httpx.Limits(max_connections=clients + 1)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        await client.post("/v1/auth/register", json={**CREDENTIALS, "email": "bench@example.com"})
+        stop = asyncio.Event()
+        probe = asyncio.create_task(probe_health(client, stop))
+        logins = await login_load(client, clients, total)
+        stop.set()
+        return {"login": logins, "health_during_logins": await probe}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--pool-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--queue-size", type=int, default=None, help="PASSWORD_QUEUE_SIZE (default: --clients, no shedding)")
+    args = parser.parse_args()
+
+    modes = {"inline": 0, "pool": args.pool_workers}
+    results = {}
+    for mode, workers in modes.items():
+        env = {
+            "DATABASE_URL": f"sqlite:///{use_temp_database(f'{mode}.db')}",
+            "PASSWORD_WORKERS": str(workers),
+            "PASSWORD_QUEUE_SIZE": str(args.queue_size if args.queue_size is not None else args.clients),
+            "BCRYPT_ROUNDS": str(args.rounds),
+            "RATE_LIMIT": "1000000",
+        }
+        with run_server(env) as base_url:
+            results[mode] = asyncio.run(run(base_url, args.clients, args.logins))
+
+    report("password_pool", {"clients": args.clients, "rounds": args.rounds, **results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Cost of one rate-limit decision for each algorithm: Redis round trips,
+commands executed server-side, and client-observed latency.
+
+    python benchmarks/bench_rate_limit.py --decisions 5000
+    python benchmarks/bench_rate_limit.py --redis-url redis://localhost:6379/15
+
+Without --redis-url the scripts run against fakeredis, so latency numbers only
+compare algorithms with each other; use a real Redis for absolute figures.
+"""
+
+import argparse
+
+from common import report, summarize, time_calls, use_temp_database
+
+
+class RoundTripCounter:
+    """Counts round trips (one per execute_command) made through a redis client."""
+
+    def __init__(self, client):
+        self.client = client
+        self.round_trips = 0
+        original = client.execute_command
+
+        def execute_command(*args, **kwargs):
+            self.round_trips += 1
+            return original(*args, **kwargs)
+
+        client.execute_command = execute_command
+
+    def close(self):
+        del self.client.execute_command
+
+
+def command_stats(client) -> dict:
+    """Server-side calls per command from INFO commandstats (real Redis only)."""
+    try:
+        return {name: stats["calls"] for name, stats in client.info("commandstats").items()}
+    except Exception:
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--decisions", type=int, default=5000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--period", type=float, default=1.0)
+    parser.add_argument("--redis-url", default=None)
+    args = parser.parse_args()
+
+    use_temp_database()
+
+    import redis
+    from app import ratelimit
+
+    if args.redis_url:
+        client = redis.Redis.from_url(args.redis_url, decode_responses=True)
+        client.ping()
+    else:
+        import fakeredis
+
+        client = fakeredis.FakeRedis(decode_responses=True)
+
+    results = {"backend": args.redis_url or "fakeredis"}
+    for name, limiter_class in ratelimit.ALGORITHMS.items():
+        limiter = limiter_class(client, limit=args.limit, period=args.period)
+        limiter.hit("rate:bench:warmup")  # load the script once
+        if args.redis_url:
+            client.config_resetstat()
+        counter = RoundTripCounter(client)
+
+        allowed = 0
+
+        def decide():
+            nonlocal allowed
+            allowed += limiter.hit(f"rate:bench:{name}").allowed
+
+        samples = time_calls(decide, args.decisions)
+        counter.close()
+        results[name] = {
+            **summarize(samples),
+            "round_trips_per_decision": round(counter.round_trips / args.decisions, 3),
+            "allowed": allowed,
+            "server_commands": command_stats(client),
+        }
+
+    report("rate_limit", results)
+
+
+if __name__ == "__main__":
+    main()
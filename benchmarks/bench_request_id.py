@@ -0,0 +1,124 @@
+"""
+Requests/sec on GET /health with the previous @app.middleware("http")
+request-ID handler (BaseHTTPMiddleware, uuid4, payload always built) vs
+the pure ASGI RequestContextMiddleware.
+
+    python benchmarks/bench_request_id.py --clients 20 --requests 20000
+    python benchmarks/bench_request_id.py --sample-rate 0.01
+
+Both variants log through the same queued pipeline to /dev/null and run
+in-process via httpx's ASGI transport, so the numbers isolate the
+middleware (no socket or uvicorn overhead).
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+
+from common import report, summarize, use_temp_database
+
+
+def build_app(variant: str, logger: logging.Logger, sample_rate: float):
+    from fastapi import FastAPI, Request
+
+    from app.logs import sample_request
+    from app.request_context import RequestContextMiddleware
+
+    app = FastAPI()
+
+    @app.get("/health")
+    def health_check():
+        return {"status": "ok"}
+
+    if variant == "base_http_middleware":
+        # The handler app/main.py used before RequestContextMiddleware
+        @app.middleware("http")
+        async def request_id_middleware(request: Request, call_next):
+            request_id = str(uuid.uuid4())
+            request.state.request_id = request_id
+            started = time.perf_counter()
+
+            response = await call_next(request)
+            response.headers["X-Request-ID"] = request_id
+
+            rate_limit_result = getattr(request.state, "rate_limit", None)
+            if rate_limit_result is not None:
+                response.headers.update(rate_limit_result.headers())
+
+            if sample_request(response.status_code, sample_rate):
+                logger.info(
+                    "request",
+                    extra={
+                        "fields": {
+                            "request_id": request_id,
+                            "method": request.method,
+                            "path": request.url.path,
+                            "status_code": response.status_code,
+                            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                        }
+                    },
+                )
+            return response
+    elif variant == "asgi":
+        app.add_middleware(RequestContextMiddleware, logger=logger, sample_rate=sample_rate)
+
+    return app
+
+
+async def load(app, clients: int, total: int) -> dict:
+    import httpx
+
+    latencies = []
+    remaining = iter(range(total))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(200):  # warm up
+            await client.get("/health")
+
+        async def worker():
+            for _ in remaining:
+                started = time.perf_counter()
+                response = await client.get("/health")
+                latencies.append(time.perf_counter() - started)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+    return {**summarize(latencies), "rps": round(total / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--sample-rate", type=float, default=1.0, help="LOG_SAMPLE_RATE for 2xx access logs")
+    args = parser.parse_args()
+
+    use_temp_database()
+
+    from app import request_context
+    from app.logs import LogPipeline
+
+    pipeline = LogPipeline(stream=open("/dev/null", "w"), queue_size=args.requests * 3)
+    pipeline.handler.addFilter(request_context.RequestIdFilter())
+    pipeline.start()
+    logger = logging.getLogger("bench.request_id")
+    logger.handlers = [pipeline.handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    results = {"clients": args.clients, "sample_rate": args.sample_rate}
+    for variant in ("no_middleware", "base_http_middleware", "asgi"):
+        app = build_app(variant, logger, args.sample_rate)
+        results[variant] = asyncio.run(load(app, args.clients, args.requests))
+    pipeline.stop()
+    results["speedup"] = round(results["asgi"]["rps"] / results["base_http_middleware"]["rps"], 2)
+
+    report("request_id", results)
+
+
+if __name__ == "__main__":
+    main()
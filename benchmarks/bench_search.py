@@ -0,0 +1,142 @@
+"""
+Task search latency: client-side filtering vs GET /v1/tasks/search backed by
+LIKE scans vs the FTS5 index, on a large table.
+
+    python benchmarks/bench_search.py --rows 1000000
+    python benchmarks/bench_search.py --rows 200000 --client-repeat 0   # skip the slow baseline
+
+client_side is what clients had to do before /tasks/search existed: page
+through GET /v1/tasks/ (limit=1000) and filter by substring locally. It is
+timed --client-repeat times (default once; at 1M rows it is 1000 requests).
+like and fts hit /tasks/search with the same filters, with the search
+backend switched between a LIKE table scan and the FTS5 index.
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta, timezone
+
+from common import auth_headers, report, summarize, time_calls, use_temp_database
+
+VOCABULARY_SIZE = 5000
+# Marker words with a known share of rows: COMMON in 10% of titles, RARE in 0.01%
+COMMON, RARE = "urgent", "escalated"
+
+
+def vocabulary(rng: random.Random) -> list:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return sorted({"".join(rng.choices(letters, k=rng.randint(5, 9))) for _ in range(VOCABULARY_SIZE)})
+
+
+def seed(engine, count: int, words: list, rng: random.Random, chunk: int = 10_000) -> None:
+    """Bulk insert `count` tasks with random titles; the FTS triggers index them as they go."""
+    from app import models
+
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    table = models.Task.__table__
+
+    def title(i):
+        marker = [COMMON] if i % 10 == 0 else [RARE] if i % 10_000 == 5 else []
+        return " ".join(marker + rng.choices(words, k=3))
+
+    with engine.begin() as conn:
+        for offset in range(0, count, chunk):
+            conn.execute(
+                table.insert(),
+                [
+                    {
+                        "title": title(i),
+                        "description": " ".join(rng.choices(words, k=8)),
+                        "completed": i % 3 == 0,
+                        "created_at": start + timedelta(seconds=i),
+                    }
+                    for i in range(offset, min(offset + chunk, count))
+                ],
+            )
+
+
+def client_side_search(client, headers, terms=(), completed=None, created_after=None, created_before=None):
+    """Fetch every task and filter locally, the way clients did before /tasks/search."""
+    matches, cursor = [], None
+    while True:
+        params = {"limit": 1000, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/v1/tasks/", headers=headers, params=params)
+        for task in response.json():
+            text = f"{task['title']} {task['description'] or ''}".lower()
+            if not all(term in text for term in terms):
+                continue
+            if completed is not None and task["completed"] != completed:
+                continue
+            created = datetime.fromisoformat(task["created_at"]).replace(tzinfo=timezone.utc)
+            if created_after is not None and created < created_after:
+                continue
+            if created_before is not None and created >= created_before:
+                continue
+            matches.append(task)
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=100, help="page size for /tasks/search")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--client-repeat", type=int, default=1, help="runs of the client-side baseline, 0 = skip")
+    args = parser.parse_args()
+
+    use_temp_database()
+
+    from fastapi.testclient import TestClient
+    from app import search
+    from app.database import engine
+    from app.main import app
+
+    rng = random.Random(0)
+    words = vocabulary(rng)
+    seed(engine, args.rows, words, rng)
+    client = TestClient(app)
+    headers = auth_headers(client)
+
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    window = (start + timedelta(seconds=args.rows // 2), start + timedelta(seconds=args.rows // 2 + 3600))
+    cases = {
+        "common_word": {"q": COMMON},                 # 10% of rows: the first page fills early
+        "rare_word": {"q": RARE},                     # 0.01% of rows: LIKE scans the whole table
+        "vocabulary_word": {"q": words[len(words) // 2]},   # ~0.2% of rows
+        "two_words_completed": {"q": f"{COMMON} {words[0]}", "completed": True},
+        "completed_in_last_hour": {"completed": False, "created_after": window[0], "created_before": window[1]},
+    }
+
+    results = {"rows": args.rows, "backend": search.backend, "cases": {}}
+    indexed_backend = search.backend
+    for name, params in cases.items():
+        params = {**params, "limit": args.limit}
+        case = {}
+        for variant, backend in (("like", "like"), ("fts", indexed_backend)):
+            search.backend = backend
+            case[variant] = summarize(
+                time_calls(lambda: client.get("/v1/tasks/search", headers=headers, params=params), args.repeat)
+            )
+        search.backend = indexed_backend
+
+        if args.client_repeat:
+            filters = {
+                "terms": params.get("q", "").split(),
+                "completed": params.get("completed"),
+                "created_after": params.get("created_after"),
+                "created_before": params.get("created_before"),
+            }
+            case["client_side"] = summarize(
+                time_calls(lambda: client_side_search(client, headers, **filters), args.client_repeat)
+            )
+            case["fts_speedup_vs_client_side"] = round(case["client_side"]["mean_ms"] / case["fts"]["mean_ms"], 1)
+        case["fts_speedup_vs_like"] = round(case["like"]["mean_ms"] / case["fts"]["mean_ms"], 1)
+        results["cases"][name] = case
+
+    report("search", results)
+
+
+if __name__ == "__main__":
+    main()
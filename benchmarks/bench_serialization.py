@@ -0,0 +1,90 @@
+"""
+Rows/sec serialized for task list pages: the response_model path (ORM
+objects -> validation -> jsonable dict -> json.dumps) vs the column-only
+fast path (TASK_LIST_FAST_PATH) encoding rows with orjson or a TypeAdapter.
+
+    python benchmarks/bench_serialization.py --rows 20000 --page-size 1000
+
+"serialize" times fetching one page and turning it into response bytes,
+in-process; "endpoint" times GET /v1/tasks/?limit=<page-size> end to end
+through the ASGI app (auth, middleware, pagination headers, ETag).
+"""
+
+import argparse
+import asyncio
+
+from common import auth_headers, report, seed_tasks, summarize, time_calls, use_temp_database
+
+
+def rows_per_second(samples: list, rows: int) -> float:
+    return round(rows * len(samples) / sum(samples), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    use_temp_database()
+
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.testclient import TestClient
+    from fastapi.utils import create_model_field
+    from typing import List
+    from sqlalchemy import select
+
+    from app import models, schemas
+    from app.database import SessionLocal, engine
+    from app.main import app
+    from app.routers import tasks
+
+    seed_tasks(engine, args.rows)
+    response_field = create_model_field(name="Response", type_=List[schemas.TaskResponse], mode="serialization")
+    page = select(models.Task).order_by(models.Task.created_at, models.Task.id).limit(args.page_size)
+
+    def response_model_path(db):
+        orm_tasks = db.scalars(page).all()
+        content = asyncio.run(serialize_response(field=response_field, response_content=orm_tasks))
+        return JSONResponse(content).body
+
+    def fast_path(db, encoder):
+        tasks.TASK_LIST_ENCODER = encoder
+        return tasks.encode_task_list(db.execute(page.with_only_columns(*tasks.TASK_LIST_COLUMNS)).all())
+
+    results = {"rows": args.rows, "page_size": args.page_size, "serialize": {}, "endpoint": {}}
+    with SessionLocal() as db:
+        baseline = response_model_path(db)
+        variants = {
+            "response_model": lambda: response_model_path(db),
+            "fast_orjson": lambda: fast_path(db, "auto"),
+            "fast_pydantic": lambda: fast_path(db, "pydantic"),
+        }
+        for name, variant in variants.items():
+            assert variant() == baseline, f"{name} output differs from response_model"
+            samples = time_calls(variant, args.repeat)
+            results["serialize"][name] = {**summarize(samples), "rows_per_sec": rows_per_second(samples, args.page_size)}
+    tasks.TASK_LIST_ENCODER = "auto"
+
+    client = TestClient(app)
+    headers = auth_headers(client)
+    for name, fast in (("response_model", False), ("fast_path", True)):
+        tasks.TASK_LIST_FAST_PATH = fast
+        get_page = lambda: client.get("/v1/tasks/", headers=headers, params={"limit": args.page_size})
+        get_page()
+        samples = time_calls(get_page, args.repeat)
+        results["endpoint"][name] = {**summarize(samples), "rows_per_sec": rows_per_second(samples, args.page_size)}
+
+    results["serialize_speedup"] = round(
+        results["serialize"]["fast_orjson"]["rows_per_sec"] / results["serialize"]["response_model"]["rows_per_sec"], 2
+    )
+    results["endpoint_speedup"] = round(
+        results["endpoint"]["fast_path"]["rows_per_sec"] / results["endpoint"]["response_model"]["rows_per_sec"], 2
+    )
+    report("serialization", results)
+
+
+if __name__ == "__main__":
+    main()
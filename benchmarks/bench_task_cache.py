@@ -0,0 +1,72 @@
+"""
+GET /v1/tasks/{id} latency and cache hit ratio with the task read cache on
+vs off (TASK_CACHE_TTL=0), under a skewed "hot ids" access pattern.
+
+    python benchmarks/bench_task_cache.py --clients 50 --requests 10000
+
+Set REDIS_URL to include the shared Redis tier; without Redis only the
+in-process tier is measured. Hit/miss counters come from /health/detailed.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+from bench_async_db import seed
+from common import report, run_server, summarize, use_temp_database
+
+MODES = {"uncached": "0", "cached": "5"}
+
+
+async def load(base_url: str, clients: int, total: int, task_ids: list, headers: dict, skew: float) -> dict:
+    latencies = []
+    remaining = iter(range(total))
+    # Zipf-like weights: a handful of ids get most of the traffic, like dashboard polling
+    weights = [1 / (rank + 1) ** skew for rank in range(len(task_ids))]
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=60) as client:
+        async def worker():
+            for _ in remaining:
+                task_id = random.choices(task_ids, weights)[0]
+                started = time.perf_counter()
+                response = await client.get(f"/v1/tasks/{task_id}")
+                latencies.append(time.perf_counter() - started)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+        cache = (await client.get("/health/detailed")).json()["caches"]["tasks"]
+    return {**summarize(latencies), "rps": round(total / elapsed, 1), "cache": cache}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for id popularity")
+    args = parser.parse_args()
+
+    results = {}
+    for mode, ttl in MODES.items():
+        env = {
+            "DATABASE_URL": f"sqlite:///{use_temp_database(f'{mode}.db')}",
+            "TASK_CACHE_TTL": ttl,
+        }
+        with run_server(env) as base_url:
+            headers, task_ids = seed(base_url, args.tasks)
+            results[mode] = asyncio.run(
+                load(base_url, args.clients, args.requests, task_ids, headers, args.skew)
+            )
+
+    report("task_cache", {"clients": args.clients, "skew": args.skew, **results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Shared helpers for the benchmark scripts in this directory."""
+
+import contextlib
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def use_temp_database(name: str = "bench.db") -> str:
+    """
+    Point the app at a throwaway SQLite file and lift the default rate limit
+    (the per-worker fallback applies even without Redis).
+    Must be called before anything from `app` is imported.
+    """
+    path = os.path.join(tempfile.mkdtemp(prefix="task-api-bench-"), name)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("RATE_LIMIT", "1000000")
+    return path
+
+
+def seed_tasks(engine, count: int, chunk: int = 10_000) -> None:
+    """Bulk insert `count` tasks with strictly increasing created_at values."""
+    from app import models
+
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    table = models.Task.__table__
+    with engine.begin() as conn:
+        for offset in range(0, count, chunk):
+            conn.execute(
+                table.insert(),
+                [
+                    {
+                        "title": f"Task {i}",
+                        "description": f"Seeded task number {i}",
+                        "completed": i % 3 == 0,
+                        "created_at": start + timedelta(microseconds=i),
+                    }
+                    for i in range(offset, min(offset + chunk, count))
+                ],
+            )
+
+
+def auth_headers(client, username: str = "benchuser", password: str = "benchpassword123") -> dict:
+    """Register (if needed) and log in a user, returning Authorization headers."""
+    client.post(
+        "/v1/auth/register",
+        json={"username": username, "email": f"{username}@example.com", "password": password},
+    )
+    response = client.post("/v1/auth/login", data={"username": username, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def run_server(env: dict, workers: int = 1, startup_timeout: float = 30.0):
+    """
+    Run the app under uvicorn in a subprocess and yield its base URL.
+    `env` is merged over the current environment (e.g. DATABASE_URL).
+    """
+    import httpx
+
+    port = free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ],
+        cwd=ROOT,
+        # WEB_CONCURRENCY also sizes each worker's bcrypt pool (app/passwords.py)
+        env={**os.environ, "WEB_CONCURRENCY": str(workers), **env},
+        stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            try:
+                if httpx.get(f"{base_url}/health").status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("uvicorn did not start")
+            time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def time_calls(fn, repeat: int) -> list:
+    """Call `fn` `repeat` times and return the wall-clock duration of each call in seconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def summarize(samples: list) -> dict:
+    """Latency summary in milliseconds."""
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(pct(50), 3),
+        "p95_ms": round(pct(95), 3),
+        "p99_ms": round(pct(99), 3),
+    }
+
+
+def report(name: str, results) -> None:
+    """Print benchmark results as JSON so runs can be diffed."""
+    print(json.dumps({"benchmark": name, "results": results}, indent=2, default=str))
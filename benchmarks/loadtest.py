@@ -0,0 +1,325 @@
+"""
+Load test: throughput and latency of the whole API under concurrent clients.
+
+    python benchmarks/loadtest.py                                  # every scenario, in-process
+    python benchmarks/loadtest.py --mode uvicorn --workers 4       # real server, 4 workers
+    python benchmarks/loadtest.py --scenarios crud_mix,pagination --clients 50 --duration 20
+    python benchmarks/loadtest.py --save-baseline baseline.json
+    python benchmarks/loadtest.py --compare baseline.json --tolerance 0.15   # exit 1 on regression
+
+Scenarios (closed loop: each client sends its next request when the last one returns):
+  login         POST /v1/auth/login (bcrypt via the password pool; 503 = shed)
+  crud_mix      60% read one, 15% list, 15% create, 5% update, 5% delete
+  pagination    keyset cursor and ?skip= pages at increasing depths
+  rate_limited  empty POST /v1/tasks/batch over a 10/min budget, i.e. mostly 429s
+
+The database is a fresh SQLite file seeded with --rows tasks. Redis is a
+fakeredis TCP server unless --redis-url is given (or "none"), so the rate
+limiter and caches take their Redis paths. --mode inprocess drives the app
+through httpx's ASGI transport on the harness's own event loop (no sockets,
+one process); --mode uvicorn starts `uvicorn --workers N` and talks HTTP.
+Runs are seeded (--seed) so the request sequence is the same every time.
+
+Results are printed as JSON: per scenario rps, p50/p95/p99, status counts and
+a per-operation breakdown. --compare diffs rps/p95/p99 against a stored
+baseline and fails when any gets worse by more than --tolerance.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from common import free_port, report, run_server, seed_tasks, summarize, use_temp_database
+
+SCENARIOS = ("login", "crud_mix", "pagination", "rate_limited")
+CREDENTIALS = {"username": "loaduser", "password": "loadpassword123"}
+# Budget for the rate_limited scenario; the other routes keep RATE_LIMIT (lifted by use_temp_database)
+RATE_LIMIT_POLICIES = {"tasks:batch": {"limit": 10, "period": 60}}
+PAGE_SIZE = 50
+# (metric, higher is better) compared against the baseline
+COMPARED_METRICS = (("rps", True), ("p95_ms", False), ("p99_ms", False))
+
+
+# ----------------------------
+# Environment
+# ----------------------------
+def start_fake_redis() -> str:
+    """Serve fakeredis over TCP in a daemon thread so uvicorn workers can share it."""
+    import fakeredis
+
+    port = free_port()
+    server = fakeredis.TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    server.daemon_threads = True   # connection handlers must not keep the harness alive
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"redis://127.0.0.1:{port}/0"
+
+
+def prepare_environment(args) -> dict:
+    """Seeded database + Redis; returns the environment the app must run with."""
+    database = use_temp_database("loadtest.db")
+    redis_url = start_fake_redis() if args.redis_url is None else args.redis_url
+    env = {
+        "DATABASE_URL": f"sqlite:///{database}",
+        # "none": an unreachable URL, so the app starts without Redis
+        "REDIS_URL": "redis://127.0.0.1:1/0" if redis_url == "none" else redis_url,
+        "RATE_LIMIT_POLICIES": json.dumps(RATE_LIMIT_POLICIES),
+        "RATE_LIMIT": os.environ["RATE_LIMIT"],
+    }
+    os.environ.update(env)
+
+    # Importing the app creates the schema, FTS index and counters; seeding goes through the triggers
+    from app import ratelimit
+    from app.database import engine
+    from app.main import app  # noqa: F401
+
+    if args.redis_url is None:
+        # fakeredis drops connections when several of them load a script at once
+        # (the NOSCRIPT fallback of the first concurrent EVALSHAs), so load them up front
+        client = ratelimit.redis.Redis.from_url(redis_url)
+        for limiter in ratelimit.ALGORITHMS.values():
+            client.script_load(limiter.script)
+    seed_tasks(engine, args.rows)
+    return env
+
+
+def page_cursors(rows: int) -> dict:
+    """Keyset cursors (and matching offsets) at a few depths into the seeded table."""
+    from app import models, utils
+    from app.database import SessionLocal
+
+    depths = sorted({0, min(1_000, rows // 10), rows // 2, max(rows - PAGE_SIZE - 1, 0)})
+    cursors = {}
+    with SessionLocal() as db:
+        for depth in depths:
+            if depth == 0:
+                cursors[depth] = None
+                continue
+            row = (
+                db.query(models.Task.created_at, models.Task.id)
+                .order_by(models.Task.created_at, models.Task.id)
+                .offset(depth - 1)
+                .first()
+            )
+            cursors[depth] = utils.encode_cursor(row.created_at, row.id)
+    return cursors
+
+
+# ----------------------------
+# Scenarios
+# ----------------------------
+# Each scenario is an async callable (client, rng, state) -> (operation tag, response)
+
+
+async def login(client, rng, state):
+    return "login", await client.post("/v1/auth/login", data=CREDENTIALS)
+
+
+async def crud_mix(client, rng, state):
+    headers = state["headers"]
+    roll = rng.random()
+    if roll < 0.60:
+        task_id = rng.randint(1, state["rows"])
+        return "read", await client.get(f"/v1/tasks/{task_id}", headers=headers)
+    if roll < 0.75:
+        return "list", await client.get("/v1/tasks/", headers=headers, params={"limit": PAGE_SIZE})
+    created = state["created"]
+    if roll < 0.90 or not created:
+        response = await client.post("/v1/tasks/", headers=headers, json={"title": f"load {rng.random():.6f}"})
+        if response.status_code == 201:
+            created.append(response.json()["id"])
+        return "create", response
+    if roll < 0.95:
+        task_id = rng.choice(created)
+        return "update", await client.put(f"/v1/tasks/{task_id}", headers=headers, json={"completed": True})
+    task_id = created.pop(rng.randrange(len(created)))
+    return "delete", await client.delete(f"/v1/tasks/{task_id}", headers=headers)
+
+
+async def pagination(client, rng, state):
+    depth = rng.choice(list(state["cursors"]))
+    if rng.random() < 0.5:
+        cursor = state["cursors"][depth]
+        params = {"limit": PAGE_SIZE, **({"cursor": cursor} if cursor else {})}
+        return f"keyset_{depth}", await client.get("/v1/tasks/", headers=state["headers"], params=params)
+    params = {"limit": PAGE_SIZE, "skip": depth}
+    return f"offset_{depth}", await client.get("/v1/tasks/", headers=state["headers"], params=params)
+
+
+async def rate_limited(client, rng, state):
+    response = await client.post("/v1/tasks/batch", headers=state["headers"], json=[])
+    return ("rejected" if response.status_code == 429 else "allowed"), response
+
+
+SCENARIO_FUNCTIONS = {
+    "login": login,
+    "crud_mix": crud_mix,
+    "pagination": pagination,
+    "rate_limited": rate_limited,
+}
+
+
+# ----------------------------
+# Driver
+# ----------------------------
+async def run_scenario(client, scenario, state: dict, args) -> dict:
+    """Run `scenario` from --clients concurrent loops for --warmup + --duration seconds."""
+    import httpx
+
+    latencies = []
+    by_operation = defaultdict(list)
+    statuses = defaultdict(int)
+    started = time.perf_counter()
+    measure_from = started + args.warmup
+    stop_at = measure_from + args.duration
+
+    async def client_loop(index: int):
+        rng = random.Random(f"{args.seed}:{scenario.__name__}:{index}")
+        client_state = {**state, "created": []}
+        while True:
+            sent = time.perf_counter()
+            if sent >= stop_at:
+                return
+            try:
+                operation, response = await scenario(client, rng, client_state)
+                status = str(response.status_code)
+            except httpx.HTTPError:
+                operation, status = "error", "error"
+            if sent < measure_from:
+                continue
+            elapsed = time.perf_counter() - sent
+            latencies.append(elapsed)
+            by_operation[operation].append(elapsed)
+            statuses[status] += 1
+
+    await asyncio.gather(*(client_loop(index) for index in range(args.clients)))
+    measured = time.perf_counter() - measure_from
+    if not latencies:
+        return {"count": 0, "rps": 0.0, "statuses": {}}
+    return {
+        **summarize(latencies),
+        "rps": round(len(latencies) / measured, 1),
+        "statuses": dict(sorted(statuses.items())),
+        "operations": {name: summarize(samples) for name, samples in sorted(by_operation.items())},
+    }
+
+
+async def run_scenarios(client, args) -> dict:
+    await client.post("/v1/auth/register", json={**CREDENTIALS, "email": "loaduser@example.com"})
+    token = (await client.post("/v1/auth/login", data=CREDENTIALS)).json()["access_token"]
+    state = {
+        "headers": {"Authorization": f"Bearer {token}"},
+        "rows": args.rows,
+        "cursors": page_cursors(args.rows),
+    }
+    results = {}
+    for name in args.scenarios:
+        results[name] = await run_scenario(client, SCENARIO_FUNCTIONS[name], state, args)
+        print(f"{name}: {results[name]['rps']} rps", file=sys.stderr)
+    return results
+
+
+async def run_inprocess(args) -> dict:
+    import httpx
+    from app.logs import log_pipeline
+    from app.main import app
+
+    # Keep the cost of access logging but not the output (uvicorn mode discards stdout too)
+    log_pipeline.output.setStream(open(os.devnull, "w"))
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+            return await run_scenarios(client, args)
+
+
+async def run_http(base_url: str, args) -> dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        return await run_scenarios(client, args)
+
+
+# ----------------------------
+# Baseline Comparison
+# ----------------------------
+def load_baseline(path: str) -> dict:
+    with open(path) as f:
+        data = json.load(f)
+    return data.get("results", data)
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> dict:
+    """Relative change per scenario metric; `regressed` when worse by more than `tolerance`."""
+    diff, regressions = {}, []
+    for scenario, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(scenario)
+        if not before:
+            continue
+        diff[scenario] = {}
+        for metric, higher_is_better in COMPARED_METRICS:
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = change < -tolerance if higher_is_better else change > tolerance
+            diff[scenario][metric] = {"baseline": old, "current": new, "change": round(change, 3), "regressed": regressed}
+            if regressed:
+                regressions.append(f"{scenario}.{metric}")
+    return {"tolerance": tolerance, "scenarios": diff, "regressions": regressions}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--workers", type=int, default=4, help="uvicorn workers (--mode uvicorn)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma separated, from {SCENARIOS}")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before each scenario")
+    parser.add_argument("--rows", type=int, default=10_000, help="tasks seeded into the database")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--redis-url", default=None, help='real Redis URL, or "none" (default: fakeredis over TCP)')
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH", help="baseline JSON from --save-baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {sorted(unknown)}")
+
+    env = prepare_environment(args)
+    if args.mode == "uvicorn":
+        with run_server(env, workers=args.workers) as base_url:
+            scenarios = asyncio.run(run_http(base_url, args))
+    else:
+        scenarios = asyncio.run(run_inprocess(args))
+
+    results = {
+        "config": {
+            key: getattr(args, key)
+            for key in ("mode", "workers", "clients", "duration", "warmup", "rows", "seed")
+            if args.mode == "uvicorn" or key != "workers"
+        },
+        "redis": "fakeredis" if args.redis_url is None else args.redis_url,
+        "scenarios": scenarios,
+    }
+    if args.compare:
+        results["comparison"] = compare(results, load_baseline(args.compare), args.tolerance)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({"benchmark": "loadtest", "results": results}, f, indent=2)
+
+    report("loadtest", results)
+    if args.compare and results["comparison"]["regressions"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
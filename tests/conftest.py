@@ -1,9 +1,19 @@
 import sys
 import os
 import logging
+import tempfile
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+# Run against a throwaway database instead of the checked-in dev tasks.db
+os.environ.setdefault(
+    "DATABASE_URL",
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='task-api-tests-'), 'tasks.db')}",
+)
+
+# Without Redis the per-worker fallback limiter applies; keep it out of the way
+os.environ.setdefault("RATE_LIMIT", "1000")
+
 from fastapi.testclient import TestClient
 import pytest
 
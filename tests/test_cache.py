@@ -0,0 +1,348 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import fakeredis
+import pytest
+from fastapi import status
+
+from app import models
+from app.cache import SingleFlight, TaskCache, TTLCache, task_cache, user_cache
+from app.database import SessionLocal
+
+
+def get_headers(client):
+    response = client.post(
+        "/v1/auth/login",
+        data={"username": "testuser", "password": "strongpassword123"},
+    )
+    try:
+        assert response.status_code == status.HTTP_200_OK, f"Login failed: {response.text}"
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    except AssertionError as e:
+        pytest.fail(f"Authentication setup failed: {e}")
+
+
+def test_ttl_cache_expiry_and_lru():
+    """Entries expire after their TTL and the least recently used entry is evicted"""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    cache.set("short", 4, ttl=0.01)
+    time.sleep(0.02)
+    try:
+        assert cache.get("b") is None, "LRU entry was not evicted"
+        assert cache.get("short") is None, "Expired entry was served"
+        assert cache.stats()["misses"] == 2, f"Unexpected stats: {cache.stats()}"
+    except AssertionError as e:
+        pytest.fail(f"TTL cache test failed: {e}")
+
+
+def test_user_cache_hits_and_invalidation(client):
+    """get_user serves repeat requests from the cache and drops users whose role changes"""
+    headers = get_headers(client)
+    user_cache.clear()
+
+    client.get("/v1/tasks/", headers=headers)
+    hits_before = user_cache.stats()["hits"]
+    client.get("/v1/tasks/", headers=headers)
+    try:
+        assert user_cache.stats()["hits"] == hits_before + 1, f"Second request missed: {user_cache.stats()}"
+        assert user_cache.get("testuser") is not None, "User not cached"
+
+        with SessionLocal() as db:
+            user = db.query(models.User).filter(models.User.username == "testuser").first()
+            user.role = "admin"
+            db.commit()
+            assert user_cache.get("testuser") is None, "Role change did not invalidate the cache"
+            user.role = "user"
+            db.commit()
+    except AssertionError as e:
+        pytest.fail(f"User cache test failed: {e}")
+
+
+def test_user_cache_invalidates_on_commit_not_flush(client):
+    """A user cached again between flush and commit is still dropped; a rollback drops nothing"""
+    get_headers(client)
+    user_cache.clear()
+    try:
+        with SessionLocal() as db:
+            user = db.query(models.User).filter(models.User.username == "testuser").first()
+            user_cache.set(user)
+            user.role = "admin"
+            db.flush()
+            assert user_cache.get("testuser") is not None, "Cache dropped before commit"
+            db.rollback()
+            assert user_cache.get("testuser") is not None, "Rolled back change invalidated the cache"
+
+            user.role = "admin"
+            db.flush()
+            # a concurrent request re-caches the committed (old) row before this commit
+            user_cache.set(models.User(id=user.id, username="testuser", email=user.email, role="user"))
+            db.commit()
+            assert user_cache.get("testuser") is None, "Stale user survived the commit"
+            user.role = "user"
+            db.commit()
+    except AssertionError as e:
+        pytest.fail(f"User cache commit test failed: {e}")
+
+
+def test_async_session_commit_leaves_redis_to_the_threadpool(tmp_path, monkeypatch):
+    """Committing a user change on an AsyncSession defers the Redis delete until it is awaited"""
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app import cache
+    from app.database import Base
+
+    calls = []
+
+    class RecordingRedis(fakeredis.FakeRedis):
+        def execute_command(self, *args, **kwargs):
+            calls.append((args[0], threading.current_thread()))
+            return super().execute_command(*args, **kwargs)
+
+    shared = RecordingRedis(decode_responses=True)
+    monkeypatch.setattr(cache, "user_cache", cache.UserCache(shared))
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'users.db'}")
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            user = models.User(username="asyncuser", email="a@example.com", hashed_password="x")
+            db.add(user)
+            await db.commit()
+            cache.user_cache.set(user)
+            calls.clear()
+
+            user.role = "admin"
+            await db.commit()
+            during_commit = list(calls)
+            cached_after_commit = shared.get("user:asyncuser")
+            await cache.invalidate_committed_users(db)
+        await engine.dispose()
+        return during_commit, cached_after_commit, threading.current_thread()
+
+    during_commit, cached_after_commit, loop_thread = asyncio.run(run())
+    try:
+        assert during_commit == [], f"Commit called Redis on the event loop: {during_commit}"
+        assert cached_after_commit is not None, "Entry dropped before invalidate_committed_users"
+        assert shared.get("user:asyncuser") is None, "Redis entry not invalidated"
+        assert cache.user_cache.local.get("asyncuser") is None, "Local entry not invalidated"
+        deletes = [thread for name, thread in calls if name == "DEL"]
+        assert deletes and loop_thread not in deletes, f"Redis delete ran on the loop: {calls}"
+    except AssertionError as e:
+        pytest.fail(f"Async user invalidation test failed: {e}")
+
+
+def test_token_cache_respects_expiry():
+    """Verified tokens are served from the cache, but never after their exp claim"""
+    import hashlib
+    from app import utils
+
+    token = utils.create_access_token({"sub": "cacheuser"})
+    first = utils.decode_access_token(token)
+    hits_before = utils.token_cache.hits
+    second = utils.decode_access_token(token)
+
+    # Plant an already-expired entry: it must be ignored and re-verified
+    forged = "not-a-real-token"
+    utils.token_cache.set(hashlib.sha256(forged.encode()).digest(), {"sub": "x", "exp": time.time() - 1})
+    try:
+        assert first == second and second["sub"] == "cacheuser", f"Unexpected payload: {second}"
+        assert utils.token_cache.hits == hits_before + 1, "Second decode was not a cache hit"
+        assert utils.decode_access_token(forged) is None, "Expired cache entry was served"
+    except AssertionError as e:
+        pytest.fail(f"Token cache test failed: {e}")
+
+
+def test_task_cache_read_through_and_write_through(client):
+    """Single-task reads hit the DB once; PUT updates the cache and DELETE drops it"""
+    headers = get_headers(client)
+    task_id = client.post("/v1/tasks/", json={"title": "Cached"}, headers=headers).json()["id"]
+
+    loads_before = task_cache.stats()["db_loads"]
+    first = client.get(f"/v1/tasks/{task_id}", headers=headers)
+    second = client.get(f"/v1/tasks/{task_id}", headers=headers)
+    loads_after_reads = task_cache.stats()["db_loads"]
+
+    client.put(f"/v1/tasks/{task_id}", json={"completed": True}, headers=headers)
+    updated = client.get(f"/v1/tasks/{task_id}", headers=headers)
+    client.delete(f"/v1/tasks/{task_id}", headers=headers)
+    deleted = client.get(f"/v1/tasks/{task_id}", headers=headers)
+    try:
+        assert first.json() == second.json(), f"Cached task differs: {first.json()} != {second.json()}"
+        assert loads_after_reads == loads_before + 1, f"Expected one DB load: {task_cache.stats()}"
+        assert updated.json()["completed"] is True, f"Stale task after PUT: {updated.json()}"
+        assert task_cache.stats()["db_loads"] == loads_after_reads + 1, "PUT did not write through"
+        assert deleted.status_code == status.HTTP_404_NOT_FOUND, f"Deleted task served: {deleted.status_code}"
+    except AssertionError as e:
+        pytest.fail(f"Task cache test failed: {e}")
+
+
+def test_batch_writes_invalidate_task_cache(client):
+    """Batch PATCH drops cached copies of the updated tasks"""
+    headers = get_headers(client)
+    task_id = client.post("/v1/tasks/", json={"title": "Batch cached"}, headers=headers).json()["id"]
+    client.get(f"/v1/tasks/{task_id}", headers=headers)
+    client.patch("/v1/tasks/batch", json=[{"id": task_id, "title": "Renamed"}], headers=headers)
+    read = client.get(f"/v1/tasks/{task_id}", headers=headers)
+    try:
+        assert read.json()["title"] == "Renamed", f"Stale task after batch update: {read.json()}"
+    except AssertionError as e:
+        pytest.fail(f"Batch invalidation test failed: {e}")
+
+
+def test_single_flight_coalesces_concurrent_misses():
+    """A cold key under concurrent load causes a single load, shared by every caller"""
+    cache = TaskCache()
+    calls = []
+    release = threading.Event()
+
+    def loader():
+        calls.append(1)
+        release.wait(1)
+        return models.Task(
+            id=42, title="Hot", completed=False, created_at=datetime.now(timezone.utc), version=1
+        )
+
+    def read(_):
+        return cache.get_or_load(42, loader)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(read, i) for i in range(8)]
+        time.sleep(0.1)
+        release.set()
+        results = [future.result() for future in futures]
+    try:
+        assert len(calls) == 1, f"Loader ran {len(calls)} times"
+        assert all(result == results[0] for result in results), "Callers got different results"
+        assert cache.stats()["coalesced"] == 7, f"Unexpected stats: {cache.stats()}"
+        assert cache.get(42) is not None, "Loaded task was not cached"
+    except AssertionError as e:
+        pytest.fail(f"Single-flight test failed: {e}")
+
+
+def test_load_racing_a_write_does_not_overwrite_it():
+    """A load that read the row before a PUT must not replace the PUT's cached value"""
+    cache = TaskCache()
+    loading = threading.Event()
+    release = threading.Event()
+    now = datetime.now(timezone.utc)
+
+    def loader():
+        loading.set()
+        release.wait(1)
+        return models.Task(id=7, title="Old", completed=False, created_at=now, version=1)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        future = pool.submit(cache.get_or_load, 7, loader)
+        loading.wait(1)
+        cache.set(models.Task(id=7, title="New", completed=True, created_at=now, version=2))
+        release.set()
+        loaded = future.result()
+    try:
+        assert loaded["version"] == 1, f"Loader result not returned: {loaded}"
+        cached = cache.get(7)
+        assert cached["version"] == 2 and cached["title"] == "New", f"Stale load was cached: {cached}"
+    except AssertionError as e:
+        pytest.fail(f"Load/write race test failed: {e}")
+
+
+def test_task_cache_async_methods_keep_redis_off_the_event_loop():
+    """The async cache methods run their Redis calls in the threadpool"""
+    calls = []
+
+    class RecordingRedis(fakeredis.FakeRedis):
+        def execute_command(self, *args, **kwargs):
+            calls.append((args[0], threading.current_thread()))
+            return super().execute_command(*args, **kwargs)
+
+        def pipeline(self, *args, **kwargs):
+            calls.append(("PIPELINE", threading.current_thread()))
+            return super().pipeline(*args, **kwargs)
+
+    cache = TaskCache(RecordingRedis(decode_responses=True))
+    now = datetime.now(timezone.utc)
+
+    async def loader():
+        return models.Task(id=9, title="Async", completed=False, created_at=now, version=1)
+
+    async def run():
+        await cache.get_or_load_async(9, loader)
+        cache.local.clear()
+        await cache.set_async(models.Task(id=9, title="Put", completed=False, created_at=now, version=2))
+        await cache.invalidate_async(9)
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(run())
+    try:
+        names = {name for name, _ in calls}
+        assert {"GET", "EVALSHA", "PIPELINE"} <= names, f"Unexpected calls: {calls}"
+        assert all(thread is not loop_thread for _, thread in calls), "Redis was called on the event loop"
+    except AssertionError as e:
+        pytest.fail(f"Async task cache test failed: {e}")
+
+
+def test_redis_tier_never_goes_back_to_an_older_version():
+    """A load on one worker that raced a write or invalidation on another does not reach Redis"""
+    shared = fakeredis.FakeRedis(decode_responses=True)
+    worker_a, worker_b = TaskCache(shared), TaskCache(shared)
+    now = datetime.now(timezone.utc)
+
+    def task(task_id, version, title):
+        return models.Task(id=task_id, title=title, completed=False, created_at=now, version=version)
+
+    def racing(write, loaded):
+        """Loader that returns `loaded` (read earlier) after `write` lands elsewhere."""
+        def loader():
+            write()
+            return loaded
+        return loader
+
+    # B read version 1 before A's PUT committed and cached version 2
+    worker_b.get_or_load(5, racing(lambda: worker_a.set(task(5, 2, "New")), task(5, 1, "Old")))
+    # B read task 6 before A's batch update invalidated it
+    worker_b.get_or_load(6, racing(lambda: worker_a.invalidate(6), task(6, 1, "Old")))
+    # Unrelated writes on the same worker do not keep other loads out of its cache
+    worker_a.get_or_load(8, racing(lambda: worker_a.set(task(3, 4, "Other")), task(8, 1, "Loaded")))
+    try:
+        fresh = TaskCache(shared)
+        assert fresh.get(5)["version"] == 2, f"Older version reached Redis: {fresh.get(5)}"
+        assert fresh.get(6) is None, "Load raced an invalidation and was cached"
+        assert worker_a.local.get(8) is not None, "Unrelated write kept a load out of the local cache"
+        worker_b.set(task(6, 2, "Updated"))
+        assert fresh.get(6)["version"] == 2, "A write did not replace the invalidation fence"
+    except AssertionError as e:
+        pytest.fail(f"Versioned Redis store test failed: {e}")
+
+
+def test_single_flight_async_shares_result_and_errors():
+    """Async callers share one in-flight call, including its exception"""
+    flight = SingleFlight()
+    calls = []
+
+    async def slow(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        if value == "boom":
+            raise ValueError(value)
+        return value
+
+    async def run():
+        ok = await asyncio.gather(*(flight.do_async("k", lambda: slow("v")) for _ in range(5)))
+        failed = await asyncio.gather(
+            *(flight.do_async("e", lambda: slow("boom")) for _ in range(3)), return_exceptions=True
+        )
+        return ok, failed
+
+    ok, failed = asyncio.run(run())
+    try:
+        assert ok == ["v"] * 5 and calls.count("v") == 1, f"Unexpected results: {ok}, {calls}"
+        assert all(isinstance(e, ValueError) for e in failed) and calls.count("boom") == 1, f"{failed}"
+    except AssertionError as e:
+        pytest.fail(f"Async single-flight test failed: {e}")
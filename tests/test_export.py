@@ -0,0 +1,71 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+EXPORT_ROWS = int(os.getenv("EXPORT_TEST_ROWS", "1000000"))
+MAX_RSS_GROWTH_MB = 64
+
+# Runs in a fresh interpreter so ru_maxrss only reflects this export
+RSS_SCRIPT = textwrap.dedent(
+    """
+    import json
+    import resource
+    import sys
+
+    from app.database import Base, SessionLocal, engine
+    from app.routers.tasks import iter_ndjson
+
+    rows = int(sys.argv[1])
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < ?) "
+            "INSERT INTO tasks (title, description, completed, created_at) "
+            "SELECT 'Task ' || n, 'Generated task ' || n, n % 2, "
+            "datetime('2024-01-01', '+' || n || ' seconds') FROM seq",
+            (rows,),
+        )
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    lines = 0
+    with SessionLocal() as db:
+        for chunk in iter_ndjson(db):
+            lines += chunk.count("\\n")
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print(json.dumps({"lines": lines, "before_kb": before, "after_kb": after}))
+    """
+)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="resource module is POSIX only")
+def test_export_memory_is_bounded(tmp_path):
+    """Streaming a 1M-row table must not grow peak RSS with the row count"""
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{tmp_path / 'export.db'}",
+        # mmap'd database pages and SQLite's page cache count towards RSS but are
+        # not export buffers, so keep them at SQLite's defaults for this measurement
+        SQLITE_MMAP_SIZE="0",
+        SQLITE_CACHE_SIZE="-2000",
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", RSS_SCRIPT, str(EXPORT_ROWS)],
+        cwd=os.path.abspath(os.path.join(os.path.dirname(__file__), "..")),
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=600,
+    )
+    try:
+        assert result.returncode == 0, f"Export script failed: {result.stderr}"
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        growth_mb = (stats["after_kb"] - stats["before_kb"]) / 1024
+        assert stats["lines"] == EXPORT_ROWS, f"Unexpected row count: {stats}"
+        assert growth_mb < MAX_RSS_GROWTH_MB, f"Peak RSS grew by {growth_mb:.1f} MB: {stats}"
+    except AssertionError as e:
+        pytest.fail(f"Export memory test failed: {e}")
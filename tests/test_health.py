@@ -23,3 +23,135 @@ def test_health_detailed(client):
         assert data.get("redis") == "ok", f"Redis check failed: {data}"
     except AssertionError as e:
         pytest.fail(f"Detailed health check failed: {e}")
+
+
+def test_database_pool_and_pragmas(client):
+    """SQLite pragmas are applied on connect and pool stats are reported"""
+    from sqlalchemy import text
+    from app.database import engine, get_pool_metrics
+
+    with engine.connect() as conn:
+        journal_mode = conn.execute(text("PRAGMA journal_mode")).scalar()
+        busy_timeout = conn.execute(text("PRAGMA busy_timeout")).scalar()
+
+    response = client.get("/health/detailed")
+    try:
+        assert journal_mode == "wal", f"Unexpected journal mode: {journal_mode}"
+        assert busy_timeout > 0, f"busy_timeout not set: {busy_timeout}"
+        pool = get_pool_metrics()["sync"]
+        assert pool["checkouts"] >= 1, f"Checkouts not counted: {pool}"
+        assert {"size", "checked_out", "overflow", "wait_seconds_max"} <= set(pool), f"Missing pool stats: {pool}"
+        assert "database_pool" in response.json(), f"Pool stats missing from health: {response.json()}"
+    except AssertionError as e:
+        pytest.fail(f"Database pool test failed: {e}")
+
+
+def test_create_missing_columns(tmp_path):
+    """Columns added to models are added to tables created by older versions"""
+    from sqlalchemy import create_engine, inspect, text
+    from app.database import create_missing_columns
+
+    legacy = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with legacy.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE tasks (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, description VARCHAR, "
+            "completed BOOLEAN, created_at DATETIME)"
+        ))
+        conn.execute(text("INSERT INTO tasks (title) VALUES ('old')"))
+    create_missing_columns(bind=legacy)
+    with legacy.connect() as conn:
+        columns = {column["name"] for column in inspect(legacy).get_columns("tasks")}
+        version = conn.execute(text("SELECT version FROM tasks")).scalar()
+    try:
+        assert {"updated_at", "version"} <= columns, f"Columns not added: {columns}"
+        assert version == 1, f"Existing rows should get the default version: {version}"
+    except AssertionError as e:
+        pytest.fail(f"Column migration test failed: {e}")
+
+
+def test_liveness_and_readiness(client):
+    """Liveness touches nothing; readiness reports the database and pool saturation"""
+    from app.routers import health
+
+    health.probes.clear()
+    live = client.get("/health/live")
+    ready = client.get("/health/ready")
+    try:
+        assert live.status_code == status.HTTP_200_OK, f"Liveness failed: {live.text}"
+        assert ready.status_code == status.HTTP_200_OK, f"Readiness failed: {ready.text}"
+        data = ready.json()
+        assert data["status"] == "ready" and data["database"]["status"] == "ok", f"Unexpected readiness: {data}"
+        assert 0 <= data["pool_saturation"] < 1, f"Unexpected saturation: {data}"
+    except AssertionError as e:
+        pytest.fail(f"Liveness/readiness test failed: {e}")
+
+
+def test_readiness_fails_when_pool_saturated(client, monkeypatch):
+    """A saturated pool makes the worker not ready"""
+    from app.routers import health
+
+    monkeypatch.setattr(health, "HEALTH_POOL_SATURATION", 0.0)
+    response = client.get("/health/ready")
+    try:
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE, f"Expected 503: {response.text}"
+        assert any("pool" in reason for reason in response.json()["reasons"]), f"Unexpected body: {response.json()}"
+    except AssertionError as e:
+        pytest.fail(f"Pool saturation readiness test failed: {e}")
+
+
+def test_probes_are_cached_concurrent_and_time_out(monkeypatch):
+    """Probes run in parallel with their own timeouts, and a probe storm costs one round"""
+    import asyncio
+    import time
+    from app.routers import health
+
+    calls = []
+
+    async def slow_database():
+        calls.append("database")
+        await asyncio.sleep(0.2)
+
+    async def hung_redis():
+        calls.append("redis")
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(health, "check_database", slow_database)
+    monkeypatch.setattr(health, "check_redis", hung_redis)
+    monkeypatch.setattr(health, "redis_client", object())
+    monkeypatch.setattr(health, "HEALTH_REDIS_TIMEOUT", 0.1)
+    probes = health.HealthProbes(ttl=60)
+
+    async def storm():
+        return await asyncio.gather(*(probes.run() for _ in range(20)))
+
+    started = time.perf_counter()
+    results = asyncio.run(storm())
+    elapsed = time.perf_counter() - started
+    try:
+        assert probes.rounds == 1 and sorted(calls) == ["database", "redis"], f"Probes repeated: {calls}"
+        assert results[0]["database"]["status"] == "ok", f"Unexpected database result: {results[0]}"
+        assert results[0]["redis"]["status"] == "timeout", f"Hung Redis not timed out: {results[0]}"
+        assert elapsed < 0.5, f"Probes ran serially or waited for Redis: {elapsed:.2f}s"
+        assert asyncio.run(probes.run()) is results[0], "Cached result not reused"
+    except AssertionError as e:
+        pytest.fail(f"Health probe test failed: {e}")
+
+
+def test_database_probe_runs_one_bounded_ping_at_a_time():
+    """A ping still stuck in its thread makes the next probe fail fast instead of starting another"""
+    import asyncio
+    from app.routers import health
+
+    async def probe():
+        return await health.timed_probe(health.check_database, 1)
+
+    with health._ping_lock:
+        busy = asyncio.run(probe())
+    ok = asyncio.run(probe())
+    try:
+        assert busy["status"].startswith("error") and "still running" in busy["status"], f"Second ping started: {busy}"
+        assert busy["latency_ms"] < 500, f"Busy probe waited: {busy}"
+        assert ok["status"] == "ok", f"Probe not released: {ok}"
+        assert health._probe_engine.pool.timeout() == health.HEALTH_DB_TIMEOUT, "Probe pool timeout not bounded"
+    except AssertionError as e:
+        pytest.fail(f"Database probe test failed: {e}")
@@ -0,0 +1,213 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import status
+
+from app import http_client
+from app.http_client import CircuitBreaker, OutboundClient, OutboundUnavailable
+
+URL = "https://upstream.test/joke"
+
+
+def counting_transport(responses):
+    """MockTransport returning `responses` in order (the last one repeats); counts calls."""
+    calls = []
+
+    def handler(request):
+        calls.append(request.url)
+        response = responses[min(len(calls), len(responses)) - 1]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    return httpx.MockTransport(handler), calls
+
+
+def test_responses_are_cached():
+    """A cached response is served without another upstream call"""
+    transport, calls = counting_transport([httpx.Response(200, json={"setup": "a", "punchline": "b"})])
+    outbound = OutboundClient(transport=transport, cache_ttl=60)
+
+    async def run():
+        try:
+            return [await outbound.get_json(URL) for _ in range(3)]
+        finally:
+            await outbound.close()
+
+    results = asyncio.run(run())
+    try:
+        assert results == [{"setup": "a", "punchline": "b"}] * 3, f"Unexpected results: {results}"
+        assert len(calls) == 1, f"Expected 1 upstream call, got {len(calls)}"
+    except AssertionError as e:
+        pytest.fail(f"Outbound cache test failed: {e}")
+
+
+def test_breaker_opens_and_recovers(monkeypatch):
+    """Consecutive failures open the circuit; after the reset timeout one trial call closes it"""
+    transport, calls = counting_transport([
+        httpx.Response(500),
+        httpx.ConnectError("refused"),
+        httpx.Response(200, json={"ok": True}),
+    ])
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    outbound = OutboundClient(transport=transport, cache_ttl=0, breaker=breaker)
+    clock = [1000.0]
+    monkeypatch.setattr(http_client.time, "monotonic", lambda: clock[0])
+
+    async def run():
+        errors = []
+        for _ in range(3):
+            try:
+                await outbound.get_json(URL)
+            except (httpx.HTTPError, OutboundUnavailable) as e:
+                errors.append(type(e))
+        clock[0] += 31
+        recovered = await outbound.get_json(URL)
+        await outbound.close()
+        return errors, recovered
+
+    errors, recovered = asyncio.run(run())
+    try:
+        assert errors == [httpx.HTTPStatusError, httpx.ConnectError, OutboundUnavailable], f"Unexpected errors: {errors}"
+        assert len(calls) == 3, f"Open circuit still called upstream: {len(calls)} calls"
+        assert recovered == {"ok": True}, f"Unexpected trial response: {recovered}"
+        assert breaker.state == "closed", f"Circuit not closed after trial: {breaker.state}"
+    except AssertionError as e:
+        pytest.fail(f"Circuit breaker test failed: {e}")
+
+
+def test_failed_or_cancelled_trial_releases_half_open_circuit(monkeypatch):
+    """A half-open trial that is cancelled or fails to decode lets the next caller try again"""
+    entered, hang = asyncio.Event(), asyncio.Event()
+
+    async def handler(request):
+        if request.url.path == "/hang":
+            entered.set()
+            await hang.wait()
+        if request.url.path == "/garbled":
+            raise httpx.DecodingError("bad gzip")
+        return httpx.Response(200, json={"ok": True})
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    outbound = OutboundClient(transport=httpx.MockTransport(handler), cache_ttl=0, breaker=breaker)
+    clock = [1000.0]
+    monkeypatch.setattr(http_client.time, "monotonic", lambda: clock[0])
+
+    async def run():
+        breaker.record_failure()
+        clock[0] += 31
+        trial = asyncio.create_task(outbound.get_json("https://upstream.test/hang"))
+        await entered.wait()   # no sleep: time.monotonic is frozen
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        after_cancel = breaker.state
+
+        with pytest.raises(httpx.DecodingError):
+            await outbound.get_json("https://upstream.test/garbled")
+        after_decode_error = breaker.state
+        clock[0] += 31
+        recovered = await outbound.get_json(URL)
+        await outbound.close()
+        return after_cancel, after_decode_error, recovered
+
+    after_cancel, after_decode_error, recovered = asyncio.run(run())
+    try:
+        assert after_cancel == "half_open", f"Cancelled trial changed the circuit: {after_cancel}"
+        assert after_decode_error == "open", f"Decode error did not reopen the circuit: {after_decode_error}"
+        assert recovered == {"ok": True} and breaker.state == "closed", f"Circuit stuck: {breaker.state}"
+    except AssertionError as e:
+        pytest.fail(f"Half-open trial test failed: {e}")
+
+
+def test_invalid_json_counts_as_upstream_failure():
+    """A 2xx body that isn't JSON raises an httpx error and counts against the breaker"""
+    transport, _ = counting_transport([httpx.Response(200, text="<html>maintenance</html>")])
+    outbound = OutboundClient(transport=transport, cache_ttl=0, breaker=CircuitBreaker(failure_threshold=1))
+
+    async def run():
+        with pytest.raises(httpx.DecodingError):
+            await outbound.get_json(URL)
+        await outbound.close()
+
+    asyncio.run(run())
+    try:
+        assert outbound.breaker.state == "open", f"Invalid JSON did not count as a failure: {outbound.stats()}"
+    except AssertionError as e:
+        pytest.fail(f"Invalid JSON test failed: {e}")
+
+
+def test_client_errors_do_not_open_breaker():
+    """4xx responses are raised but do not count as upstream failures"""
+    transport, _ = counting_transport([httpx.Response(404)])
+    outbound = OutboundClient(transport=transport, cache_ttl=0, breaker=CircuitBreaker(failure_threshold=1))
+
+    async def run():
+        with pytest.raises(httpx.HTTPStatusError):
+            await outbound.get_json(URL)
+        await outbound.close()
+
+    asyncio.run(run())
+    try:
+        assert outbound.breaker.state == "closed", f"404 opened the circuit: {outbound.stats()}"
+    except AssertionError as e:
+        pytest.fail(f"Client error test failed: {e}")
+
+
+def test_saturated_client_rejects():
+    """Calls that cannot get a concurrency slot within queue_timeout fail fast"""
+
+    async def slow(request):
+        await asyncio.sleep(0.2)
+        return httpx.Response(200, json={"path": request.url.path})
+
+    outbound = OutboundClient(transport=httpx.MockTransport(slow), concurrency=1, queue_timeout=0.05, cache_ttl=0)
+
+    async def run():
+        results = await asyncio.gather(
+            outbound.get_json("https://upstream.test/a"),
+            outbound.get_json("https://upstream.test/b"),
+            return_exceptions=True,
+        )
+        await outbound.close()
+        return results
+
+    results = asyncio.run(run())
+    try:
+        assert results[0] == {"path": "/a"}, f"First call failed: {results[0]}"
+        assert isinstance(results[1], OutboundUnavailable), f"Second call was not rejected: {results[1]}"
+        assert outbound.stats()["rejected"] == 1, f"Unexpected stats: {outbound.stats()}"
+        assert outbound.breaker.state == "closed", "Rejections must not open the circuit"
+    except AssertionError as e:
+        pytest.fail(f"Concurrency limit test failed: {e}")
+
+
+def test_external_joke_route(client, monkeypatch):
+    """The joke route is reachable, maps an open circuit to 503 and a non-JSON body to 502"""
+    credentials = {"username": "jokeuser", "password": "strongpassword123"}
+    client.post("/v1/auth/register", json={**credentials, "email": "joke@example.com"})
+    token = client.post("/v1/auth/login", data=credentials).json().get("access_token")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    joke = {"setup": "Why?", "punchline": "Because."}
+    transport, _ = counting_transport([httpx.Response(200, json=joke)])
+    monkeypatch.setattr(http_client, "outbound", OutboundClient(transport=transport, cache_ttl=0))
+    ok = client.get("/v1/tasks/external-joke", headers=headers)
+
+    breaker = CircuitBreaker(failure_threshold=1)
+    breaker.record_failure()
+    monkeypatch.setattr(http_client, "outbound", OutboundClient(transport=transport, breaker=breaker))
+    unavailable = client.get("/v1/tasks/external-joke", headers=headers)
+
+    transport, _ = counting_transport([httpx.Response(200, text="not json")])
+    monkeypatch.setattr(http_client, "outbound", OutboundClient(transport=transport, cache_ttl=0))
+    garbled = client.get("/v1/tasks/external-joke", headers=headers)
+    try:
+        assert ok.status_code == status.HTTP_200_OK, f"Joke request failed: {ok.text}"
+        assert ok.json() == joke, f"Unexpected joke: {ok.json()}"
+        assert unavailable.status_code == status.HTTP_503_SERVICE_UNAVAILABLE, f"Expected 503: {unavailable.text}"
+        assert int(unavailable.headers.get("Retry-After", 0)) > 0, f"Retry-After missing: {unavailable.headers}"
+        assert garbled.status_code == status.HTTP_502_BAD_GATEWAY, f"Expected 502: {garbled.text}"
+    except AssertionError as e:
+        pytest.fail(f"External joke route test failed: {e}")
@@ -0,0 +1,112 @@
+import io
+import json
+import logging
+import queue
+import sys
+import threading
+
+import pytest
+
+from app.logs import DroppingQueueHandler, JsonFormatter, LogPipeline, get_encoder, sample_request
+
+
+def make_logger(name, handler):
+    logger = logging.getLogger(f"test_logs.{name}")
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+@pytest.mark.parametrize("encoder", ["json", "orjson"])
+def test_pipeline_writes_structured_json(encoder):
+    """Fields are merged into one JSON object per line, encoded once"""
+    stream = io.StringIO()
+    pipeline = LogPipeline(stream=stream, encoder=get_encoder(encoder))
+    pipeline.start()
+    logger = make_logger(encoder, pipeline.handler)
+    logger.info("request", extra={"fields": {"request_id": "abc", "status_code": 200}})
+    pipeline.stop()  # flushes the queue
+
+    lines = stream.getvalue().splitlines()
+    try:
+        assert len(lines) == 1, f"Expected 1 line, got {lines}"
+        record = json.loads(lines[0])
+        assert record["message"] == "request", f"Unexpected message: {record}"
+        assert record["request_id"] == "abc" and record["status_code"] == 200, f"Fields not merged: {record}"
+        assert record["level"] == "INFO", f"Unexpected level: {record}"
+    except AssertionError as e:
+        pytest.fail(f"Structured logging test failed: {e}")
+
+
+def test_formatter_records_exceptions():
+    """exc_info is rendered into an `exception` field"""
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.LogRecord("t", logging.ERROR, __file__, 1, "failed", None, sys.exc_info())
+    data = json.loads(JsonFormatter(get_encoder("json")).format(record))
+    try:
+        assert "ValueError: boom" in data.get("exception", ""), f"Exception missing: {data}"
+    except AssertionError as e:
+        pytest.fail(f"Exception formatting test failed: {e}")
+
+
+def test_full_queue_drops_instead_of_blocking():
+    """With no listener draining, records beyond the queue size are dropped and counted"""
+    pipeline = LogPipeline(stream=io.StringIO(), queue_size=2)
+    logger = make_logger("full", pipeline.handler)
+    done = threading.Event()
+
+    def flood():
+        for i in range(5):
+            logger.info("message %s", i)
+        done.set()
+
+    threading.Thread(target=flood, daemon=True).start()
+    try:
+        assert done.wait(2), "Logging blocked on a full queue"
+        assert pipeline.stats()["dropped"] == 3, f"Unexpected stats: {pipeline.stats()}"
+        assert pipeline.stats()["queued"] == 2, f"Unexpected stats: {pipeline.stats()}"
+    except AssertionError as e:
+        pytest.fail(f"Backpressure test failed: {e}")
+    finally:
+        pipeline.start()
+        pipeline.stop()
+
+
+def test_queue_handler_defers_formatting():
+    """The caller only enqueues the record; formatting happens on the listener"""
+    handler = DroppingQueueHandler(queue.Queue())
+    handler.setFormatter(JsonFormatter())
+    record = logging.LogRecord("t", logging.INFO, __file__, 1, "hello %s", ("world",), None)
+    handler.handle(record)
+    queued = handler.queue.get_nowait()
+    try:
+        assert queued is record, "Record was copied"
+        assert queued.msg == "hello %s" and queued.args == ("world",), "Record was formatted on the caller"
+    except AssertionError as e:
+        pytest.fail(f"Deferred formatting test failed: {e}")
+
+
+def test_sampling_keeps_errors():
+    """Sampling only applies to successful requests"""
+    try:
+        assert all(sample_request(500, rate=0) for _ in range(10)), "Errors were sampled out"
+        assert all(sample_request(404, rate=0) for _ in range(10)), "Client errors were sampled out"
+        assert not any(sample_request(200, rate=0) for _ in range(10)), "Successes kept at rate 0"
+        assert all(sample_request(200, rate=1) for _ in range(10)), "Successes dropped at rate 1"
+    except AssertionError as e:
+        pytest.fail(f"Sampling test failed: {e}")
+
+
+def test_module_loggers_go_through_the_pipeline():
+    """Every app logger is under api_logger, so its records reach the queue handler"""
+    from app import cache, http_client, outbox, profiling, ratelimit, search, task_stats, utils
+
+    modules = (cache, http_client, outbox, profiling, ratelimit, search, task_stats, utils)
+    names = [module.logger.name for module in modules]
+    try:
+        assert all(name.split(".")[0] == "api_logger" for name in names), f"Loggers outside api_logger: {names}"
+    except AssertionError as e:
+        pytest.fail(f"Logger hierarchy test failed: {e}")
@@ -0,0 +1,91 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import fakeredis
+import pytest
+from fastapi import Request, status
+from prometheus_client import REGISTRY
+
+from app import metrics, ratelimit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_requests_are_labelled_by_route_template(client):
+    """Counts use the matched path template; unknown paths share one label"""
+    before_task = sample("http_requests_total", method="GET", route="/v1/tasks/{task_id}", status="401")
+    before_unmatched = sample("http_requests_total", method="GET", route="unmatched", status="404")
+    client.get("/v1/tasks/12345")
+    client.get("/v1/tasks/67890")
+    client.get("/definitely/not/a/route")
+
+    response = client.get("/metrics")
+    try:
+        assert response.status_code == status.HTTP_200_OK, f"Metrics failed: {response.text}"
+        assert "http_request_duration_seconds_bucket" in response.text, "Latency histogram missing"
+        assert sample("http_requests_total", method="GET", route="/v1/tasks/{task_id}", status="401") == before_task + 2
+        assert sample("http_requests_total", method="GET", route="unmatched", status="404") == before_unmatched + 1
+        assert 'route="/v1/tasks/12345"' not in response.text, "Raw URL used as a label"
+        assert 'http_requests_in_progress{method="GET"} 1.0' in response.text, "Only /metrics should be in flight"
+        assert sample("http_requests_in_progress", method="GET") == 0, "In-flight gauge leaked"
+    except AssertionError as e:
+        pytest.fail(f"Route metrics test failed: {e}")
+
+
+def test_rate_limited_requests_are_counted(monkeypatch):
+    """Each 429 decision increments rate_limited_requests_total for its policy"""
+    monkeypatch.setattr(ratelimit, "redis_backend", ratelimit.RedisBackend(None, url=None))
+    monkeypatch.setattr(ratelimit, "policies", {"metrics-test": ratelimit.RateLimitPolicy("metrics-test", 1, 60, scope="ip")})
+    request = Request({"type": "http", "headers": [], "client": ("10.0.0.9", 1234)})
+    before = sample("rate_limited_requests_total", policy="metrics-test")
+
+    results = [ratelimit.check(request, "metrics-test") for _ in range(3)]
+    try:
+        assert [r.allowed for r in results] == [True, False, False], f"Unexpected decisions: {results}"
+        assert sample("rate_limited_requests_total", policy="metrics-test") == before + 2
+    except AssertionError as e:
+        pytest.fail(f"Rate limit metric test failed: {e}")
+    finally:
+        ratelimit.local_limiter.clear()
+
+
+def test_redis_commands_are_timed():
+    """instrument_redis records latency per command"""
+    client = metrics.instrument_redis(fakeredis.FakeRedis(decode_responses=True))
+    before = sample("redis_command_duration_seconds_count", command="SET")
+    client.set("metrics:key", "1")
+    client.set("metrics:key", "2")
+    try:
+        assert sample("redis_command_duration_seconds_count", command="SET") == before + 2
+        assert metrics.instrument_redis(client) is client, "Instrumenting twice should be a no-op"
+    except AssertionError as e:
+        pytest.fail(f"Redis metrics test failed: {e}")
+
+
+def test_multiprocess_mode_aggregates_workers(tmp_path):
+    """With PROMETHEUS_MULTIPROC_DIR, /metrics sums samples written by every worker"""
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path), "PYTHONPATH": ROOT}
+    worker = textwrap.dedent("""
+        from app import metrics
+        metrics.http_requests.labels("GET", "/health", "200").inc()
+    """)
+    scrape = textwrap.dedent("""
+        import sys
+        from app import metrics
+        sys.stdout.write(metrics.render().decode())
+    """)
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", worker], env=env, check=True, cwd=ROOT)
+    output = subprocess.run(
+        [sys.executable, "-c", scrape], env=env, check=True, cwd=ROOT, capture_output=True, text=True
+    ).stdout
+    try:
+        assert 'http_requests_total{method="GET",route="/health",status="200"} 2.0' in output, output
+    except AssertionError as e:
+        pytest.fail(f"Multiprocess metrics test failed: {e}")
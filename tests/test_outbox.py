@@ -0,0 +1,301 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from fastapi import status
+from sqlalchemy import delete, select
+
+from app import models, outbox
+from app.database import SessionLocal, engine
+
+
+def login(client, username, role="user"):
+    credentials = {"username": username, "password": "strongpassword123"}
+    client.post("/v1/auth/register", json={**credentials, "email": f"{username}@example.com"})
+    with SessionLocal() as db:
+        user = db.query(models.User).filter(models.User.username == username).one()
+        user.role = role
+        db.commit()
+    response = client.post("/v1/auth/login", data=credentials)
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def outbox_events() -> list:
+    with SessionLocal() as db:
+        return db.scalars(select(models.OutboxEvent).order_by(models.OutboxEvent.id)).all()
+
+
+def clear_outbox():
+    with engine.begin() as conn:
+        conn.execute(delete(models.OutboxEvent))
+
+
+def record_events(*task_ids) -> list:
+    with SessionLocal() as db:
+        outbox.record(db, "task.deleted", task_ids)
+        db.commit()
+    return outbox_events()
+
+
+def without_utc_suffix(task: dict) -> dict:
+    """Event payloads mark timestamps as UTC; the API returns them as stored."""
+    return {**task, "created_at": task["created_at"].rstrip("Z"), "updated_at": task["updated_at"].rstrip("Z")}
+
+
+def test_task_writes_record_outbox_events(client, monkeypatch):
+    """Every committed write adds its events in the same transaction; failed writes add none"""
+    monkeypatch.setattr(outbox, "enabled", True)
+    clear_outbox()
+    headers = login(client, "outboxuser")
+
+    created = client.post("/v1/tasks/", headers=headers, json={"title": "Outbox"}).json()
+    updated = client.put(f"/v1/tasks/{created['id']}", headers=headers, json={"completed": True}).json()
+    batch = client.post("/v1/tasks/batch", headers=headers, json=[{"title": "B1"}, {"title": "B2"}]).json()
+    batch_ids = [result["id"] for result in batch["results"]]
+    client.patch("/v1/tasks/batch", headers=headers, json=[{"id": batch_ids[0], "title": "B1 renamed"}, {"id": 10**9}])
+    client.request("DELETE", "/v1/tasks/batch", headers=headers, json=batch_ids)
+    client.delete(f"/v1/tasks/{created['id']}", headers=headers)
+    # Writes that change nothing record nothing
+    client.put("/v1/tasks/999999999", headers=headers, json={"completed": True})
+    client.patch("/v1/tasks/batch", headers=headers, json=[{"id": 10**9, "title": "missing"}])
+
+    events = outbox_events()
+    monkeypatch.setattr(outbox, "enabled", False)
+    client.post("/v1/tasks/", headers=headers, json={"title": "Outbox off"})
+    try:
+        assert [(event.event_type, event.task_id) for event in events] == [
+            ("task.created", created["id"]),
+            ("task.updated", created["id"]),
+            ("task.created", batch_ids[0]),
+            ("task.created", batch_ids[1]),
+            ("task.updated", batch_ids[0]),
+            ("task.deleted", batch_ids[0]),
+            ("task.deleted", batch_ids[1]),
+            ("task.deleted", created["id"]),
+        ], f"Unexpected events: {[(event.event_type, event.task_id) for event in events]}"
+        assert without_utc_suffix(events[0].payload) == without_utc_suffix(created), (
+            f"Created payload differs from the response: {events[0].payload}"
+        )
+        assert without_utc_suffix(events[1].payload) == without_utc_suffix(updated), (
+            f"Updated payload differs from the response: {events[1].payload}"
+        )
+        assert all(
+            event.payload["created_at"].endswith("Z") for event in events if event.event_type != "task.deleted"
+        ), "Event timestamps are not marked as UTC"
+        assert events[4].payload["title"] == "B1 renamed", f"Batch update payload is stale: {events[4].payload}"
+        assert events[-1].payload == {"id": created["id"]}, f"Unexpected delete payload: {events[-1].payload}"
+        assert len({event.idempotency_key for event in events}) == len(events), "Idempotency keys are not unique"
+        assert all(event.status == "pending" and event.attempts == 0 for event in events), "Events not pending"
+        assert len(outbox_events()) == len(events), "Events recorded while the outbox is off"
+    except AssertionError as e:
+        pytest.fail(f"Outbox recording test failed: {e}")
+    finally:
+        clear_outbox()
+
+
+def test_dispatcher_delivers_retries_and_gives_up(monkeypatch):
+    """Deliveries run with bounded concurrency; failures back off and end up failed after max attempts"""
+    monkeypatch.setattr(outbox, "enabled", True)
+    clear_outbox()
+    events = record_events(*range(1, 7))
+    failing = {events[0].idempotency_key, events[1].idempotency_key}
+    received, in_flight = [], []
+    peak = 0
+
+    async def sink(event):
+        nonlocal peak
+        in_flight.append(event["id"])
+        peak = max(peak, len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(event["id"])
+        if event["id"] in failing:
+            raise RuntimeError("receiver down")
+        received.append(event)
+
+    dispatcher = outbox.Dispatcher([sink], batch_size=10, concurrency=2, max_attempts=2)
+    first = asyncio.run(dispatcher.drain(engine))
+    first_received = list(received)
+    retrying = outbox_events()
+    second = asyncio.run(dispatcher.drain(engine))   # retries are not due yet
+
+    with engine.begin() as conn:
+        conn.execute(
+            models.OutboxEvent.__table__.update().values(available_at=models.utcnow() - timedelta(seconds=1))
+        )
+    failing.discard(events[0].idempotency_key)
+    third = asyncio.run(dispatcher.drain(engine))
+    left = outbox_events()
+    try:
+        assert first == {"claimed": 6, "delivered": 4, "retried": 2, "deferred": 0, "failed": 0}, f"First pass: {first}"
+        assert peak == 2, f"Expected at most 2 deliveries in flight, saw {peak}"
+        assert {event["task_id"] for event in first_received} == {3, 4, 5, 6}, f"Unexpected deliveries: {first_received}"
+        assert received[0]["data"] == {"id": received[0]["task_id"]}, f"Unexpected message: {received[0]}"
+        assert all(
+            event.status == "pending" and event.attempts == 1 and event.claimed_by is None
+            and outbox.as_utc(event.available_at) > models.utcnow() and "receiver down" in event.last_error
+            for event in retrying
+        ), "Failed events not rescheduled with backoff"
+        assert second["claimed"] == 0, f"Backed-off events delivered early: {second}"
+        assert third == {"claimed": 2, "delivered": 1, "retried": 0, "deferred": 0, "failed": 1}, f"Third pass: {third}"
+        assert received[-1]["id"] == events[0].idempotency_key, "Retry did not reuse the idempotency key"
+        assert [(event.task_id, event.status, event.attempts) for event in left] == [(2, "failed", 2)], (
+            f"Unexpected events left: {[(event.task_id, event.status, event.attempts) for event in left]}"
+        )
+    except AssertionError as e:
+        pytest.fail(f"Outbox dispatcher test failed: {e}")
+    finally:
+        clear_outbox()
+
+
+def test_claimed_events_are_leased_to_one_pass(monkeypatch):
+    """Events claimed by one pass are invisible to others until the lease ends, and only it settles them"""
+    monkeypatch.setattr(outbox, "enabled", True)
+    clear_outbox()
+    record_events(1, 2)
+
+    claimed = outbox.claim(engine, "pass-a", limit=10, lease=60)
+    competing = outbox.claim(engine, "pass-b", limit=10, lease=60)
+    outbox.settle(engine, "pass-b", [event.id for event in claimed], {})
+    still_there = len(outbox_events())
+    outbox.settle(engine, "pass-a", [claimed[0].id], {})
+    try:
+        assert len(claimed) == 2 and competing == [], f"Claims overlap: {len(claimed)} / {len(competing)}"
+        assert still_there == 2, "Another pass settled events it had not claimed"
+        assert [event.task_id for event in outbox_events()] == [2], "Claimed event not deleted on delivery"
+    except AssertionError as e:
+        pytest.fail(f"Outbox lease test failed: {e}")
+    finally:
+        clear_outbox()
+
+
+def test_dispatcher_runs_in_background_and_admin_requeues(client, monkeypatch):
+    """The background loop drains the outbox; admins can see and requeue failed events"""
+    monkeypatch.setattr(outbox, "enabled", True)
+    clear_outbox()
+    admin = login(client, "outboxadmin", role="admin")
+    user = login(client, "outboxplain")
+    record_events(1, 2)
+    with engine.begin() as conn:
+        conn.execute(
+            models.OutboxEvent.__table__.update()
+            .where(models.OutboxEvent.task_id == 2)
+            .values(status="failed", attempts=10)
+        )
+    stats = client.get("/v1/admin/outbox", headers=admin).json()
+    forbidden = client.get("/v1/admin/outbox", headers=user)
+    requeued = client.post("/v1/admin/outbox/retry", headers=admin).json()
+
+    received = []
+
+    async def sink(event):
+        received.append(event["task_id"])
+
+    async def run_dispatcher():
+        dispatcher = outbox.Dispatcher([sink], poll_interval=0.01)
+        dispatcher.start(engine)
+        await asyncio.sleep(0.3)
+        await dispatcher.stop()
+
+    asyncio.run(run_dispatcher())
+    try:
+        assert stats["pending"] == 1 and stats["failed"] == 1, f"Unexpected stats: {stats}"
+        assert stats["oldest_pending"] is not None, f"Missing oldest pending: {stats}"
+        assert forbidden.status_code == status.HTTP_403_FORBIDDEN, f"Outbox stats not admin-only: {forbidden.status_code}"
+        assert requeued == {"requeued": 1}, f"Unexpected retry response: {requeued}"
+        assert sorted(received) == [1, 2], f"Background dispatcher delivered {received}"
+        assert outbox_events() == [], "Delivered events were not removed"
+    except AssertionError as e:
+        pytest.fail(f"Outbox background dispatcher test failed: {e}")
+    finally:
+        clear_outbox()
+
+
+def test_webhook_sink_posts_event_with_idempotency_key(monkeypatch):
+    """Webhooks go through the outbound client; the event id is the Idempotency-Key, 5xx raises for a retry"""
+    import httpx
+    from app.http_client import OutboundClient
+
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(503 if len(requests) > 1 else 204)
+
+    monkeypatch.setattr(outbox, "OUTBOX_WEBHOOK_URL", "https://hooks.test/tasks")
+    monkeypatch.setattr(outbox, "webhooks", OutboundClient(transport=httpx.MockTransport(handler)))
+    event = {"id": "key-1", "type": "task.deleted", "task_id": 1, "data": {"id": 1}}
+
+    async def run():
+        try:
+            await outbox.post_webhook(event)
+            with pytest.raises(httpx.HTTPStatusError):
+                await outbox.post_webhook(event)
+        finally:
+            await outbox.webhooks.close()
+
+    asyncio.run(run())
+    try:
+        assert [request.method for request in requests] == ["POST", "POST"], f"Unexpected calls: {requests}"
+        assert str(requests[0].url) == "https://hooks.test/tasks", f"Wrong URL: {requests[0].url}"
+        assert requests[0].headers["Idempotency-Key"] == "key-1", f"Missing idempotency key: {requests[0].headers}"
+        assert requests[1].headers["Idempotency-Key"] == "key-1", "Retry used a different idempotency key"
+        assert httpx.Response(200, content=requests[0].content).json() == event, "Body is not the event"
+    except AssertionError as e:
+        pytest.fail(f"Outbox webhook test failed: {e}")
+
+
+def test_webhooks_have_their_own_circuit_breaker(monkeypatch):
+    """An open breaker on other outbound calls doesn't touch webhooks; an open webhook breaker defers events"""
+    import time
+    import httpx
+    from app import http_client
+    from app.http_client import CircuitBreaker, OutboundClient
+
+    monkeypatch.setattr(outbox, "enabled", True)
+    monkeypatch.setattr(outbox, "OUTBOX_WEBHOOK_URL", "https://hooks.test/tasks")
+    clear_outbox()
+    record_events(1)
+    responses = [204]
+    webhooks = OutboundClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(responses[0])),
+        cache_ttl=0,
+        breaker=CircuitBreaker(failure_threshold=2, reset_timeout=30),
+    )
+    monkeypatch.setattr(outbox, "webhooks", webhooks)
+    # The joke endpoint's upstream is down
+    monkeypatch.setattr(http_client.outbound, "breaker", CircuitBreaker(failure_threshold=1))
+    http_client.outbound.breaker.opened_at = time.monotonic()
+    dispatcher = outbox.Dispatcher([outbox.post_webhook])
+
+    async def run():
+        delivered = await dispatcher.drain(engine)
+        record_events(2)
+        responses[0] = 503
+        failing = [await dispatcher.drain(engine)]
+        with engine.begin() as conn:
+            conn.execute(models.OutboxEvent.__table__.update().values(available_at=models.utcnow()))
+        failing.append(await dispatcher.drain(engine))
+        with engine.begin() as conn:
+            conn.execute(models.OutboxEvent.__table__.update().values(available_at=models.utcnow()))
+        deferred = await dispatcher.drain(engine)
+        await webhooks.close()
+        return delivered, failing, deferred
+
+    delivered, failing, deferred = asyncio.run(run())
+    left = outbox_events()
+    try:
+        assert delivered["delivered"] == 1, f"Open joke breaker blocked the webhook: {delivered}"
+        assert [result["retried"] for result in failing] == [1, 1], f"Webhook 503s not retried: {failing}"
+        assert webhooks.breaker.state == "open", f"Webhook breaker not opened: {webhooks.breaker.state}"
+        assert http_client.outbound.breaker.failures == 0, "Webhook failures counted against the joke breaker"
+        assert deferred["deferred"] == 1 and deferred["failed"] == 0, f"Open webhook breaker not deferred: {deferred}"
+        assert [(event.status, event.attempts) for event in left] == [("pending", 2)], (
+            f"Deferral used up an attempt: {[(event.status, event.attempts) for event in left]}"
+        )
+        assert outbox.as_utc(left[0].available_at) > models.utcnow() + timedelta(seconds=20), (
+            f"Deferred event not rescheduled at retry_after: {left[0].available_at}"
+        )
+    except AssertionError as e:
+        pytest.fail(f"Outbox webhook breaker test failed: {e}")
+    finally:
+        clear_outbox()
@@ -0,0 +1,65 @@
+import time
+
+import pytest
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from app import models, passwords
+from app.database import SessionLocal
+from app.passwords import PasswordService
+
+
+def test_pool_hashes_and_verifies():
+    """bcrypt runs in the process pool and round-trips"""
+    service = PasswordService(workers=1, queue_size=1)
+    try:
+        hashed = service.hash_blocking("s3cret-password")
+        valid, new_hash = service.verify_blocking("s3cret-password", hashed)
+        invalid, _ = service.verify_blocking("wrong-password", hashed)
+        assert valid and not invalid, f"Unexpected verification results: {valid}, {invalid}"
+        assert new_hash is None, "Fresh hash flagged for rehash"
+        assert service.stats()["in_flight"] == 0, f"Slots leaked: {service.stats()}"
+    except AssertionError as e:
+        pytest.fail(f"Password pool test failed: {e}")
+    finally:
+        service.shutdown()
+
+
+def test_saturated_pool_sheds_load():
+    """Calls beyond workers + queue_size fail fast with 503 instead of queueing"""
+    service = PasswordService(workers=1, queue_size=1)
+    try:
+        busy = [service.submit(time.sleep, 0.5) for _ in range(2)]
+        with pytest.raises(HTTPException) as exc_info:
+            service.submit(time.sleep, 0)
+        for future in busy:
+            future.result()
+        assert exc_info.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE, "Expected 503"
+        assert exc_info.value.headers.get("Retry-After") == "1", f"Unexpected headers: {exc_info.value.headers}"
+        assert service.stats()["rejected"] == 1, f"Unexpected stats: {service.stats()}"
+        assert service.stats()["in_flight"] == 0, f"Slots leaked: {service.stats()}"
+    except AssertionError as e:
+        pytest.fail(f"Load shedding test failed: {e}")
+    finally:
+        service.shutdown()
+
+
+def test_login_rehashes_outdated_cost(client):
+    """A hash below BCRYPT_ROUNDS is upgraded on the next successful login"""
+    credentials = {"username": "rehashuser", "password": "strongpassword123"}
+    client.post("/v1/auth/register", json={**credentials, "email": "rehash@example.com"})
+    weak_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash(credentials["password"])
+    with SessionLocal() as db:
+        user = db.query(models.User).filter(models.User.username == "rehashuser").one()
+        user.hashed_password = weak_hash
+        db.commit()
+
+    response = client.post("/v1/auth/login", data=credentials)
+    with SessionLocal() as db:
+        stored = db.query(models.User).filter(models.User.username == "rehashuser").one().hashed_password
+    try:
+        assert response.status_code == status.HTTP_200_OK, f"Login failed: {response.text}"
+        assert stored != weak_hash, "Hash was not upgraded"
+        assert stored.startswith(f"$2b${passwords.BCRYPT_ROUNDS:02d}$"), f"Unexpected cost: {stored[:7]}"
+    except AssertionError as e:
+        pytest.fail(f"Rehash test failed: {e}")
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import status
+from sqlalchemy import text
+
+from app import metrics, models, profiling
+from app.database import SessionLocal, engine
+from app.profiling import RequestProfile, profile_var, profiled
+
+
+def login(client, username, role="user"):
+    credentials = {"username": username, "password": "strongpassword123"}
+    client.post("/v1/auth/register", json={**credentials, "email": f"{username}@example.com"})
+    with SessionLocal() as db:
+        user = db.query(models.User).filter(models.User.username == username).one()
+        user.role = role
+        db.commit()
+    response = client.post("/v1/auth/login", data=credentials)
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def find(node, name):
+    if name in node["function"]:
+        return node
+    for child in node["children"]:
+        found = find(child, name)
+        if found:
+            return found
+    return None
+
+
+def test_admin_header_profiles_request(client):
+    """X-Profile from an admin records the call tree and SQL, retrievable by ID"""
+    admin = login(client, "profileadmin", role="admin")
+    profiling.profile_store.clear()
+
+    response = client.get("/v1/tasks/", headers={**admin, "X-Profile": "1"})
+    profile_id = response.headers.get("X-Profile-ID")
+    listed = client.get("/v1/admin/profiles", headers=admin)
+    profile = client.get(f"/v1/admin/profiles/{profile_id}", headers=admin).json()
+    try:
+        assert response.status_code == status.HTTP_200_OK, f"Request failed: {response.text}"
+        assert profile["request_id"] == response.headers.get("X-Request-ID"), f"Request id not recorded: {profile}"
+        assert [p["id"] for p in listed.json()] == [profile_id], f"Unexpected listing: {listed.json()}"
+        assert profile["status_code"] == 200 and profile["trigger"] == "header", f"Unexpected summary: {profile}"
+        assert any("FROM tasks" in q["statement"] for q in profile["queries"]), f"Task query missing: {profile['queries']}"
+        assert profile["query_count"] == len(profile["queries"]), f"Query count mismatch: {profile}"
+        assert profile["call_tree"]["function"].startswith("read_tasks"), f"Unexpected root: {profile['call_tree']}"
+        assert profile["top_functions"], "Flat profile missing"
+    except AssertionError as e:
+        pytest.fail(f"Admin profiling test failed: {e}")
+
+
+def test_profiling_requires_admin(client):
+    """Non-admins can neither trigger profiles nor read them"""
+    user = login(client, "profileuser")
+    profiling.profile_store.clear()
+
+    response = client.get("/v1/tasks/", headers={**user, "X-Profile": "1"})
+    listing = client.get("/v1/admin/profiles", headers=user)
+    try:
+        assert "X-Profile-ID" not in response.headers, f"Non-admin request was profiled: {response.headers}"
+        assert profiling.profile_store.recent() == [], "Profile stored for a non-admin"
+        assert listing.status_code == status.HTTP_403_FORBIDDEN, f"Expected 403: {listing.status_code}"
+        missing = client.get("/v1/admin/profiles/unknown", headers=login(client, "profileadmin", role="admin"))
+        assert missing.status_code == status.HTTP_404_NOT_FOUND, f"Expected 404: {missing.status_code}"
+    except AssertionError as e:
+        pytest.fail(f"Profiling access test failed: {e}")
+
+
+def test_async_endpoints_are_profiled():
+    """Coroutine endpoints get a call tree rooted at the endpoint"""
+
+    def busy():
+        return sum(i * i for i in range(20000))
+
+    async def endpoint():
+        await asyncio.sleep(0)
+        return busy()
+
+    profile = RequestProfile(id="async-test", method="GET", path="/", trigger="sample")
+
+    async def run():
+        token = profile_var.set(profile)
+        try:
+            return await profiled(endpoint)()
+        finally:
+            profile_var.reset(token)
+
+    asyncio.run(run())
+    try:
+        assert profile.call_tree["function"].startswith("endpoint"), f"Unexpected root: {profile.call_tree}"
+        assert find(profile.call_tree, "busy"), f"Callee missing from tree: {profile.call_tree}"
+    except AssertionError as e:
+        pytest.fail(f"Async profiling test failed: {e}")
+
+
+def test_client_request_id_cannot_overwrite_profiles(client):
+    """Profile ids are generated by the server, whatever X-Request-ID the client sends"""
+    admin = login(client, "profileadmin", role="admin")
+    profiling.profile_store.clear()
+    headers = {**admin, "X-Profile": "1", "X-Request-ID": "chosen-by-client"}
+
+    first = client.get("/v1/tasks/", headers=headers).headers.get("X-Profile-ID")
+    second = client.get("/v1/tasks/", headers=headers).headers.get("X-Profile-ID")
+    listed = client.get("/v1/admin/profiles", headers=admin).json()
+    try:
+        assert first and second and first != second, f"Profile ids reused: {first}, {second}"
+        assert "chosen-by-client" not in (first, second), "Client request id used as profile id"
+        assert [p["request_id"] for p in listed] == ["chosen-by-client"] * 2, f"Unexpected listing: {listed}"
+    except AssertionError as e:
+        pytest.fail(f"Profile id test failed: {e}")
+
+
+def test_concurrent_sync_profiles_share_one_profiler():
+    """A sync endpoint profiled while another holds the profiler runs unprofiled instead of failing"""
+    entered, release = threading.Event(), threading.Event()
+
+    def slow():
+        entered.set()
+        release.wait(1)
+        return "slow"
+
+    def fast():
+        return "fast"
+
+    def call(endpoint, profile):
+        token = profile_var.set(profile)
+        try:
+            return profiled(endpoint)()
+        finally:
+            profile_var.reset(token)
+
+    first = RequestProfile(id="first", method="GET", path="/", trigger="sample")
+    second = RequestProfile(id="second", method="GET", path="/", trigger="sample")
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        future = pool.submit(call, slow, first)
+        entered.wait(1)
+        result = call(fast, second)
+        release.set()
+        future.result()
+    try:
+        assert result == "fast", f"Concurrent request failed: {result}"
+        assert second.call_tree is None, "Second profiler ran alongside the first"
+        assert first.call_tree["function"].startswith("slow"), f"Unexpected root: {first.call_tree}"
+        assert call(fast, second) == "fast" and second.call_tree, "Profiler not released"
+    except AssertionError as e:
+        pytest.fail(f"Concurrent profiling test failed: {e}")
+
+
+def test_slow_queries_are_logged(monkeypatch):
+    """Statements over SLOW_QUERY_MS are logged and counted, profiled or not"""
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    profiling.logger.addHandler(handler)
+    monkeypatch.setattr(profiling, "SLOW_QUERY_MS", 5)
+    before = metrics.slow_queries._value.get()
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.connection.driver_connection.create_function("sleep_ms", 1, lambda ms: time.sleep(ms / 1000))
+            conn.execute(text("SELECT sleep_ms(20)"))
+    finally:
+        profiling.logger.removeHandler(handler)
+
+    try:
+        assert len(records) == 1, f"Expected one slow query, got {[r.fields for r in records]}"
+        assert "sleep_ms" in records[0].fields["statement"], f"Unexpected statement: {records[0].fields}"
+        assert records[0].fields["duration_ms"] >= 5, f"Unexpected duration: {records[0].fields}"
+        assert metrics.slow_queries._value.get() == before + 1, "Slow query not counted"
+    except AssertionError as e:
+        pytest.fail(f"Slow query log test failed: {e}")
@@ -0,0 +1,251 @@
+from concurrent.futures import ThreadPoolExecutor
+import socket
+import time
+
+import fakeredis
+import pytest
+from fastapi import HTTPException, Request, status
+import redis
+
+from app import ratelimit
+
+
+@pytest.fixture
+def fake_redis():
+    server = fakeredis.FakeServer()
+    return fakeredis.FakeRedis(server=server, decode_responses=True)
+
+
+def get_headers(client):
+    response = client.post(
+        "/v1/auth/login",
+        data={"username": "testuser", "password": "strongpassword123"},
+    )
+    try:
+        assert response.status_code == status.HTTP_200_OK, f"Login failed: {response.text}"
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    except AssertionError as e:
+        pytest.fail(f"Authentication setup failed: {e}")
+
+
+def test_fixed_window_counts_and_resets(fake_redis):
+    """The Lua script allows `limit` hits per window and reports remaining/reset"""
+    limiter = ratelimit.FixedWindowLimiter(fake_redis, limit=3, period=60)
+    results = [limiter.hit("rate:test") for _ in range(4)]
+    try:
+        assert [r.allowed for r in results] == [True, True, True, False], f"Unexpected decisions: {results}"
+        assert [r.remaining for r in results] == [2, 1, 0, 0], f"Unexpected remaining: {results}"
+        assert 0 < results[-1].reset <= 60, f"Unexpected reset: {results[-1]}"
+        assert results[-1].headers()["Retry-After"] == "60", f"Unexpected headers: {results[-1].headers()}"
+    except AssertionError as e:
+        pytest.fail(f"Fixed window test failed: {e}")
+
+
+@pytest.mark.parametrize("algorithm", sorted(ratelimit.ALGORITHMS))
+def test_algorithms_enforce_limit_and_recover(fake_redis, algorithm):
+    """Every algorithm allows `limit` immediate hits, then recovers after the reported reset"""
+    limiter = ratelimit.ALGORITHMS[algorithm](fake_redis, limit=3, period=0.5)
+    results = [limiter.hit("rate:algo") for _ in range(4)]
+    try:
+        assert [r.allowed for r in results] == [True, True, True, False], f"Unexpected decisions: {results}"
+        assert results[0].remaining == 2, f"Unexpected remaining: {results[0]}"
+        # a sliding window may need part of the next window before the old hits decay
+        assert 0 < results[-1].reset <= 1.0, f"Unexpected reset: {results[-1]}"
+        time.sleep(results[-1].reset + 0.01)
+        assert limiter.hit("rate:algo").allowed, "Request still rejected after the reported reset"
+    except AssertionError as e:
+        pytest.fail(f"{algorithm} test failed: {e}")
+
+
+@pytest.mark.parametrize("algorithm", sorted(ratelimit.ALGORITHMS))
+def test_algorithms_are_atomic_under_concurrency(fake_redis, algorithm):
+    """No algorithm lets more than `limit` concurrent requests through"""
+    limiter = ratelimit.ALGORITHMS[algorithm](fake_redis, limit=5, period=60)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda _: limiter.hit("rate:burst"), range(50)))
+    try:
+        assert sum(r.allowed for r in results) == 5, f"Allowed {sum(r.allowed for r in results)} of 50"
+    except AssertionError as e:
+        pytest.fail(f"{algorithm} concurrency test failed: {e}")
+
+
+def test_gcra_spaces_requests(fake_redis):
+    """After the burst, GCRA admits one request per `period / limit`"""
+    limiter = ratelimit.GCRALimiter(fake_redis, limit=4, period=0.4)
+    for _ in range(4):
+        limiter.hit("rate:gcra")
+    denied = limiter.hit("rate:gcra")
+    time.sleep(0.11)
+    after_one_interval = [limiter.hit("rate:gcra").allowed for _ in range(2)]
+    try:
+        assert not denied.allowed and denied.reset <= 0.1, f"Unexpected denial: {denied}"
+        assert after_one_interval == [True, False], f"Expected exactly one slot: {after_one_interval}"
+    except AssertionError as e:
+        pytest.fail(f"GCRA spacing test failed: {e}")
+
+
+def test_policies_from_env(monkeypatch):
+    """RATE_LIMIT_POLICIES overrides named budgets; unknown names use the defaults"""
+    monkeypatch.setenv("RATE_LIMIT_POLICIES", '{"tasks:batch": {"limit": 2, "algorithm": "gcra", "scope": "ip"}}')
+    policies = ratelimit.load_policies()
+    monkeypatch.setattr(ratelimit, "policies", policies)
+    try:
+        assert policies["tasks:batch"].limit == 2, f"Unexpected policy: {policies}"
+        assert ratelimit.get_policy("tasks:batch").algorithm == "gcra", "Override not applied"
+        assert ratelimit.get_policy("tasks").limit == ratelimit.RATE_LIMIT, "Default policy not used"
+    except AssertionError as e:
+        pytest.fail(f"Policy config test failed: {e}")
+
+
+def use_policies(monkeypatch, fake_redis, **policies):
+    monkeypatch.setattr(ratelimit, "redis_backend", ratelimit.RedisBackend(fake_redis))
+    monkeypatch.setattr(ratelimit, "_limiters", {})
+    monkeypatch.setattr(
+        ratelimit,
+        "policies",
+        {name: ratelimit.RateLimitPolicy(name=name, **options) for name, options in policies.items()},
+    )
+
+
+def test_rate_limited_route_returns_429_with_headers(client, fake_redis, monkeypatch):
+    """Task routes expose X-RateLimit-* headers and reject once the budget is spent"""
+    headers = get_headers(client)
+    use_policies(monkeypatch, fake_redis, tasks={"limit": 2, "period": 60})
+
+    first = client.get("/v1/tasks/", headers=headers)
+    client.get("/v1/tasks/", headers=headers)
+    third = client.get("/v1/tasks/", headers=headers)
+    try:
+        assert first.headers.get("X-RateLimit-Remaining") == "1", f"Missing headers: {first.headers}"
+        assert third.status_code == status.HTTP_429_TOO_MANY_REQUESTS, f"Expected 429: {third.status_code}"
+        assert third.headers.get("X-RateLimit-Remaining") == "0", f"Missing 429 headers: {third.headers}"
+        assert "Retry-After" in third.headers, f"Retry-After missing: {third.headers}"
+    except AssertionError as e:
+        pytest.fail(f"Rate limited route test failed: {e}")
+
+
+def test_route_policies_have_separate_budgets(client, fake_redis, monkeypatch):
+    """Spending the batch budget does not throttle regular task reads"""
+    headers = get_headers(client)
+    use_policies(monkeypatch, fake_redis, **{"tasks:batch": {"limit": 1, "period": 60}})
+
+    client.request("DELETE", "/v1/tasks/batch", json=[], headers=headers)
+    batch = client.request("DELETE", "/v1/tasks/batch", json=[], headers=headers)
+    read = client.get("/v1/tasks/", headers=headers)
+    try:
+        assert batch.status_code == status.HTTP_429_TOO_MANY_REQUESTS, f"Expected 429: {batch.status_code}"
+        assert read.status_code == status.HTTP_200_OK, f"Reads throttled by batch policy: {read.status_code}"
+        assert fake_redis.keys("rate:tasks:batch:user:testuser:*"), f"Unexpected keys: {fake_redis.keys()}"
+    except AssertionError as e:
+        pytest.fail(f"Route policy test failed: {e}")
+
+
+def make_request(host: str = "10.0.0.1") -> Request:
+    return Request({"type": "http", "headers": [], "client": (host, 1234)})
+
+
+def test_local_bucket_limits_refills_and_stays_bounded():
+    """The fallback bucket enforces the limit, refills over time and evicts old clients"""
+    local = ratelimit.LocalTokenBucket(max_keys=8, shards=2)
+    decisions = [local.hit("rate:local", limit=3, period=0.3).allowed for _ in range(4)]
+    time.sleep(0.11)
+    refilled = local.hit("rate:local", limit=3, period=0.3)
+    for i in range(100):
+        local.hit(f"rate:client:{i}", limit=3, period=60)
+    try:
+        assert decisions == [True, True, True, False], f"Unexpected decisions: {decisions}"
+        assert refilled.allowed, f"Bucket did not refill: {refilled}"
+        assert len(local) <= 8, f"LRU bound exceeded: {len(local)} keys"
+    except AssertionError as e:
+        pytest.fail(f"Local bucket test failed: {e}")
+
+
+def test_redis_failure_falls_back_to_local_and_reconnects(fake_redis, monkeypatch):
+    """A Redis error switches to local buckets without re-probing Redis per request"""
+    calls = []
+    original = fake_redis.execute_command
+
+    def failing_execute_command(*args, **kwargs):
+        calls.append(args[0])
+        raise redis.ConnectionError("Redis is down")
+
+    monkeypatch.setattr(fake_redis, "execute_command", failing_execute_command)
+    backend = ratelimit.RedisBackend(fake_redis, retry_interval=0.05)
+    monkeypatch.setattr(ratelimit, "redis_backend", backend)
+    monkeypatch.setattr(ratelimit, "_limiters", {})
+    monkeypatch.setattr(ratelimit, "local_limiter", ratelimit.LocalTokenBucket())
+    monkeypatch.setattr(ratelimit, "policies", {"default": ratelimit.RateLimitPolicy("default", limit=2, period=60)})
+
+    ratelimit.enforce(make_request())
+    ratelimit.enforce(make_request())
+    with pytest.raises(HTTPException) as exc_info:
+        ratelimit.enforce(make_request())
+    failed_calls = len(calls)
+
+    monkeypatch.setattr(fake_redis, "execute_command", original)
+    deadline = time.monotonic() + 2
+    while not backend.available and time.monotonic() < deadline:
+        time.sleep(0.01)
+    backend.close()
+    try:
+        assert exc_info.value.status_code == status.HTTP_429_TOO_MANY_REQUESTS, "Local limit not enforced"
+        assert failed_calls <= 2, f"Redis re-probed on every request: {calls}"
+        assert backend.available, "Backend did not reconnect"
+        assert ratelimit.enforce(make_request()).remaining == 1, "Redis limiter not used after reconnect"
+    except AssertionError as e:
+        pytest.fail(f"Fallback test failed: {e}")
+
+
+def test_unresponsive_redis_times_out_to_local_buckets(monkeypatch):
+    """A Redis that accepts connections but never answers costs one short timeout"""
+    blackhole = socket.socket()
+    blackhole.bind(("127.0.0.1", 0))
+    blackhole.listen()
+    url = f"redis://127.0.0.1:{blackhole.getsockname()[1]}/0"
+    backend = ratelimit.RedisBackend(ratelimit.connect(url, timeout=0.2), url=url, retry_interval=60)
+    monkeypatch.setattr(ratelimit, "redis_backend", backend)
+    monkeypatch.setattr(ratelimit, "_limiters", {})
+    monkeypatch.setattr(ratelimit, "local_limiter", ratelimit.LocalTokenBucket())
+
+    started = time.monotonic()
+    first = ratelimit.check(make_request())
+    second = ratelimit.check(make_request())
+    elapsed = time.monotonic() - started
+    backend.close()
+    blackhole.close()
+    try:
+        assert first.allowed and second.allowed, "Local buckets not used"
+        assert not backend.available, "Backend still marked available"
+        assert elapsed < 2, f"Limiter waited {elapsed:.1f}s on an unresponsive Redis"
+    except AssertionError as e:
+        pytest.fail(f"Redis timeout test failed: {e}")
+
+
+def test_throttled_request_opens_no_session(client, fake_redis, monkeypatch):
+    """The middleware rejects before dependencies run: no DB session, no pool checkout"""
+    from app.database import engine
+    from app.dependencies import get_db
+    from app.main import app
+
+    headers = get_headers(client)
+    use_policies(monkeypatch, fake_redis, tasks={"limit": 1, "period": 60})
+    sessions = []
+
+    def counting_get_db():
+        sessions.append(1)
+        yield from get_db()
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, counting_get_db)
+    allowed = client.get("/v1/tasks/", headers=headers)
+    opened_before = len(sessions)
+    checkouts_before = engine.pool.stats.checkouts
+    throttled = client.get("/v1/tasks/", headers=headers)
+    try:
+        assert allowed.status_code == status.HTTP_200_OK, f"First request failed: {allowed.status_code}"
+        assert throttled.status_code == status.HTTP_429_TOO_MANY_REQUESTS, f"Expected 429: {throttled.status_code}"
+        assert throttled.json()["detail"].startswith("Rate limit exceeded"), f"Unexpected body: {throttled.text}"
+        assert "X-Request-ID" in throttled.headers, f"429 skipped request id middleware: {throttled.headers}"
+        assert len(sessions) == opened_before, "A session was opened for a throttled request"
+        assert engine.pool.stats.checkouts == checkouts_before, "A connection was checked out for a throttled request"
+    except AssertionError as e:
+        pytest.fail(f"Middleware ordering test failed: {e}")
@@ -0,0 +1,101 @@
+import io
+import json
+import logging
+
+import pytest
+from fastapi import FastAPI, Request, status
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.logs import LogPipeline, get_encoder
+from app.ratelimit import RateLimitResult
+from app.request_context import RequestContextMiddleware, RequestIdFilter, get_request_id, new_request_id
+
+
+def build_app(stream):
+    pipeline = LogPipeline(stream=stream, encoder=get_encoder("json"))
+    pipeline.handler.addFilter(RequestIdFilter())
+    logger = logging.getLogger("test_request_context")
+    logger.handlers = [pipeline.handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware, logger=logger)
+
+    @app.get("/whoami")
+    def whoami(request: Request):
+        logger.info("handler")
+        return {"context": get_request_id(), "state": request.state.request_id}
+
+    @app.get("/limited")
+    def limited(request: Request):
+        request.state.rate_limit = RateLimitResult(True, 10, 9, 60)
+        return {}
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b"a", b"b", b"c"]), media_type="text/plain")
+
+    return app, pipeline
+
+
+def read_lines(pipeline, stream):
+    pipeline.stop()
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_request_id_is_generated_and_shared():
+    """Handlers, request.state, log records and the response header see the same ID"""
+    stream = io.StringIO()
+    app, pipeline = build_app(stream)
+    pipeline.start()
+    with TestClient(app) as client:
+        response = client.get("/whoami")
+    lines = read_lines(pipeline, stream)
+    request_id = response.headers.get("X-Request-ID")
+    try:
+        assert request_id, f"Header missing: {response.headers}"
+        assert response.json() == {"context": request_id, "state": request_id}, f"Unexpected body: {response.json()}"
+        assert [line["message"] for line in lines] == ["handler", "request"], f"Unexpected logs: {lines}"
+        assert all(line["request_id"] == request_id for line in lines), f"Logs missing request id: {lines}"
+        assert lines[1]["status_code"] == 200 and "duration_ms" in lines[1], f"Unexpected access log: {lines[1]}"
+        assert get_request_id() is None, "Request id leaked out of the request"
+    except AssertionError as e:
+        pytest.fail(f"Request id test failed: {e}")
+
+
+def test_incoming_request_id_is_propagated():
+    """A well-formed X-Request-ID is kept; anything else is replaced"""
+    app, _ = build_app(io.StringIO())
+    with TestClient(app) as client:
+        kept = client.get("/whoami", headers={"X-Request-ID": "edge-7f3a.42"})
+        replaced = client.get("/whoami", headers={"X-Request-ID": "bad id\twith spaces"})
+    try:
+        assert kept.headers["X-Request-ID"] == "edge-7f3a.42", f"Incoming id not kept: {kept.headers}"
+        assert kept.json()["context"] == "edge-7f3a.42", f"Handler saw another id: {kept.json()}"
+        assert replaced.headers["X-Request-ID"] != "bad id\twith spaces", "Invalid id was echoed"
+    except AssertionError as e:
+        pytest.fail(f"Request id propagation test failed: {e}")
+
+
+def test_streaming_and_rate_limit_headers():
+    """Streaming bodies pass through untouched; handler-set rate limit headers are added"""
+    app, _ = build_app(io.StringIO())
+    with TestClient(app) as client:
+        streamed = client.get("/stream")
+        limited = client.get("/limited")
+    try:
+        assert streamed.status_code == status.HTTP_200_OK and streamed.text == "abc", f"Stream broken: {streamed.text}"
+        assert "X-Request-ID" in streamed.headers, f"Header missing on stream: {streamed.headers}"
+        assert limited.headers.get("X-RateLimit-Remaining") == "9", f"Rate limit headers missing: {limited.headers}"
+    except AssertionError as e:
+        pytest.fail(f"Streaming/rate limit header test failed: {e}")
+
+
+def test_generated_ids_are_unique():
+    ids = {new_request_id() for _ in range(10000)}
+    try:
+        assert len(ids) == 10000, f"Duplicate ids generated: {10000 - len(ids)}"
+    except AssertionError as e:
+        pytest.fail(f"Id generation test failed: {e}")
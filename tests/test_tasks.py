@@ -1,3 +1,5 @@
+import base64
+import json
 import pytest
 from fastapi import status
 
@@ -50,3 +52,341 @@ def test_get_tasks(client):
             assert "title" in tasks[0], f"Task structure invalid: {tasks[0]}"
     except AssertionError as e:
         pytest.fail(f"Get tasks test failed: {e}")
+
+
+def test_get_tasks_cursor_pagination(client):
+    """Test walking the task list with keyset cursors"""
+    token = get_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for i in range(3):
+        client.post("/v1/tasks/", headers=headers, json={"title": f"Page Task {i}"})
+
+    seen = []
+    cursor = None
+    try:
+        for _ in range(100):
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get("/v1/tasks/", headers=headers, params=params)
+            assert response.status_code == status.HTTP_200_OK, f"Fetching page failed: {response.text}"
+            page = response.json()
+            assert len(page) <= 2, f"Page larger than limit: {page}"
+            seen.extend(task["id"] for task in page)
+
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+            assert 'rel="next"' in response.headers.get("Link", ""), f"Link header missing: {response.headers}"
+
+        assert len(seen) == len(set(seen)), f"Pages overlap: {seen}"
+        assert len(seen) >= 3, f"Expected at least 3 tasks, got: {seen}"
+    except AssertionError as e:
+        pytest.fail(f"Cursor pagination test failed: {e}")
+
+
+def test_get_tasks_offset_and_invalid_cursor(client):
+    """Test legacy offset pagination and cursor validation"""
+    token = get_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    offset_response = client.get("/v1/tasks/", headers=headers, params={"skip": 0, "limit": 1})
+    invalid_response = client.get("/v1/tasks/", headers=headers, params={"cursor": "not-a-cursor"})
+    raw_cursors = ['["2024-01-01T00:00:00",1000000000000000000000000000000]', '["2024-01-01T00:00:00",-1]',
+                   '["2024-01-01T00:00:00",1.5]', '["2024-01-01T00:00:00","7"]']
+    out_of_range = [
+        client.get(
+            "/v1/tasks/", headers=headers,
+            params={"cursor": base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")},
+        ).status_code
+        for raw in raw_cursors
+    ]
+    try:
+        assert offset_response.status_code == status.HTTP_200_OK, f"Offset pagination failed: {offset_response.text}"
+        assert len(offset_response.json()) <= 1, f"Offset page larger than limit: {offset_response.json()}"
+        assert "X-Next-Cursor" not in offset_response.headers, "Offset mode should not emit cursors"
+        assert invalid_response.status_code == status.HTTP_400_BAD_REQUEST, f"Invalid cursor accepted: {invalid_response.text}"
+        assert out_of_range == [status.HTTP_400_BAD_REQUEST] * 4, f"Bad cursor ids not rejected: {out_of_range}"
+    except AssertionError as e:
+        pytest.fail(f"Offset pagination test failed: {e}")
+
+
+def test_export_tasks(client):
+    """Test streaming the task export as NDJSON and CSV"""
+    token = get_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    ndjson_response = client.get("/v1/tasks/export", headers=headers)
+    csv_response = client.get("/v1/tasks/export", headers=headers, params={"format": "csv"})
+    try:
+        assert ndjson_response.status_code == status.HTTP_200_OK, f"NDJSON export failed: {ndjson_response.text}"
+        assert ndjson_response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in ndjson_response.text.splitlines()]
+        assert lines and {"id", "title", "completed", "created_at"} <= set(lines[0]), f"Bad NDJSON rows: {lines[:1]}"
+
+        assert csv_response.status_code == status.HTTP_200_OK, f"CSV export failed: {csv_response.text}"
+        csv_lines = csv_response.text.splitlines()
+        assert csv_lines[0] == "id,title,description,completed,created_at", f"Bad CSV header: {csv_lines[0]}"
+        assert len(csv_lines) == len(lines) + 1, "CSV and NDJSON exports disagree on row count"
+    except AssertionError as e:
+        pytest.fail(f"Export test failed: {e}")
+
+
+def test_export_requires_auth(client):
+    """Test that the export honours authentication"""
+    response = client.get("/v1/tasks/export")
+    try:
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED, f"Unauthenticated export allowed: {response.status_code}"
+    except AssertionError as e:
+        pytest.fail(f"Export auth test failed: {e}")
+
+
+def test_batch_create_update_delete(client):
+    """Test the batch endpoints with per-item results"""
+    token = get_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    created = client.post(
+        "/v1/tasks/batch",
+        headers=headers,
+        json=[{"title": "Batch A"}, {"title": "Batch B", "description": "second"}],
+    )
+    try:
+        assert created.status_code == status.HTTP_201_CREATED, f"Batch create failed: {created.text}"
+        results = created.json()["results"]
+        assert [r["status"] for r in results] == [201, 201], f"Unexpected create results: {results}"
+        assert [r["task"]["title"] for r in results] == ["Batch A", "Batch B"], f"Results out of order: {results}"
+        ids = [r["id"] for r in results]
+
+        updated = client.patch(
+            "/v1/tasks/batch",
+            headers=headers,
+            json=[{"id": ids[0], "completed": True}, {"id": 999999, "title": "missing"}],
+        )
+        assert updated.status_code == status.HTTP_200_OK, f"Batch update failed: {updated.text}"
+        results = updated.json()["results"]
+        assert results[0]["status"] == 200 and results[0]["task"]["completed"] is True, f"Update not applied: {results}"
+        assert results[1]["status"] == 404, f"Missing task not reported: {results}"
+
+        null_title = client.patch("/v1/tasks/batch", headers=headers, json=[{"id": ids[1], "title": None}])
+        assert null_title.status_code == 422, f"Null title accepted: {null_title.text}"
+        untouched = client.get(f"/v1/tasks/{ids[1]}", headers=headers).json()
+        assert untouched["title"] == "Batch B", f"Rejected batch changed the task: {untouched}"
+
+        deleted = client.request("DELETE", "/v1/tasks/batch", headers=headers, json=ids + [999999])
+        assert deleted.status_code == status.HTTP_200_OK, f"Batch delete failed: {deleted.text}"
+        assert [r["status"] for r in deleted.json()["results"]] == [204, 204, 404], f"Unexpected delete results: {deleted.text}"
+
+        gone = client.get(f"/v1/tasks/{ids[0]}", headers=headers)
+        assert gone.status_code == status.HTTP_404_NOT_FOUND, f"Deleted task still readable: {gone.text}"
+    except AssertionError as e:
+        pytest.fail(f"Batch endpoints test failed: {e}")
+
+
+def test_task_etag_and_if_none_match(client):
+    """Single tasks and pages carry ETags; a matching If-None-Match returns an empty 304"""
+    token = get_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    task_id = client.post("/v1/tasks/", headers=headers, json={"title": "Etag"}).json()["id"]
+
+    first = client.get(f"/v1/tasks/{task_id}", headers=headers)
+    etag = first.headers.get("ETag")
+    cached = client.get(f"/v1/tasks/{task_id}", headers={**headers, "If-None-Match": etag})
+    since = client.get(
+        f"/v1/tasks/{task_id}", headers={**headers, "If-Modified-Since": first.headers.get("Last-Modified", "")}
+    )
+    client.put(f"/v1/tasks/{task_id}", headers=headers, json={"completed": True})
+    changed = client.get(f"/v1/tasks/{task_id}", headers={**headers, "If-None-Match": etag})
+
+    page = client.get("/v1/tasks/?limit=5", headers=headers)
+    page_cached = client.get("/v1/tasks/?limit=5", headers={**headers, "If-None-Match": page.headers["ETag"]})
+    try:
+        assert etag == f'"{task_id}.1"', f"Unexpected ETag: {etag}"
+        assert "Last-Modified" in first.headers, f"Last-Modified missing: {first.headers}"
+        assert cached.status_code == status.HTTP_304_NOT_MODIFIED and cached.content == b"", f"Expected 304: {cached.status_code}"
+        assert cached.headers.get("ETag") == etag, "304 must repeat the ETag"
+        assert since.status_code == status.HTTP_304_NOT_MODIFIED, f"If-Modified-Since ignored: {since.status_code}"
+        assert changed.status_code == status.HTTP_200_OK, f"Stale ETag matched: {changed.status_code}"
+        assert changed.json()["version"] == 2 and changed.headers["ETag"] == f'"{task_id}.2"', f"{changed.headers}"
+        assert page_cached.status_code == status.HTTP_304_NOT_MODIFIED, f"Page ETag ignored: {page_cached.status_code}"
+    except AssertionError as e:
+        pytest.fail(f"Conditional GET test failed: {e}")
+
+
+def test_put_if_match(client):
+    """PUT with a stale If-Match fails with 412 and leaves the task unchanged"""
+    token = get_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    task_id = client.post("/v1/tasks/", headers=headers, json={"title": "Original"}).json()["id"]
+    etag = client.get(f"/v1/tasks/{task_id}", headers=headers).headers["ETag"]
+
+    first = client.put(f"/v1/tasks/{task_id}", headers={**headers, "If-Match": etag}, json={"title": "First"})
+    stale = client.put(f"/v1/tasks/{task_id}", headers={**headers, "If-Match": etag}, json={"title": "Second"})
+    current = client.get(f"/v1/tasks/{task_id}", headers=headers)
+    wildcard = client.put(f"/v1/tasks/{task_id}", headers={**headers, "If-Match": "*"}, json={"title": "Third"})
+    missing = client.put("/v1/tasks/999999", headers={**headers, "If-Match": etag}, json={"title": "Nope"})
+    try:
+        assert first.status_code == status.HTTP_200_OK, f"Matching If-Match rejected: {first.text}"
+        assert first.headers.get("ETag") == f'"{task_id}.2"', f"Unexpected ETag: {first.headers}"
+        assert stale.status_code == status.HTTP_412_PRECONDITION_FAILED, f"Stale If-Match accepted: {stale.status_code}"
+        assert current.json()["title"] == "First", f"412 request modified the task: {current.json()}"
+        assert wildcard.status_code == status.HTTP_200_OK, f"If-Match * rejected: {wildcard.text}"
+        assert missing.status_code == status.HTTP_404_NOT_FOUND, f"Expected 404: {missing.status_code}"
+    except AssertionError as e:
+        pytest.fail(f"If-Match test failed: {e}")
+
+
+def test_search_tasks(client):
+    """Test full-text, completed and created_at filters on /tasks/search"""
+    token = get_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    created = client.post(
+        "/v1/tasks/batch",
+        headers=headers,
+        json=[
+            {"title": "Zephyr deployment", "description": "Roll out the gateway"},
+            {"title": "Review", "description": "zephyr gateway review"},
+            {"title": "Zephyr notes", "description": None},
+        ],
+    ).json()["results"]
+    ids = [result["id"] for result in created]
+    client.put(f"/v1/tasks/{ids[2]}", headers=headers, json={"completed": True, "title": "Zephyr notes gateway"})
+
+    def search(**params):
+        response = client.get("/v1/tasks/search", headers=headers, params=params)
+        assert response.status_code == status.HTTP_200_OK, f"Search failed: {response.text}"
+        return [task["id"] for task in response.json()]
+
+    try:
+        assert search(q="zephyr") == ids, "Search missed tasks"
+        assert search(q="ZEPH gate") == ids, "Prefix / multi-word search failed"
+        assert search(q="zephyr deploy") == ids[:1], "Words not ANDed"
+        assert search(q="zephyr", completed=True) == ids[2:], "Completed filter ignored"
+        assert search(q="zephyr gateway", completed=False) == ids[:2], "Updated title not reindexed"
+
+        first = client.get(f"/v1/tasks/{ids[1]}", headers=headers).json()["created_at"]
+        assert search(q="zephyr", created_after=first) == ids[1:], "created_after not inclusive"
+        assert search(q="zephyr", created_before=first) == ids[:1], "created_before not exclusive"
+
+        page = client.get("/v1/tasks/search", headers=headers, params={"q": "zephyr", "limit": 2})
+        assert "q=zephyr" in page.headers.get("Link", ""), f"Next link drops the filters: {page.headers}"
+        rest = search(q="zephyr", limit=2, cursor=page.headers["X-Next-Cursor"])
+        assert rest == ids[2:], f"Unexpected second page: {rest}"
+
+        client.delete(f"/v1/tasks/{ids[0]}", headers=headers)
+        assert search(q="deployment") == [], "Deleted task still indexed"
+
+        invalid = client.get("/v1/tasks/search", headers=headers, params={"q": '"*:'})
+        assert invalid.status_code == status.HTTP_400_BAD_REQUEST, f"Query without words accepted: {invalid.text}"
+    except AssertionError as e:
+        pytest.fail(f"Search tasks test failed: {e}")
+
+
+def test_task_stats_follow_writes(client):
+    """Counters track single and batch writes without drifting from COUNT(*)"""
+    from app import task_stats
+    from app.database import engine
+
+    token = get_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    def stats():
+        response = client.get("/v1/tasks/stats", headers=headers)
+        assert response.status_code == status.HTTP_200_OK, f"Stats failed: {response.text}"
+        return response.json()
+
+    try:
+        before = stats()
+        single = client.post("/v1/tasks/", headers=headers, json={"title": "Counted"}).json()["id"]
+        batch = [
+            r["id"]
+            for r in client.post("/v1/tasks/batch", headers=headers, json=[{"title": "A"}, {"title": "B"}, {"title": "C"}]).json()["results"]
+        ]
+        client.put(f"/v1/tasks/{single}", headers=headers, json={"completed": True})
+        client.put(f"/v1/tasks/{single}", headers=headers, json={"completed": True, "title": "Still completed"})
+        client.patch("/v1/tasks/batch", headers=headers, json=[{"id": batch[0], "completed": True}, {"id": batch[1], "title": "Renamed"}])
+        client.delete(f"/v1/tasks/{single}", headers=headers)
+        client.request("DELETE", "/v1/tasks/batch", headers=headers, json=[batch[2]])
+
+        after = stats()
+        assert after["total"] == before["total"] + 2, f"Total off: {before} -> {after}"
+        assert after["completed"] == before["completed"] + 1, f"Completed off: {before} -> {after}"
+        assert after["open"] == after["total"] - after["completed"], f"Open inconsistent: {after}"
+
+        listed = client.get("/v1/tasks/", headers=headers, params={"include_total": True, "limit": 1})
+        assert listed.headers.get("X-Total-Count") == str(after["total"]), f"Bad X-Total-Count: {listed.headers}"
+        plain = client.get("/v1/tasks/", headers=headers, params={"limit": 1})
+        assert "X-Total-Count" not in plain.headers, "X-Total-Count should be opt-in"
+
+        assert task_stats.reconcile(engine)["drift"] == {"total": 0, "completed": 0}, "Counters drifted"
+    except AssertionError as e:
+        pytest.fail(f"Task stats test failed: {e}")
+
+
+def test_task_stats_reconcile_fixes_drift(client):
+    """reconcile() (also run periodically) resets counters that drifted from the table"""
+    import asyncio
+    from sqlalchemy import text
+    from app import task_stats
+    from app.database import engine
+
+    token = get_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    actual = client.get("/v1/tasks/stats", headers=headers).json()
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE task_counters SET total = total + 5, completed = completed - 1"))
+    drifted = client.get("/v1/tasks/stats", headers=headers).json()
+    result = task_stats.reconcile(engine)
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE task_counters SET total = total + 2"))
+
+    async def run_reconciler():
+        reconciler = task_stats.Reconciler(interval=0.01)
+        reconciler.start(engine)
+        await asyncio.sleep(0.2)
+        await reconciler.stop()
+
+    asyncio.run(run_reconciler())
+    try:
+        assert drifted["total"] == actual["total"] + 5, f"Counters not read: {drifted}"
+        assert result["drift"] == {"total": 5, "completed": -1}, f"Unexpected drift: {result}"
+        assert client.get("/v1/tasks/stats", headers=headers).json() == actual, "Periodic reconcile did not fix drift"
+        forbidden = client.post("/v1/admin/tasks/stats/reconcile", headers=headers)
+        assert forbidden.status_code == status.HTTP_403_FORBIDDEN, f"Reconcile not admin-only: {forbidden.status_code}"
+    except AssertionError as e:
+        pytest.fail(f"Task stats reconcile test failed: {e}")
+
+
+@pytest.mark.parametrize("encoder", ["auto", "pydantic"])
+def test_task_list_fast_path_matches_response_model(client, monkeypatch, encoder):
+    """The fast path returns the same bytes and headers as response_model serialization"""
+    from app.routers import tasks
+
+    token = get_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    client.post("/v1/tasks/batch", headers=headers, json=[{"title": "Fast ünïcode"}, {"title": "Fast", "description": "d"}])
+
+    def fetch(fast, path="/v1/tasks/", **params):
+        monkeypatch.setattr(tasks, "TASK_LIST_FAST_PATH", fast)
+        monkeypatch.setattr(tasks, "TASK_LIST_ENCODER", encoder)
+        return client.get(path, headers=headers, params={"limit": 3, "include_total": True, **params})
+
+    try:
+        for path, params in (("/v1/tasks/", {}), ("/v1/tasks/", {"skip": 1}), ("/v1/tasks/search", {"q": "fast"})):
+            slow, fast = fetch(False, path, **params), fetch(True, path, **params)
+            assert fast.status_code == status.HTTP_200_OK, f"Fast path failed: {fast.text}"
+            assert fast.content == slow.content, f"Bodies differ:\n{slow.content}\n{fast.content}"
+            for header in ("ETag", "Last-Modified", "X-Next-Cursor", "Link", "X-Total-Count", "content-type"):
+                assert fast.headers.get(header) == slow.headers.get(header), f"{header} differs: {fast.headers}"
+
+        first = fetch(True)
+        not_modified = client.get(
+            "/v1/tasks/", headers={**headers, "If-None-Match": first.headers["ETag"]}, params={"limit": 3}
+        )
+        assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED, f"Expected 304: {not_modified.status_code}"
+    except AssertionError as e:
+        pytest.fail(f"Fast list path test failed: {e}")
@@ -0,0 +1,193 @@
+import pytest
+from fastapi import FastAPI, status
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import models, outbox, search, task_stats
+from app.cache import task_cache
+from app.database import Base
+from app.dependencies import get_async_db
+from app.routers import auth_async, tasks_async
+
+
+@pytest.fixture(scope="module")
+def async_client(tmp_path_factory):
+    """Client for the AsyncSession routers, backed by aiosqlite."""
+    path = tmp_path_factory.mktemp("async-db") / "tasks.db"
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    session_factory = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with session_factory() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(auth_async.router, prefix="/v1")
+    app.include_router(tasks_async.router, prefix="/v1")
+    app.dependency_overrides[get_async_db] = override_get_async_db
+
+    # task ids restart at 1 in this database; don't serve the sync suite's cached tasks
+    task_cache.clear()
+    with TestClient(app) as c:
+        async def create_tables():
+            async with async_engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+
+        c.portal.call(create_tables)
+        # Tests that inspect the database directly open their own sync engine on it
+        c.database_url = f"sqlite:///{path}"
+        sync_engine = create_engine(c.database_url)
+        search.create_search_index(sync_engine)
+        task_stats.create_counters(sync_engine)
+        sync_engine.dispose()
+        yield c
+        c.portal.call(async_engine.dispose)
+    task_cache.clear()
+
+
+def get_async_headers(client):
+    """Register and log in a user against the async auth routes"""
+    client.post(
+        "/v1/auth/register",
+        json={"username": "asyncuser", "email": "async@example.com", "password": "strongpassword123"},
+    )
+    response = client.post("/v1/auth/login", data={"username": "asyncuser", "password": "strongpassword123"})
+    try:
+        assert response.status_code == status.HTTP_200_OK, f"Async login failed: {response.text}"
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    except AssertionError as e:
+        pytest.fail(f"Async authentication setup failed: {e}")
+
+
+def test_async_auth_errors(async_client):
+    """Test duplicate registration and bad credentials on the async auth routes"""
+    get_async_headers(async_client)
+    duplicate = async_client.post(
+        "/v1/auth/register",
+        json={"username": "asyncuser", "email": "async@example.com", "password": "strongpassword123"},
+    )
+    invalid = async_client.post("/v1/auth/login", data={"username": "asyncuser", "password": "wrongpassword"})
+    try:
+        assert duplicate.status_code == status.HTTP_400_BAD_REQUEST, f"Duplicate registration should fail: {duplicate.text}"
+        assert invalid.status_code == status.HTTP_401_UNAUTHORIZED, f"Invalid login should be 401: {invalid.text}"
+    except AssertionError as e:
+        pytest.fail(f"Async auth error test failed: {e}")
+
+
+def test_async_task_crud(async_client):
+    """Test create, read, update, list and delete through the async routes"""
+    headers = get_async_headers(async_client)
+
+    created = async_client.post("/v1/tasks/", headers=headers, json={"title": "Async Task"})
+    try:
+        assert created.status_code == status.HTTP_201_CREATED, f"Async create failed: {created.text}"
+        task_id = created.json()["id"]
+
+        updated = async_client.put(f"/v1/tasks/{task_id}", headers=headers, json={"completed": True})
+        assert updated.status_code == status.HTTP_200_OK, f"Async update failed: {updated.text}"
+        assert updated.json()["completed"] is True, f"Update not applied: {updated.json()}"
+
+        fetched = async_client.get(f"/v1/tasks/{task_id}", headers=headers)
+        assert fetched.json()["title"] == "Async Task", f"Unexpected task: {fetched.json()}"
+
+        listed = async_client.get("/v1/tasks/", headers=headers, params={"limit": 1})
+        assert listed.status_code == status.HTTP_200_OK, f"Async list failed: {listed.text}"
+        assert len(listed.json()) == 1, f"Unexpected page: {listed.json()}"
+
+        batch = async_client.post("/v1/tasks/batch", headers=headers, json=[{"title": "A"}, {"title": "B"}])
+        assert [r["status"] for r in batch.json()["results"]] == [201, 201], f"Async batch failed: {batch.text}"
+
+        exported = async_client.get("/v1/tasks/export", headers=headers)
+        assert len(exported.text.splitlines()) == 3, f"Async export incomplete: {exported.text}"
+
+        deleted = async_client.delete(f"/v1/tasks/{task_id}", headers=headers)
+        assert deleted.status_code == status.HTTP_204_NO_CONTENT, f"Async delete failed: {deleted.text}"
+        missing = async_client.get(f"/v1/tasks/{task_id}", headers=headers)
+        assert missing.status_code == status.HTTP_404_NOT_FOUND, f"Deleted task still readable: {missing.text}"
+    except AssertionError as e:
+        pytest.fail(f"Async CRUD test failed: {e}")
+
+
+def test_async_search(async_client):
+    """Full-text and completed filters through the async search route"""
+    headers = get_async_headers(async_client)
+    async_client.post(
+        "/v1/tasks/batch",
+        headers=headers,
+        json=[{"title": "Async quillfeather", "description": "search me"}, {"title": "Unrelated"}],
+    )
+
+    found = async_client.get("/v1/tasks/search", headers=headers, params={"q": "quill", "completed": False})
+    try:
+        assert found.status_code == status.HTTP_200_OK, f"Async search failed: {found.text}"
+        assert [t["title"] for t in found.json()] == ["Async quillfeather"], f"Unexpected results: {found.json()}"
+    except AssertionError as e:
+        pytest.fail(f"Async search test failed: {e}")
+
+
+def test_async_task_stats(async_client):
+    """Counts and X-Total-Count through the async routes"""
+    headers = get_async_headers(async_client)
+    before = async_client.get("/v1/tasks/stats", headers=headers).json()
+    async_client.post("/v1/tasks/batch", headers=headers, json=[{"title": "Counted"}, {"title": "Counted too"}])
+
+    after = async_client.get("/v1/tasks/stats", headers=headers)
+    listed = async_client.get("/v1/tasks/", headers=headers, params={"include_total": True})
+    try:
+        assert after.status_code == status.HTTP_200_OK, f"Async stats failed: {after.text}"
+        assert after.json()["total"] == before["total"] + 2, f"Counts not updated: {before} -> {after.json()}"
+        assert after.json()["open"] == before["open"] + 2, f"Open count not updated: {after.json()}"
+        assert listed.headers.get("X-Total-Count") == str(after.json()["total"]), f"Bad total: {listed.headers}"
+    except AssertionError as e:
+        pytest.fail(f"Async task stats test failed: {e}")
+
+
+def test_async_outbox_events(async_client, monkeypatch):
+    """The async write routes record outbox events in their transaction"""
+    monkeypatch.setattr(outbox, "enabled", True)
+    headers = get_async_headers(async_client)
+    created = async_client.post("/v1/tasks/", headers=headers, json={"title": "Async outbox"}).json()
+    async_client.put(f"/v1/tasks/{created['id']}", headers=headers, json={"completed": True})
+    batch = async_client.post("/v1/tasks/batch", headers=headers, json=[{"title": "Async batch"}]).json()
+    batch_id = batch["results"][0]["id"]
+    async_client.patch("/v1/tasks/batch", headers=headers, json=[{"id": batch_id, "completed": True}])
+    async_client.request("DELETE", "/v1/tasks/batch", headers=headers, json=[batch_id])
+    async_client.delete(f"/v1/tasks/{created['id']}", headers=headers)
+
+    sync_engine = create_engine(async_client.database_url)
+    with sync_engine.connect() as conn:
+        events = conn.execute(
+            select(models.OutboxEvent.event_type, models.OutboxEvent.task_id, models.OutboxEvent.payload)
+            .order_by(models.OutboxEvent.id)
+        ).all()
+    sync_engine.dispose()
+    try:
+        assert [(event.event_type, event.task_id) for event in events] == [
+            ("task.created", created["id"]),
+            ("task.updated", created["id"]),
+            ("task.created", batch_id),
+            ("task.updated", batch_id),
+            ("task.deleted", batch_id),
+            ("task.deleted", created["id"]),
+        ], f"Unexpected events: {events}"
+        assert events[1].payload["completed"] is True, f"Update payload is stale: {events[1].payload}"
+    except AssertionError as e:
+        pytest.fail(f"Async outbox test failed: {e}")
+
+
+def test_async_task_list_fast_path(async_client, monkeypatch):
+    """The async list routes share the column-only fast path"""
+    from app.routers import tasks
+
+    headers = get_async_headers(async_client)
+    async_client.post("/v1/tasks/batch", headers=headers, json=[{"title": "Fast async"}])
+    slow = async_client.get("/v1/tasks/", headers=headers, params={"limit": 5})
+    monkeypatch.setattr(tasks, "TASK_LIST_FAST_PATH", True)
+    fast = async_client.get("/v1/tasks/", headers=headers, params={"limit": 5})
+    try:
+        assert fast.status_code == status.HTTP_200_OK, f"Async fast path failed: {fast.text}"
+        assert fast.content == slow.content, f"Bodies differ:\n{slow.content}\n{fast.content}"
+        assert fast.headers["ETag"] == slow.headers["ETag"], f"ETag differs: {fast.headers}"
+    except AssertionError as e:
+        pytest.fail(f"Async fast list path test failed: {e}")